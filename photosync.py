@@ -4,22 +4,21 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import gi
 import sys
-import re
 import os
-import datetime
-import time
 import getopt
-import logging
-import math
-import shutil
-import subprocess
-
-from lxml import etree as ET
-from glob import glob
-from threading import Thread
+
+from threading import Thread, Lock
+from functools import partial
 from distutils import spawn
 from __builtin__ import str
 
+from photosync_engine import FileCopyEngine, VideoEncodeEngine, TreeScanJob, DestinationCatalog, ContentMatcher, MediaProbeScheduler, SyncPlan, CODECS_VIDEO, ARQUIVO_LOG, \
+    le_arquivos_origem, le_arquivos_destino, planeja_itens, ACAO_IGNORAR, ACAO_MOVER, VERIFICACOES_COPIA, VERIFICACAO_NENHUMA, \
+    TIPO_FOTO, TIPO_VIDEO, obter_lista_videos, filtra_fotos_e_videos, get_app_settings, get_app_settings_bool, get_app_settings_int, \
+    get_app_settings_list, set_app_settings, set_app_settings_lote, \
+    inicializa_settings, inicializa_log, configura_encoding, get_caminho_ffmpeg, carrega_codecs_video, \
+    to_human_size, debug, g_logger
+
 gi.require_version('Gtk', '3.0')
 gi.require_version('Gdk', '3.0')
 
@@ -30,11 +29,6 @@ class VideoEncodeProgressDialog(Gtk.Dialog):
     """
     Dialog utilizada para exibir o progresso da conversão de vídeos
     """
-    
-    total = 0
-    completed_size = 0
-    must_stop = False
-    failed = False
 
     def __init__(self, parent, arquivos, destino):
         Gtk.Dialog.__init__(self, "Compactando vídeos ", parent, 0,
@@ -43,8 +37,7 @@ class VideoEncodeProgressDialog(Gtk.Dialog):
         self.set_size_request(250, 150)
         self.set_border_width(10)
 
-        self.lista_arquivos = arquivos
-        self.dir_destino = destino
+        self.engine = VideoEncodeEngine(arquivos, destino, self.do_progresso_engine, self.do_progresso_arquivo_engine)
 
         # Container principal
         grid = Gtk.Grid()
@@ -53,12 +46,9 @@ class VideoEncodeProgressDialog(Gtk.Dialog):
         grid.set_column_spacing(4)
         grid.set_row_spacing(6)
 
-        for arquivo in self.lista_arquivos:
-            self.total = self.total + os.stat(arquivo).st_size
-
         # Label com o título da atividade
         grid.attach(Gtk.Label(label="Efetuando a re-codificação de " + str(len(arquivos)) + 
-                              " arquivos (" + to_human_size(self.total) + ")", halign=Gtk.Align.START), 0, 0, 6, 1)
+                              " arquivos (" + to_human_size(self.engine.total) + ")", halign=Gtk.Align.START), 0, 0, 6, 1)
 
         # Progresso total
         self.progress_bar_total = Gtk.ProgressBar(show_text=True)
@@ -84,6 +74,17 @@ class VideoEncodeProgressDialog(Gtk.Dialog):
         thread.daemon = True
         thread.start()
 
+    @property
+    def failed(self):
+        return self.engine.failed
+
+    def interrompe(self):
+        """
+        Força a interrupção da conversão caso o usuário pressione cancel
+        """
+
+        self.engine.interrompe()
+
     def update_progess(self, titulo_barra_total, progresso_total, titulo_label_total, titulo_label_atual):
         """        
         Atualiza os contadores do arquivo atual e progresso total
@@ -104,136 +105,42 @@ class VideoEncodeProgressDialog(Gtk.Dialog):
         self.progressbar_atual.set_fraction(progresso_conversao)  # O processo deve ser entre 0.0 e 1.0
         return False
 
+    def do_progresso_engine(self, registro, novo_arquivo, completed_size, total):
+        """
+        Recebe o progresso total da thread de conversão e agenda a atualização da UI
+        """
+
+        # Estatísticas da conversão total
+        titulo_barra_total = "[" + to_human_size(completed_size) + "/" + to_human_size(total) + "]"
+        titulo_label_total = "Original: " + registro.nome + " (" + to_human_size(registro.tamanho) + ")"
+
+        if os.path.isfile(novo_arquivo):
+            titulo_label_atual = "Compactado: " + os.path.basename(novo_arquivo)
+        else:
+            titulo_label_atual = "Compactado: <Falha ao ler os dados do arquivo>"
+
+        progresso_total = completed_size / total  # Percentual do progresso
+
+        GLib.idle_add(self.update_progess, titulo_barra_total, progresso_total, titulo_label_total, titulo_label_atual)
+
+    def do_progresso_arquivo_engine(self, progresso_conversao):
+        GLib.idle_add(self.update_progess_arquivo, progresso_conversao)
+
     def processa_videos(self):
         """
         Efetua a conversão dos videos
         """
-        
-        DURATION = "Duration:"
-        FRAME = "frame="
-        TIME = "time="
-
-        # Recupera o codec e o path do ffmpeg
-        codec_idx = get_app_settings("codec_video")
-        codec_idx = codec_idx if codec_idx is not None else "0"
-        codec_info = get_codec_info(CODECS_VIDEO[int(codec_idx)])
-
-        for arquivo in self.lista_arquivos:
-            try:
-
-                if not os.path.isfile(arquivo):
-                    debug("Ignorando aquivo inexistente: " + arquivo)
-                    self.failed = True
-                    continue
-
-                self.completed_size = self.completed_size + os.stat(arquivo).st_size
-                novo_arquivo = self.dir_destino + os.sep + get_destino_arquivo(arquivo)
-                arquivo_copia = self.dir_destino + os.sep + os.path.basename(arquivo)
-
-                # Monta os parâmetros para a criação do novo video, de acordo com o codec escolhido
-                args = [get_caminho_ffmpeg(), "-hide_banner", "-i", arquivo_copia]
-                args.extend(codec_info["params"])
-                novo_arquivo = novo_arquivo[:novo_arquivo.rindex('.')] + codec_info["sufixo"]
-                args.append(novo_arquivo)
-
-                # Estatísticas da conversão total
-                titulo_barra_total = "[" + to_human_size(self.completed_size) + "/" + to_human_size(self.total) + "]"
-                titulo_label_total = "Original: " + os.path.basename(arquivo) + " (" + to_human_size(os.stat(arquivo).st_size) + ")"
-
-                if os.path.isfile(novo_arquivo):
-                    titulo_label_atual = "Compactado: " + os.path.basename(novo_arquivo)
-                else:
-                    titulo_label_atual = "Compactado: <Falha ao ler os dados do arquivo>"
-
-                progresso_total = self.completed_size / self.total  # Percentual do progresso
-
-                # Atualiza as estatíticas do total e o nome do arquivo de destino
-                GLib.idle_add(self.update_progess, titulo_barra_total, progresso_total, titulo_label_total, titulo_label_atual)
-
-                # Cria o diretório, se não existir
-                directory = os.path.dirname(novo_arquivo)
-                if not os.path.exists(directory):
-                    debug("Criando o diretório " + directory)
-                    os.makedirs(directory)
-
-                # Verifica se o vídeo de destino existe
-                if os.path.isfile(novo_arquivo):
-                    debug("Removendo arquivo de destino existente: " + novo_arquivo)
-                    os.remove(novo_arquivo)
-
-                max_secs = 0
-                cur_secs = 0
-
-                # Checa se o usuário interrrompeu a conversão
-                if self.must_stop:
-                    return None
-
-                # Efetua a conversão do arquivo de video
-                debug("Executando aplicação: " + str(args))
-
-                global g_processo_ffmpeg
-                g_processo_ffmpeg = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, universal_newlines=True)
-
-                # Inicia o processo e itera entre as linhas recebidas no stdout
-                for line in iter(g_processo_ffmpeg.stdout.readline, ''):
-                    if DURATION in line:
-                        # Essa linha contém o tamanho total do vídeo
-                        try:
-                            tmp = line[line.find(DURATION):]
-                            tmp = tmp[tmp.find(" ") + 1:]
-                            tmp = tmp[0: tmp.find(".")]
-                            x = time.strptime(tmp, '%H:%M:%S')
-                            max_secs = datetime.timedelta(hours=x.tm_hour, minutes=x.tm_min, seconds=x.tm_sec).total_seconds()
-                        except ValueError:
-                            debug("Falha ao converter o horário: " + tmp)
-
-                    elif line.startswith(FRAME) and TIME in line:
-                        try:
-                            # Captura o tempo da conversão (timestamp)
-                            tmp = line[line.find(TIME):]
-                            tmp = tmp[tmp.find("=") + 1: tmp.find(".")]
-                            x = time.strptime(tmp, '%H:%M:%S')
-                            cur_secs = datetime.timedelta(hours=x.tm_hour, minutes=x.tm_min, seconds=x.tm_sec).total_seconds()
-                        except ValueError:
-                            debug("Falha ao converter o horário: " + tmp)
-
-                    # Atualiza o progresso da conversão do arquivo de destino
-                    if cur_secs > 0 and max_secs > 0:
-                        GLib.idle_add(self.update_progess_arquivo, cur_secs / max_secs)
-
-                # Finaliza o processo do ffmpeg
-                g_processo_ffmpeg.stdout.close()
-                g_processo_ffmpeg.wait()
-
-                if os.path.isfile(arquivo):
-                    debug("Vídeo original: " + arquivo + " (" + to_human_size(os.stat(arquivo).st_size) + ")")
-
-                if os.path.isfile(novo_arquivo):
-                    debug("Vídeo convertido: " + novo_arquivo + " (" + to_human_size(os.stat(novo_arquivo).st_size) + ")")
-
-                # Remove a cópia do video original
-                if 'True' == get_app_settings("remover_video_apos_conversao"):
-                    video_original = os.path.dirname(novo_arquivo) + os.sep + os.path.basename(arquivo)
-                    if os.path.isfile(video_original):
-                        debug("Removendo a cópia do video original: " + video_original)
-                        os.remove(video_original)
-
-            except Exception as e:
-                debug("Falha ao converter o arquivo de vídeo " + arquivo + " : ", str(e))
-                self.failed = True
-
-        self.close()
+
+        if self.engine.executa():
+            GLib.idle_add(self.close)
 
 
 class FileCopyProgressDialog(Gtk.Dialog):
     """
     Dialog utilizada para exibir o progresso da cópia de arquivos
     """
-    
-    must_stop = False
-    failed = False
-    total = 0
-    completed_size = 0
+
+    INTERVALO_GRAVACAO_LIMITE = 1000  # Intervalo (ms) entre a alteração do limite de transferência e a gravação no settings.xml
 
     def __init__(self, parent, arquivos, destino):
         Gtk.Dialog.__init__(self, "Copiando arquivos ", parent, 0,
@@ -241,8 +148,9 @@ class FileCopyProgressDialog(Gtk.Dialog):
 
         self.set_size_request(250, 150)
         self.set_border_width(10)
-        self.lista_arquivos = arquivos
-        self.dir_destino = destino
+
+        self.engine = FileCopyEngine(arquivos, destino, self.do_progresso_engine)
+        self.limite_pendente = None  # Limite alterado ainda não gravado na configuração (ver do_grava_limite)
 
         # Container principal
         grid = Gtk.Grid()
@@ -251,12 +159,9 @@ class FileCopyProgressDialog(Gtk.Dialog):
         grid.set_column_spacing(4)
         grid.set_row_spacing(6)
 
-        for arquivo in self.lista_arquivos:
-            self.total = self.total + os.stat(arquivo).st_size
-
         # Label com o título da atividade
         grid.attach(Gtk.Label(label="Efetuando a cópia de " + str(len(arquivos)) + 
-                              " arquivos (" + to_human_size(self.total) + ")", halign=Gtk.Align.START), 0, 0, 6, 1)
+                              " arquivos (" + to_human_size(self.engine.total) + ")", halign=Gtk.Align.START), 0, 0, 6, 1)
 
         # Barra de progresso global
         self.progress_bar = Gtk.ProgressBar(show_text=True)
@@ -266,13 +171,49 @@ class FileCopyProgressDialog(Gtk.Dialog):
         self.label_progress = Gtk.Label(halign=Gtk.Align.START)
         grid.attach(self.label_progress, 0, 2, 6, 1)
 
+        # Limite de transferência, alterável durante a cópia
+        grid.attach(Gtk.Label(label="Limite de transferência (MB/s, 0 = sem limite):", halign=Gtk.Align.START), 0, 3, 4, 1)
+        self.spin_limite = Gtk.SpinButton.new_with_range(0, 10000, 1)
+        self.spin_limite.set_value(get_app_settings_int("limite_banda_copia"))
+        self.spin_limite.connect("value-changed", self.on_limite_alterado)
+        grid.attach(self.spin_limite, 4, 3, 2, 1)
+
         self.get_content_area().pack_start(grid, True, True, 0)
+        self.connect("destroy", lambda widget: self.do_grava_limite())  # Grava o limite pendente ao fechar a janela
         self.show_all()
 
         thread = Thread(target=self.copia_arquivos)
         thread.daemon = True
         thread.start()
 
+    @property
+    def failed(self):
+        return self.engine.failed
+
+    def interrompe(self):
+        """
+        Força a interrupção da cópia caso o usuário pressione cancel
+        """
+
+        self.engine.interrompe()
+
+    def on_limite_alterado(self, widget):
+        """
+        Aplica o novo limite imediatamente na cópia, agrupando as alterações antes da gravação na configuração
+        """
+
+        limite = widget.get_value_as_int()
+        self.engine.define_limite_banda(limite * 1024 * 1024)
+        if self.limite_pendente is None:
+            GLib.timeout_add(self.INTERVALO_GRAVACAO_LIMITE, self.do_grava_limite)
+        self.limite_pendente = limite
+
+    def do_grava_limite(self):
+        if self.limite_pendente is not None:
+            set_app_settings("limite_banda_copia", str(self.limite_pendente))
+            self.limite_pendente = None
+        return False
+
     def update_progess(self, titulo_progresso, progresso_copia, titulo_copia):
         """
         Atualiza o progress bar da cópia dos arquivos 
@@ -282,52 +223,24 @@ class FileCopyProgressDialog(Gtk.Dialog):
         self.label_progress.set_text(titulo_copia)
         return False
 
+    def do_progresso_engine(self, i, total_arquivos, arquivo, tamanho, completed_size, total):
+        """
+        Recebe o progresso da thread de cópia e agenda a atualização da UI
+        """
+
+        titulo_progresso = "[" + to_human_size(completed_size) + "/" + to_human_size(total) + "]"
+        progresso_copia = completed_size / total  # Percentual do progresso
+        titulo_copia = "[" + str(i + 1) + "/" + str(total_arquivos) + "] " + os.path.basename(arquivo) + " (" + to_human_size(tamanho) + ")"
+
+        GLib.idle_add(self.update_progess, titulo_progresso, progresso_copia, titulo_copia)
+
     def copia_arquivos(self):
         """
         Efetua a cópia dos arquivos
         """
-        total_arquivos = len(self.lista_arquivos)
-        for i, arquivo in enumerate(self.lista_arquivos):
-            try:
-                self.completed_size = self.completed_size + os.stat(arquivo).st_size
-
-                titulo_progresso = "[" + to_human_size(self.completed_size) + "/" + to_human_size(self.total) + "]"
-                progresso_copia = self.completed_size / self.total  # Percentual do progresso
-                titulo_copia = "[" + str(i) + "/" + str(total_arquivos) + "] " + os.path.basename(arquivo) + " (" + to_human_size(os.stat(arquivo).st_size) + ")"
-
-                GLib.idle_add(self.update_progess, titulo_progresso, progresso_copia, titulo_copia)
-
-                # Verifica se a cópia foi interrompida
-                if self.must_stop:
-                    return None
-
-                # Cria o diretório, se não existir
-                novo_arquivo = self.dir_destino + os.sep + get_destino_arquivo(arquivo)
-                dir_novo_arquivo = os.path.dirname(novo_arquivo)
-                if not os.path.exists(dir_novo_arquivo):
-                    try:
-                        debug("Criando o diretório " + dir_novo_arquivo)
-                        os.makedirs(dir_novo_arquivo)
-                    except Exception as e:
-                        debug("Falha ao criar o diretório de destino [" + dir_novo_arquivo + "]: " + str(e))
-                        continue
-
-                # Sempre copia o arquivo
-                debug("Copiando " + arquivo + " -> " + novo_arquivo)
-                shutil.copy2(arquivo, novo_arquivo)
-
-                # Se selecionado a opção, remover após a cópia
-                if 'True' == get_app_settings("remover_apos_copia"):
-                    try:
-                        debug("Removendo arquivo de origem " + arquivo)
-                        os.remove(arquivo)
-                    except Exception as e:
-                        debug("Falha ao remover o arquivo de origem após a cópia [" + arquivo + "]: " + str(e))
-            except Exception as e:
-                debug("Falha durante a cópia do arquivo [" + arquivo + "]: " + str(e))
-                continue
-
-        self.close()
+
+        if self.engine.executa():
+            GLib.idle_add(self.close)
 
 
 class InputDialog(Gtk.Dialog):
@@ -414,27 +327,27 @@ class ConfigDialog(Gtk.Dialog):
 
         # Apenas fotos e videos
         self.check_fotos_videos = Gtk.CheckButton("Copiar apenas as fotos e os vídeos")
-        self.check_fotos_videos.set_active('True' == get_app_settings("apenas_fotos_e_videos"))
+        self.check_fotos_videos.set_active(get_app_settings_bool("apenas_fotos_e_videos"))
         grid_check.attach(self.check_fotos_videos, 0, 0, 3, 1)
 
         # Sobrescrever
         self.check_sobrescrever = Gtk.CheckButton("Sobrescrever os arquivos de destino")
-        self.check_sobrescrever.set_active('True' == get_app_settings("sobrescrever_arquivos"))
+        self.check_sobrescrever.set_active(get_app_settings_bool("sobrescrever_arquivos"))
         grid_check.attach(self.check_sobrescrever, 4, 0, 3, 1)
 
         # Remover após copia
         self.check_remover_copia = Gtk.CheckButton("Remover os arquivos originais após a cópia")
-        self.check_remover_copia.set_active('True' == get_app_settings("remover_apos_copia"))
+        self.check_remover_copia.set_active(get_app_settings_bool("remover_apos_copia"))
         grid_check.attach(self.check_remover_copia, 0, 1, 3, 1)
 
         # Exibir resolução dos arquivos
         self.check_exibir_resolucao = Gtk.CheckButton("Exibir a resolução dos arquivos")
-        self.check_exibir_resolucao.set_active('True' == get_app_settings("exibir_resolucao_arquivos"))
+        self.check_exibir_resolucao.set_active(get_app_settings_bool("exibir_resolucao_arquivos"))
         grid_check.attach(self.check_exibir_resolucao, 4, 1, 3, 1)
         
         # Comprimir videos
         self.check_recode = Gtk.CheckButton("Re-codificar arquivos de vídeo")
-        self.check_recode.set_active('True' == get_app_settings("recodificar_videos"))
+        self.check_recode.set_active(get_app_settings_bool("recodificar_videos"))
         grid_check.attach(self.check_recode, 0, 2, 3, 1)
 
         # Formato do video
@@ -448,9 +361,7 @@ class ConfigDialog(Gtk.Dialog):
             
         self.combo_codecs.set_active(0)
         self.combo_codecs.set_entry_text_column(1)
-        codec_idx = get_app_settings("codec_video")
-        if codec_idx is not None:
-            self.combo_codecs.set_active(int(codec_idx))
+        self.combo_codecs.set_active(get_app_settings_int("codec_video"))
             
         flowbox.add(self.combo_codecs)
 
@@ -458,9 +369,31 @@ class ConfigDialog(Gtk.Dialog):
 
         # Remover Videos convertidos
         self.check_remover_video = Gtk.CheckButton("Remover a cópia do video original após a conversão")
-        self.check_remover_video.set_active('True' == get_app_settings("remover_video_apos_conversao"))
+        self.check_remover_video.set_active(get_app_settings_bool("remover_video_apos_conversao"))
         grid_check.attach(self.check_remover_video, 0, 3, 3, 1)
 
+        # Comparar o conteúdo dos arquivos
+        self.check_comparar_conteudo = Gtk.CheckButton("Comparar o conteúdo dos arquivos (localiza arquivos renomeados)")
+        self.check_comparar_conteudo.set_active(get_app_settings_bool("comparar_conteudo"))
+        grid_check.attach(self.check_comparar_conteudo, 4, 3, 3, 1)
+
+        # Organizar pela data de captura
+        self.check_data_captura = Gtk.CheckButton("Organizar os arquivos pela data de captura (EXIF)")
+        self.check_data_captura.set_active(get_app_settings_bool("usar_data_captura"))
+        grid_check.attach(self.check_data_captura, 0, 4, 3, 1)
+
+        # Verificação da cópia
+        flowbox = Gtk.FlowBox()
+        flowbox.add(Gtk.Label(label="Verificação da cópia:", halign=Gtk.Align.START))
+        self.combo_verificacao = Gtk.ComboBoxText()
+
+        for verificacao in VERIFICACOES_COPIA:
+            self.combo_verificacao.append_text(verificacao)
+
+        self.combo_verificacao.set_active(get_app_settings_int("verificacao_copia", VERIFICACAO_NENHUMA))
+        flowbox.add(self.combo_verificacao)
+        grid_check.attach(flowbox, 4, 4, 3, 1)
+
         grid.attach(grid_check, 0, 0, 6, 3)
 
         # Campo Destino
@@ -491,7 +424,7 @@ class ConfigDialog(Gtk.Dialog):
         grid_video = Gtk.Grid()
         grid_video.attach(scrollable_treelist_videos, 0, 0, 6, 6)
 
-        for video in get_app_settings("extensoes_video").split('|'):
+        for video in get_app_settings_list("extensoes_video"):
             self.taskstore_videos.append([video])
 
         flowbox = Gtk.FlowBox()
@@ -521,7 +454,7 @@ class ConfigDialog(Gtk.Dialog):
         grid_foto = Gtk.Grid()
         grid_foto.attach(scrollable_treelist_fotos, 0, 0, 6, 6)
 
-        for foto in get_app_settings("extensoes_foto").split('|'):
+        for foto in get_app_settings_list("extensoes_foto"):
             self.taskstore_fotos.append([foto])
 
         flowbox = Gtk.FlowBox()
@@ -595,25 +528,31 @@ class ConfigDialog(Gtk.Dialog):
 
     def show_and_get_info(self):
         while self.run() == Gtk.ResponseType.OK:
-            set_app_settings("remover_apos_copia", str(self.check_remover_copia.get_active()))
-            set_app_settings("sobrescrever_arquivos", str(self.check_sobrescrever.get_active()))
-            set_app_settings("recodificar_videos", str(self.check_recode.get_active()))
-            set_app_settings("caminho_ffmpeg", self.edit_caminho_ffmpeg.get_text().strip())
-            set_app_settings("codec_video", str(self.combo_codecs.get_active()))
-            set_app_settings("apenas_fotos_e_videos", str(self.check_fotos_videos.get_active()))
-            set_app_settings("exibir_resolucao_arquivos", str(self.check_exibir_resolucao.get_active()))                 
-
             videos = ""
             for row in self.taskstore_videos:
                 videos = videos + "|" + row[0]
             videos = videos[1:]
-            set_app_settings("extensoes_video", videos)
 
             fotos = ""
             for row in self.taskstore_fotos:
                 fotos = fotos + "|" + row[0]
             fotos = fotos[1:]
-            set_app_settings("extensoes_foto", fotos)
+
+            # Grava todas as configurações de uma única vez
+            set_app_settings_lote([
+                ("remover_apos_copia", str(self.check_remover_copia.get_active())),
+                ("sobrescrever_arquivos", str(self.check_sobrescrever.get_active())),
+                ("recodificar_videos", str(self.check_recode.get_active())),
+                ("caminho_ffmpeg", self.edit_caminho_ffmpeg.get_text().strip()),
+                ("codec_video", str(self.combo_codecs.get_active())),
+                ("apenas_fotos_e_videos", str(self.check_fotos_videos.get_active())),
+                ("exibir_resolucao_arquivos", str(self.check_exibir_resolucao.get_active())),
+                ("comparar_conteudo", str(self.check_comparar_conteudo.get_active())),
+                ("usar_data_captura", str(self.check_data_captura.get_active())),
+                ("verificacao_copia", str(self.combo_verificacao.get_active())),
+                ("extensoes_video", videos),
+                ("extensoes_foto", fotos)
+            ])
 
         self.destroy()
         return None
@@ -712,6 +651,9 @@ class MainWindow(Gtk.Window):
     """
     
     COLUNAS_GRID = ["Copiar", "Status", "Arquivo", "Destino", "Tipo", "Tamanho", "Detalhes"]
+    INTERVALO_ATUALIZACAO_GRID = 200  # Intervalo (ms) de inclusão na grid dos arquivos lidos
+    INTERVALO_ANALISE_VISIVEIS = 100  # Intervalo (ms) entre a rolagem da grid e a análise das linhas visíveis
+    JANELA_PREFETCH = 100  # Quantidade de linhas, antes e depois das visíveis, analisadas antecipadamente
     popupMenuTree = Gtk.Menu()
 
     def __init__(self):
@@ -723,6 +665,16 @@ class MainWindow(Gtk.Window):
         # Clipboard para cópia do texto
         self.clipboard = Gtk.Clipboard.get(Gdk.SELECTION_CLIPBOARD)
 
+        # Lotes de arquivos de origem lidos e ainda não exibidos na grid
+        self.lock_lotes = Lock()
+        self.lotes_pendentes = []
+
+        # Análise sob demanda das mídias exibidas na grid
+        self.analise_midias = None
+        self.analise_visiveis_agendada = False
+        self.linhas_por_registro = {}
+        self.itens_lidos = []  # Itens do plano de sincronização já exibidos, durante a leitura
+
         self.set_resizable(True)
         self.set_border_width(10)
         self.set_default_size(640, 480)
@@ -802,7 +754,8 @@ class MainWindow(Gtk.Window):
         # grid de arquivos
 
         # Cria o grid
-        self.store = Gtk.ListStore(bool, str, str, str, str, str, str)
+        # A última coluna (não exibida) mantém o FileRecord do arquivo
+        self.store = Gtk.ListStore(bool, str, str, str, str, str, str, object)
 
         self.filtro = self.store.filter_new()
         # self.filtro.set_visible_func(self.do_filter_grid)
@@ -837,6 +790,10 @@ class MainWindow(Gtk.Window):
         scrollable_treelist.add(self.treeview)
         grid.attach(scrollable_treelist, 0, 5, 8, 8)
 
+        # A rolagem e a inclusão de linhas alteram as linhas visíveis
+        scrollable_treelist.get_vadjustment().connect("value-changed", self.do_agenda_analise_visiveis)
+        scrollable_treelist.get_vadjustment().connect("changed", self.do_agenda_analise_visiveis)
+
         # Label de seleção dos arquivos
         self.label_status_copia = Gtk.Label(label="", halign=Gtk.Align.START)
         grid.attach(self.label_status_copia, 0, 13, 8, 1)
@@ -867,36 +824,66 @@ class MainWindow(Gtk.Window):
 
     def do_apagar_selecionados(self, widget):  # @UnusedVariable
         debug("MenuItem: Apagar arquivos marcados")
+        global g_lista_arquivos_origem
+        global g_plano_sincronizacao
         arquivos = self.do_monta_lista_arquivos_copiar()
         if len(arquivos) > 0:
             dialog = Gtk.MessageDialog(self, 0, Gtk.MessageType.QUESTION, Gtk.ButtonsType.YES_NO, "Confirmação da exclusão")
             dialog.format_secondary_text("Você realmente deseja remover os " + str(len(arquivos)) + " arquivos marcados?")
             response = dialog.run()
             if response == Gtk.ResponseType.YES:
-                for arquivo in arquivos:
-                    debug("Removendo arquivo " + arquivo)
-                    os.remove(arquivo)
+                for registro in arquivos:
+                    debug("Removendo arquivo " + registro.caminho)
+                    os.remove(registro.caminho)
+
+                removidos = set(id(registro) for registro in arquivos)
+                g_lista_arquivos_origem = [registro for registro in g_lista_arquivos_origem if id(registro) not in removidos]
+                g_plano_sincronizacao = g_plano_sincronizacao.sem_registros(arquivos)
                 self.do_monta_lista_arquivos()
             dialog.destroy()
 
     def do_marcar_nao_h265(self, widget):  # @UnusedVariable
         debug("MenuItem: Marcar videos não H265")
-        for row in self.store:
-            if self.is_video(row[2]) and 'hevc' not in row[6]:
+
+        # O codec é necessário para todos os vídeos, não apenas os já exibidos: a análise é
+        # efetuada fora da thread da UI e a seleção aplicada ao término (do_marca_videos_nao_h265)
+        videos = [row[7] for row in self.store if row[4] == TIPO_VIDEO]
+        if self.analise_midias is None:
+            self.do_marca_videos_nao_h265(videos)
+            return
+
+        def analisa_videos(analise_midias):
+            analise_midias.carrega(videos)
+            GLib.idle_add(self.do_marca_videos_nao_h265, videos)
+
+        thread = Thread(target=analisa_videos, args=(self.analise_midias,))
+        thread.daemon = True
+        thread.start()
+
+    def do_marca_videos_nao_h265(self, videos):
+        for registro in videos:
+            treeiter = self.linhas_por_registro.get(registro)
+            if treeiter is None:
+                continue  # Grid recarregada durante a análise
+
+            row = self.store[treeiter]
+            row[6] = registro.detalhes
+            if 'hevc' not in (registro.detalhes or ""):
                 row[0] = True
 
         self.do_atualiza_contador_selecao()
+        return False
 
     def do_marca_todas_fotos(self, widget):  # @UnusedVariable
         debug("MenuItem: Marcar todas as fotos")
         for row in self.store:
-            if self.is_foto(row[2]):
+            if row[4] == TIPO_FOTO:
                 row[0] = True
 
     def do_marca_todos_videos(self, widget):  # @UnusedVariable
         debug("MenuItem: Marcar todos os videos")
         for row in self.store:
-            if self.is_video(row[2]):
+            if row[4] == TIPO_VIDEO:
                 row[0] = True
 
         self.do_atualiza_contador_selecao()
@@ -934,73 +921,51 @@ class MainWindow(Gtk.Window):
 
         dialog.destroy()
 
-    def get_tipo_arquivo(self, arquivo):
-        tipo = "Desconhecido"
-        if self.is_foto(arquivo):
-            tipo = "Foto"
-        elif self.is_video(arquivo):
-            tipo = "Video"
-        return tipo
+    def get_icone_item(self, item):
+        if item.existe:
+            return "ok" if item.acao == ACAO_IGNORAR else "gtk-stop"
 
-    def get_file_is_sync(self, arquivo):
-        global g_lista_arquivos_destino
-        arquivos = g_lista_arquivos_destino.get(os.path.basename(arquivo), [])
-        tamanho_origem = os.stat(arquivo).st_size
-        found = False
-        if len(arquivos) > 0:
-            for  dests in arquivos:
-                found = found or tamanho_origem == os.stat(dests).st_size
-        return found
+        return "forward" if item.acao == ACAO_MOVER else "go-down"
 
-    def get_icone_arquivo(self, sync):
-        mover = 'True' == get_app_settings("remover_apos_copia")
-        resp = "forward" if mover else "go-down"
+    def do_adiciona_linhas(self, registros):
+        """
+        Adiciona os arquivos de origem lidos na grid, planejando a sincronização com o catálogo do destino
+        """
 
-        if sync:
-            sobrescreve = 'True' == get_app_settings("sobrescrever_arquivos")
-            resp = "gtk-stop" if sobrescreve else "ok"
+        itens = planeja_itens(registros, g_lista_arquivos_destino, g_dic_mapeamento_dir_destino)
+        self.itens_lidos.extend(itens)
+        self.do_adiciona_itens(itens)
 
-        return resp
+    def do_adiciona_itens(self, itens):
+        """
+        Adiciona os itens do plano de sincronização na grid
+        """
+
+        src = self.edit_origem.get_text().strip()
+        pos_src = len(src) if src.endswith(os.sep) else len(src) + 1
+
+        for item in itens:
+            registro = item.registro
+            self.linhas_por_registro[registro] = self.store.append([
+                item.acao != ACAO_IGNORAR,
+                self.get_icone_item(item),
+                registro.caminho[pos_src:],
+                item.destino,
+                item.tipo,
+                to_human_size(item.tamanho),
+                registro.detalhes,
+                registro
+            ])
 
     def do_monta_lista_arquivos(self):
-        active = g_leitura_origem_finalizada and g_leitura_destino_finalizada
+        active = g_plano_sincronizacao is not None
 
         if active:
             debug("Populando a grid de arquivos")
 
-            global g_lista_arquivos_origem
-            global g_dic_info_arquivos_origem
-
-            # Verifica se deve sobrescrever os arqivos existentes
-            sobrescrever = 'True' == get_app_settings("sobrescrever_arquivos")
-
             self.store.clear()
-            src = self.edit_origem.get_text().strip()
-
-            pos_src = len(src) if src.endswith(os.sep) else len(src) + 1
-            
-            for arquivo in g_lista_arquivos_origem:
-                sync = self.get_file_is_sync(arquivo)
-                icon = self.get_icone_arquivo(sync)
-                tamanho = to_human_size(os.stat(arquivo).st_size)
-                detalhes = g_dic_info_arquivos_origem[arquivo]
-                arquivo_abr = arquivo[pos_src:]
-                tipo_arquivo = self.get_tipo_arquivo(arquivo)
-                destino = get_destino_arquivo(arquivo)
-
-                # Se for para sobrescrever, sync deve ser sempre falso
-                if sobrescrever:
-                    sync = False
-
-                self.store.append([
-                    not sync,
-                    icon,
-                    arquivo_abr,
-                    destino,
-                    tipo_arquivo,
-                    tamanho,
-                    detalhes
-                ])
+            self.linhas_por_registro = {}
+            self.do_adiciona_itens(g_plano_sincronizacao)
 
             # Habilita os botões
             self.button_ler_arquivos.set_sensitive(active)
@@ -1011,51 +976,158 @@ class MainWindow(Gtk.Window):
             self.do_atualiza_contador_selecao()
             debug("Grid de arquivos populada")
 
-    def do_read_file_list_origem(self):
+    def do_read_file_list_origem(self, leitura):
         global g_lista_arquivos_origem
-        global g_leitura_origem_finalizada
-        global g_dic_info_arquivos_origem
-        g_dic_info_arquivos_origem = {}
 
         # Monta a lista de arquivos
-        g_lista_arquivos_origem = [y for x in os.walk(self.edit_origem.get_text()) for y in glob(os.path.join(x[0], '*.*'))]
-        tamanho = 0
-        for arquivo in g_lista_arquivos_origem:
-            try:
-                # Carrega a informação do arquivo
-                g_dic_info_arquivos_origem[arquivo] = self.get_file_info(arquivo)
-
-                tamanho = tamanho + os.stat(arquivo).st_size  # in bytes
-            except:
-                debug("Falha ao ler o arquivo de origem " + arquivo)
-
-        self.labelStatusFrom.set_text("Arquivos no diretório de origem: " + str(len(g_lista_arquivos_origem)) + " (" + to_human_size(tamanho) + ")")
-        debug(self.labelStatusFrom.get_text())
-        g_leitura_origem_finalizada = True
-        self.do_monta_lista_arquivos()
-        debug("Consulta da lista de arquivos de origem concluída")
-
-    def do_read_file_list_destino(self):
-        global g_leitura_destino_finalizada
+        if leitura.resultado is None:
+            g_lista_arquivos_origem, tamanho = [], 0
+            self.labelStatusFrom.set_text("Falha na leitura do diretório de origem, verifique o log para mais informações.")
+        else:
+            g_lista_arquivos_origem, tamanho = leitura.resultado
+            self.labelStatusFrom.set_text("Arquivos no diretório de origem: " + str(len(g_lista_arquivos_origem)) + " (" + to_human_size(tamanho) + ")")
+
+        debug("Consulta da lista de arquivos de origem concluída em " + ('%.2f' % leitura.duracao) + "s")
+        return False
+
+    def do_read_file_list_destino(self, leitura):
         global g_lista_arquivos_destino
-        g_lista_arquivos_destino = {}
-        lista_arquivos_destino = [y for x in os.walk(self.edit_destino.get_text()) for y in glob(os.path.join(x[0], '*.*'))]
-        tamanho = 0
-        for arquivo in lista_arquivos_destino:
-            try:
-                tamanho = tamanho + os.stat(arquivo).st_size  # in bytes
-                nome = os.path.basename(arquivo)
-                arquivos = g_lista_arquivos_destino.get(nome, [])
-                arquivos.append(arquivo)
-                g_lista_arquivos_destino[nome] = arquivos
-            except:
-                debug("Falha ao ler o arquivo de destino " + arquivo)
-
-        self.labelStatusTo.set_text("Arquivos no diretório de destino: " + str(len(lista_arquivos_destino)) + " (" + to_human_size(tamanho) + ")")
-        debug(self.labelStatusTo.get_text())
-        g_leitura_destino_finalizada = True
-        self.do_monta_lista_arquivos()
-        debug("Consulta da lista de arquivos de destino concluída")
+
+        if leitura.resultado is None:
+            g_lista_arquivos_destino = DestinationCatalog()
+            self.labelStatusTo.set_text("Falha na leitura do diretório de destino, verifique o log para mais informações.")
+        else:
+            g_lista_arquivos_destino = leitura.resultado
+            self.labelStatusTo.set_text("Arquivos no diretório de destino: " + str(g_lista_arquivos_destino.quantidade) + " (" + 
+                                        to_human_size(g_lista_arquivos_destino.tamanho) + ")")
+
+        debug("Consulta da lista de arquivos de destino concluída em " + ('%.2f' % leitura.duracao) + "s")
+        return False
+
+    def do_progresso_leitura(self, leitura, arquivos_lidos):
+        """
+        Recebe o progresso das threads de leitura e agenda a atualização da UI
+        """
+
+        GLib.idle_add(self.update_progresso_leitura, leitura, arquivos_lidos)
+
+    def update_progresso_leitura(self, leitura, arquivos_lidos):
+        if not leitura.finalizado():
+            if leitura is g_leitura_origem:
+                self.labelStatusFrom.set_text("Lendo o diretório de origem: " + str(arquivos_lidos) + " arquivo(s) encontrado(s)...")
+            else:
+                self.labelStatusTo.set_text("Lendo o diretório de destino: " + str(arquivos_lidos) + " arquivo(s) encontrado(s)...")
+        return False
+
+    def do_lote_origem(self, lote):
+        """
+        Executado na thread de leitura: guarda os arquivos de origem lidos para exibição na grid
+        """
+
+        with self.lock_lotes:
+            self.lotes_pendentes.append(lote)
+
+    def do_descarrega_lotes(self, leitura):
+        """
+        Adiciona periodicamente à grid os arquivos de origem já lidos.
+
+        As linhas só são exibidas após a leitura do destino, para que a situação de
+        sincronização de cada arquivo seja definida no momento da inclusão.
+        """
+
+        if leitura is not g_leitura_origem:
+            return False  # Leitura substituída por uma nova verificação
+
+        if g_lista_arquivos_destino is None:
+            return True  # Aguarda o catálogo do destino
+
+        with self.lock_lotes:
+            lotes = self.lotes_pendentes
+            self.lotes_pendentes = []
+
+        for lote in lotes:
+            self.do_adiciona_linhas(lote)
+
+        if lotes:
+            self.do_atualiza_contador_selecao()
+
+        if g_lista_arquivos_origem is None:
+            return True  # Leitura da origem em andamento
+
+        # Leitura concluída: o plano de sincronização é fixado com os itens exibidos
+        global g_plano_sincronizacao
+        g_plano_sincronizacao = SyncPlan(self.itens_lidos, g_dic_mapeamento_dir_destino)
+        self.itens_lidos = []
+
+        # Habilita os botões. Com a comparação do conteúdo, a sincronização e o mapeamento aguardam o
+        # plano atualizado (do_conteudo_comparado): os arquivos renomeados no destino não devem ser copiados
+        comparar_conteudo = get_app_settings_bool("comparar_conteudo") and not get_app_settings_bool("sobrescrever_arquivos")
+        self.button_ler_arquivos.set_sensitive(True)
+        self.button_sync_arquivos.set_sensitive(not comparar_conteudo)
+        self.button_mapeamento.set_sensitive(not comparar_conteudo)
+        self.do_atualiza_contador_selecao()
+        debug("Grid de arquivos populada")
+
+        if comparar_conteudo:
+            self.labelStatusFrom.set_text(self.labelStatusFrom.get_text() + " - comparando o conteúdo dos arquivos...")
+            thread = Thread(target=self.do_compara_conteudo, args=(leitura, g_lista_arquivos_origem, g_lista_arquivos_destino))
+            thread.daemon = True
+            thread.start()
+
+        return False
+
+    def do_compara_conteudo(self, leitura, registros, catalogo):
+        """
+        Executado em background: compara o conteúdo dos arquivos de origem com os do destino.
+        Em caso de falha, o plano é mantido com a comparação pelo nome e tamanho.
+        """
+
+        try:
+            ContentMatcher(catalogo).verifica(registros)
+        except Exception as e:
+            debug("Falha na comparação do conteúdo dos arquivos: " + str(e))
+
+        GLib.idle_add(self.do_conteudo_comparado, leitura)
+
+    def do_conteudo_comparado(self, leitura):
+        """
+        Atualiza na grid apenas as linhas cuja situação foi alterada pela comparação do conteúdo
+        """
+
+        global g_plano_sincronizacao
+
+        if leitura is not g_leitura_origem:
+            return False  # Leitura substituída por uma nova verificação
+
+        plano_anterior = g_plano_sincronizacao
+        g_plano_sincronizacao = plano_anterior.com_situacao(g_lista_arquivos_destino)
+
+        alterados = 0
+        for item in g_plano_sincronizacao:
+            if item is not plano_anterior.item(item.registro):
+                row = self.store[self.linhas_por_registro[item.registro]]
+                row[0] = item.acao != ACAO_IGNORAR
+                row[1] = self.get_icone_item(item)
+                alterados += 1
+
+        self.labelStatusFrom.set_text(self.labelStatusFrom.get_text().split(" - ")[0])
+        self.do_atualiza_contador_selecao()
+
+        # Plano atualizado: libera a sincronização e o mapeamento
+        self.button_sync_arquivos.set_sensitive(True)
+        self.button_mapeamento.set_sensitive(True)
+        debug("Comparação do conteúdo: " + str(alterados) + " linha(s) atualizada(s) na grid")
+        return False
+
+    def do_leitura_concluida(self, leitura):
+        """
+        Executado na thread de leitura ao término da leitura, agenda o processamento do resultado na UI
+        """
+
+        if leitura is g_leitura_origem:
+            GLib.idle_add(self.do_read_file_list_origem, leitura)
+        elif leitura is g_leitura_destino:
+            GLib.idle_add(self.do_read_file_list_destino, leitura)
 
     def do_click_check_files(self, widget):  # @UnusedVariable
         debug("Validando os diretórios")
@@ -1070,15 +1142,15 @@ class MainWindow(Gtk.Window):
 
         global g_lista_arquivos_origem
         global g_lista_arquivos_destino
-        global g_leitura_origem_finalizada
-        global g_leitura_destino_finalizada
+        global g_plano_sincronizacao
+        global g_leitura_origem
+        global g_leitura_destino
         global g_dic_mapeamento_dir_origem
         global g_dic_mapeamento_dir_destino
 
-        g_lista_arquivos_origem = []
-        g_lista_arquivos_destino = {}
-        g_leitura_origem_finalizada = False
-        g_leitura_destino_finalizada = False
+        g_lista_arquivos_origem = None
+        g_lista_arquivos_destino = None
+        g_plano_sincronizacao = None
         g_dic_mapeamento_dir_origem = {}
         g_dic_mapeamento_dir_destino = {}
 
@@ -1088,13 +1160,69 @@ class MainWindow(Gtk.Window):
         self.button_mapeamento.set_sensitive(False)
 
         self.store.clear()
+        self.linhas_por_registro = {}
+        self.itens_lidos = []
+        with self.lock_lotes:
+            self.lotes_pendentes = []
+
+        # As informações das mídias são carregadas sob demanda, apenas para as linhas exibidas
+        if self.analise_midias is not None:
+            self.analise_midias.interrompe()
+        self.analise_midias = MediaProbeScheduler(self.do_midia_analisada) if get_app_settings_bool("exibir_resolucao_arquivos") else None
+
+        # Lê a origem e o destino em paralelo, fora da thread da UI
+        g_leitura_origem = TreeScanJob(partial(le_arquivos_origem, carregar_informacoes=False), self.edit_origem.get_text(),
+                                       self.do_progresso_leitura, self.do_leitura_concluida, self.do_lote_origem)
+        g_leitura_destino = TreeScanJob(le_arquivos_destino, self.edit_destino.get_text(), self.do_progresso_leitura, self.do_leitura_concluida)
+        g_leitura_origem.inicia()
+        g_leitura_destino.inicia()
+
+        # Os arquivos de origem são exibidos na grid à medida que são lidos
+        GLib.timeout_add(self.INTERVALO_ATUALIZACAO_GRID, self.do_descarrega_lotes, g_leitura_origem)
+
+    def do_agenda_analise_visiveis(self, widget=None):  # @UnusedVariable
+        """
+        Agrupa os eventos de rolagem, analisando as linhas visíveis apenas após o intervalo
+        """
+
+        if self.analise_midias is not None and not self.analise_visiveis_agendada:
+            self.analise_visiveis_agendada = True
+            GLib.timeout_add(self.INTERVALO_ANALISE_VISIVEIS, self.do_analisa_linhas_visiveis)
+
+    def do_analisa_linhas_visiveis(self):
+        """
+        Agenda a análise das linhas visíveis na grid e, com menor prioridade, das linhas próximas
+        """
+
+        self.analise_visiveis_agendada = False
+        faixa = self.treeview.get_visible_range()
+        if self.analise_midias is None or faixa is None:
+            return False
+
+        inicio = faixa[0].get_indices()[0]
+        fim = faixa[1].get_indices()[0] + 1
+        total = len(self.store)
+
+        visiveis = [self.store[i][7] for i in range(inicio, min(fim, total))]
+        proximas = [self.store[i][7] for i in range(fim, min(fim + self.JANELA_PREFETCH, total))] + \
+                   [self.store[i][7] for i in range(max(0, inicio - self.JANELA_PREFETCH), inicio)]
 
-#         Thread(target=self.do_read_file_list_origem).start()
-#         Thread(target=self.do_read_file_list_destino).start()
+        self.analise_midias.agenda(visiveis, MediaProbeScheduler.PRIORIDADE_VISIVEL)
+        self.analise_midias.agenda(proximas, MediaProbeScheduler.PRIORIDADE_PREFETCH)
+        return False
+
+    def do_midia_analisada(self, registro):
+        """
+        Executado na thread de análise: agenda a atualização da linha na UI
+        """
 
-        # Compara a lista de arquivos da origem com o destino
-        self.do_read_file_list_origem()
-        self.do_read_file_list_destino()
+        GLib.idle_add(self.do_atualiza_detalhes, registro)
+
+    def do_atualiza_detalhes(self, registro):
+        treeiter = self.linhas_por_registro.get(registro)
+        if treeiter is not None:
+            self.store.set_value(treeiter, 6, registro.detalhes)
+        return False
 
     def do_atualiza_contador_selecao(self):
         cont = 0
@@ -1108,56 +1236,28 @@ class MainWindow(Gtk.Window):
 
         for row in self.store:
             if row[0]:
-                arquivo = self.edit_origem.get_text() + os.sep + row[2]
+                tamanho = row[7].tamanho
                 cont += 1
-                size += os.stat(arquivo).st_size
+                size += tamanho
 
-                if self.is_video(arquivo):
+                if row[4] == TIPO_VIDEO:
                     cont_video += 1
-                    size_video += os.stat(arquivo).st_size
-                elif self.is_foto(arquivo):
+                    size_video += tamanho
+                elif row[4] == TIPO_FOTO:
                     cont_foto += 1
-                    size_foto += os.stat(arquivo).st_size
+                    size_foto += tamanho
                 else:
                     cont_outro += 1
-                    size_outro += os.stat(arquivo).st_size
+                    size_outro += tamanho
 
         self.label_status_copia.set_text("Arquivos selecionados: " + str(cont) + " / " + str(len(self.store)) + " (" + to_human_size(size) + ") - Videos: " + 
                                          str(cont_video) + " (" + to_human_size(size_video) + ") - Fotos: " + str(cont_foto) + " (" + to_human_size(size_foto) + ") - Outros: " + str(cont_outro) + "(" + to_human_size(size_outro) + ")")
 
     def do_monta_lista_arquivos_copiar(self):
         resp = []
-        path_base = self.edit_origem.get_text()
-            
         for row in self.store:
             if row[0]:
-                resp.append(path_base + os.sep + row[2])
-        return resp
-
-    def is_video(self, arquivo):
-        for ext in get_app_settings("extensoes_video").split('|'):
-            if arquivo.lower().endswith(ext.lower()):
-                return True
-        return False
-
-    def is_foto(self, arquivo):
-        for ext in get_app_settings("extensoes_foto").split('|'):
-            if arquivo.lower().endswith(ext.lower()):
-                return True
-        return False
-
-    def do_obter_lista_fotos(self, videos):
-        resp = []
-        for arquivo in videos:
-            if self.is_foto(arquivo):
-                resp.append(arquivo)
-        return resp
-
-    def do_obter_lista_videos(self, arquivos):
-        resp = []
-        for arquivo in arquivos:
-            if self.is_video(arquivo):
-                resp.append(arquivo)
+                resp.append(row[7])
         return resp
 
     def do_click_mapeamento_dir(self, widget):  # @UnusedVariable
@@ -1167,44 +1267,52 @@ class MainWindow(Gtk.Window):
         g_dic_mapeamento_dir_origem = {}
         
         global g_dic_mapeamento_dir_destino
-        g_dic_mapeamento_dir_destino = {} 
- 
-        for arquivo in self.do_monta_lista_arquivos_copiar():
-            destino = os.path.dirname(get_destino_arquivo(arquivo))
-            g_dic_mapeamento_dir_destino[destino] = destino
-            g_dic_mapeamento_dir_origem[destino] = os.path.basename(os.path.dirname(arquivo)) 
-        
+        g_dic_mapeamento_dir_destino = {}
+
+        global g_plano_sincronizacao
+
+        # Exibe o mapeamento atual das pastas dos arquivos selecionados
+        for registro in self.do_monta_lista_arquivos_copiar():
+            pasta = g_plano_sincronizacao.item(registro).pasta
+            g_dic_mapeamento_dir_destino[pasta] = g_plano_sincronizacao.mapeamento.get(pasta, pasta)
+            g_dic_mapeamento_dir_origem[pasta] = os.path.basename(os.path.dirname(registro.caminho))
+
         if MapeamentoDialog(main_window).show_and_update_file_list():
-            self.do_monta_lista_arquivos()
+            # Atualiza apenas as linhas das pastas com o mapeamento alterado
+            pastas = g_plano_sincronizacao.pastas_alteradas(g_dic_mapeamento_dir_destino)
+            g_plano_sincronizacao = g_plano_sincronizacao.com_mapeamento(g_dic_mapeamento_dir_destino)
+
+            for pasta in pastas:
+                for item in g_plano_sincronizacao.por_pasta[pasta]:
+                    self.store.set_value(self.linhas_por_registro[item.registro], 3, item.destino)
+
+            debug("Mapeamento aplicado: " + str(len(pastas)) + " pasta(s) alterada(s)")
 
     def do_click_sync_files(self, widget):  # @UnusedVariable
         debug("Montando a lista dos arquivos que serão copiados")
 
-        # Recupera a lista de arquivos selecionados
-        arquivos = self.do_monta_lista_arquivos_copiar()
+        # Recupera os itens do plano dos arquivos selecionados
+        arquivos = g_plano_sincronizacao.copia(self.do_monta_lista_arquivos_copiar())
 
         # Filtra apenas videos e fotos
-        if 'True' == get_app_settings("apenas_fotos_e_videos"):
-            debug("Filtrando apenas videos e fotos")
-            medias = self.do_obter_lista_fotos(arquivos)
-            medias.extend(self.do_obter_lista_videos(arquivos))
-            arquivos = medias
+        arquivos = filtra_fotos_e_videos(arquivos)
 
         debug("Iniciando a cópia dos arquivos")
         # Efetua a cópia dos arquivos
         dialog_arquivos = FileCopyProgressDialog(main_window, arquivos, self.edit_destino.get_text())
         dialog_arquivos.run()
-        dialog_arquivos.must_stop = True
+        dialog_arquivos.interrompe()
         if dialog_arquivos.failed:
             show_message("Falha na cópia dos arquivos!", "Ocorreram falhas durante a cópia de pelo menos um arquivo, verifique o log para mais informações.")
 
+        arquivos = dialog_arquivos.engine.itens_destino()  # Arquivos copiados com outro nome (ver reserva_destino)
         dialog_arquivos.destroy()
         debug("Cópia dos arquivos finalizada")
 
         # Verifica se deve recomprimir os videos
-        if 'True' == get_app_settings("recodificar_videos"):
+        if get_app_settings_bool("recodificar_videos"):
             debug("Montando a lista de videos a serem compactados")
-            arquivos = self.do_obter_lista_videos(arquivos)
+            arquivos = obter_lista_videos(arquivos)
             if len(arquivos) > 0:
                 debug("Compactando " + str(len(arquivos)) + " video(s).")
 
@@ -1215,18 +1323,10 @@ class MainWindow(Gtk.Window):
                 dialog_video = VideoEncodeProgressDialog(main_window, arquivos, self.edit_destino.get_text(),)
                 dialog_video.run()
                 # Força a interrupção da conversão caso o usuário pressione cancel
-                dialog_video.must_stop = True
+                dialog_video.interrompe()
                 if dialog_video.failed:
                     show_message("Falha na conversão!", "Ocorreram falhas durante a conversão de pelo menos uma video, verifique o log para mais informações.")
 
-                global g_processo_ffmpeg
-                if g_processo_ffmpeg is not None:
-                    try:
-                        g_processo_ffmpeg.kill()
-                        debug("O processo do ffmpeg foi interrompido pelo usuário.")
-                    except OSError:
-                        debug("O processo do ffmpeg foi finalizado com sucesso.")
-
                 dialog_video.destroy()
                 debug("Codificação dos vídeos finalizada")
 
@@ -1253,59 +1353,6 @@ class MainWindow(Gtk.Window):
         self.store.set_value(treeiter, 0, not model[treeiter][0])
         self.do_atualiza_contador_selecao()
 
-    def get_file_info(self, arquivo):
-    
-        captureInfo = 'True' == get_app_settings("exibir_resolucao_arquivos")
-    
-        if not captureInfo or not self.is_foto(arquivo) and not self.is_video(arquivo):
-            return ""
-
-        pattern = re.compile("(Duration: [0-9]{2,}:[0-9]{2,}:[0-9]{2,})|(Video: [^\s]+)|([0-9]{2,}x[0-9]{2,})|([0-9|.]+ fps)|(Audio: [^\s]+)|([0-9]+ Hz)")
-        args = [get_caminho_ffmpeg(), "-hide_banner", "-i", arquivo]
-
-        global g_processo_ffmpeg
-        g_processo_ffmpeg = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, universal_newlines=True)
-
-        lines = ""
-        # Inicia o processo e concatena as linhas do output
-        for line in iter(g_processo_ffmpeg.stdout.readline, ''):
-
-            # Considera apenas as linhas essenciais
-            if line.find("Stream #0") or line.find(" Duration:"):
-                lines = lines + line
-
-        if "Duration: 00:00:00" in lines:
-            lines = lines.replace("Duration: 00:00:00", "")
-            lines = lines.replace("Video: ", "")
-
-        # Recupera o texto dos grupos da regex
-        resp = ""
-        for m in pattern.finditer(lines):
-            resp = resp + m.group() + " "
-
-        # Finaliza o processo do ffmpeg
-        g_processo_ffmpeg.stdout.close()
-        g_processo_ffmpeg.wait()
-
-        return resp
-
-
-def get_destino_arquivo(arquivo):
-    global g_dic_mapeamento_dir_destino
-
-    g_dic_mapeamento_dir_destino = {} if g_dic_mapeamento_dir_destino is None else g_dic_mapeamento_dir_destino 
-    
-    nome = os.path.basename(arquivo)
-    data = datetime.datetime.fromtimestamp(os.path.getmtime(arquivo))
-
-    # Destino: /YYYY/yyyy-MM-dd/arquivo
-    destino = str(data.year) + os.sep + str(data.year) + "-" + str(data.month).zfill(2) + "-" + str(data.day).zfill(2)
-
-    if destino in g_dic_mapeamento_dir_destino:
-        destino = g_dic_mapeamento_dir_destino[destino]
-    
-    return destino + os.sep + nome
-
 
 def create_icon_and_label_button(label, icon):
     """
@@ -1354,262 +1401,96 @@ def show_message(titulo, msg):
     return None
 
 
-def indent_xml(elem, level=0):
-    """
-    Formata um arquivo XML
-    """
-    
-    i = "\n" + level * "\t"
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = i + "\t"
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-        for elem in elem:
-            indent_xml(elem, level + 1)
-        if not elem.tail or not elem.tail.strip():
-            elem.tail = i
-    else:
-        if level and (not elem.tail or not elem.tail.strip()):
-            elem.tail = i
-
-
-def set_app_settings(xml_tag, value):
-    """
-    Salva uma configuração da aplicação
-    """
-
-    debug("Salvando configuração da aplicação: " + xml_tag + " = " + value)
-    if not os.path.isfile(ARQUIVO_XML_SETTINGS):
-        indent_and_save_xml(ET.Element('config'), ARQUIVO_XML_SETTINGS)
-
-    config_tree = ET.parse(ARQUIVO_XML_SETTINGS, ET.XMLParser(remove_comments=False, strip_cdata=False))
-    root = config_tree.getroot()
-
-    # Remove o nó se já existir
-    if config_tree.find("./" + xml_tag) is not None:
-        root.remove(config_tree.find("./" + xml_tag))
-
-    # Se o valor não for nulo, adicionar o novo nó
-    if value is not None and value.strip():
-        ET.SubElement(root, xml_tag).text = value
-
-    indent_and_save_xml(config_tree.getroot(), ARQUIVO_XML_SETTINGS)
-
-
-def get_app_settings(xml_tag):
-    """
-    Recupera uma configuração da aplicação
-    """
-    
-    node_caminho = ET.parse(ARQUIVO_XML_SETTINGS, ET.XMLParser(remove_comments=False, strip_cdata=False)).find("./" + xml_tag)
-    return None if node_caminho is None else node_caminho.text
-
-
-def indent_and_save_xml(root_node, arquivo_xml):
-    """
-    Formata e salva um arquivo XML
-    """
-
-    debug("Salvando o arquivo XML: " + arquivo_xml)
-    indent_xml(root_node)
-    pretty_xml = ET.tostring(root_node, encoding="UTF-8", method="xml", xml_declaration=True)
-    arquivo = open(arquivo_xml, "wb")
-    arquivo.write(pretty_xml)
-    arquivo.close()
-
-
-def debug(msg=''):
-    """
-    Loga uma mensagem
-    """
-    
-    try:
-        linha = str(msg).strip()
-    except (UnicodeEncodeError):
-        linha = msg.encode("utf-8").strip()
-
-    g_logger.debug(linha)
-
-
-def to_human_size(nbytes):
-    """
-    Converte uma quantidade de bytes em formato de fácil visualização
-    """
-    
-    human = nbytes
-    rank = 0
-    if nbytes != 0:
-        rank = int((math.log10(nbytes)) / 3)
-        rank = min(rank, len(UNIDADES) - 1)
-        human = nbytes / (1024.0 ** rank)
-    f = ('%.2f' % human).rstrip('0').rstrip('.')
-    return '%s %s' % (f, UNIDADES[rank])
-
-
 def on_close(self, widget):  # @UnusedVariable
     """
     Fecha a aplicação, liberando o FileHandler do log
     """
-    
+
+    if main_window.analise_midias is not None:
+        main_window.analise_midias.interrompe()
+
     logHandler.close()
     g_logger.removeHandler(logHandler)
     sys.exit()
 
 
-def get_codec_info(codec):
-    """
-    Recupera os parâmtros do ffmpeg para conversão
-    """
-
-    resp = None
-    if VIDEO_H265 == codec:
-        resp = {"params":["-c:v", "libx265", "-acodec", "aac", "-strict", "-2"], "sufixo":"_H265.mp4"}
-    elif VIDEO_H264 == codec:
-        resp = {"params":["-c:v", "libx264", "-acodec", "aac", "-strict", "-2"], "sufixo":"_H264.mp4"}
-    elif VIDEO_VP8 == codec:
-        resp = {"params":["-c:v", "libvpx", "-b:v", "1M", "-c:a", "libvorbis"], "sufixo":"_VP8.webm"}
-    elif VIDEO_VP9 == codec:
-        resp = {"params":["-c:v", "libvpx-vp9", "-b:v", "2M", "-c:a", "libopus"], "sufixo":"_VP9.webm"}
-    return resp
-
-
-def get_caminho_ffmpeg():
+def main(argv):
     """
-    Recupera o caminho onde o ffmpeg está instalado
+    Inicializa e exibe a interface gráfica da aplicação
     """
-    
-    app = get_app_settings("caminho_ffmpeg")
-    return app if app is not None else "ffmpeg"
-
 
-def get_ffmpeg_features():
-    
-    """
-    Recupera uma lista com as features do ffmpeg: Ex: --enable-libx264
-    """
-    global g_lista_ffmpeg_features
+    global logHandler
+    global main_window
 
-    if g_lista_ffmpeg_features is None:
-        g_processo_ffmpeg = subprocess.Popen([get_caminho_ffmpeg()], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, universal_newlines=True)
+    # Remove o arquivo de log anterior e cria o g_logger
+    logHandler = inicializa_log(ARQUIVO_LOG)
 
-        linhas = ""
-        for line in iter(g_processo_ffmpeg.stdout.readline, ''):
-            if "--" in line:
-                linhas = linhas + line
+    # Lê os parâmetros da aplicação
+    try:
+        opts, args = getopt.getopt(argv, "h", [])  # @UnusedVariable
+    except getopt.GetoptError:
+        print('photosync.py -h (help)')
+        sys.exit(2)
+    for opt, arg in opts:  # @UnusedVariable
+        if opt == '-h':
+            print("\nPrograma para sincronização de arquivos")
+            print("\nUso: photosync.py -h (help)")
+            print("\nExemplo: ./photosync.py")
+            print("\nPara execução sem interface gráfica, utilize o photosync_cli.py")
+            sys.exit()
+
+    # Força UTF-8 por padrão
+    configura_encoding()
+
+    inicializa_settings()
+
+    main_window = MainWindow()
+
+    # Verifica a presença do ffmpeg
+    if not spawn.find_executable(get_caminho_ffmpeg()):
+        info = InputDialog(main_window, 'Informe o caminho para o ffmpeg', '', None).show_and_get_info()
+        if info is None or not spawn.find_executable(info):
+            print("Não foi possível encontrar o aplicativo necessário ffmpeg.")
+            print("Verifique a configuração do caminho do ffmpeg no arquivo settings.xml")
+            print("A configuração atual é: " + get_caminho_ffmpeg())
+            sys.exit(2)
+        else:
+            set_app_settings("caminho_ffmpeg", info)
 
-        g_processo_ffmpeg.stdout.close()
-        g_processo_ffmpeg.wait()
+    # Exibe as aopções de codec de acordo com a disponibilidade do ffmpeg
+    carrega_codecs_video()
 
-        g_lista_ffmpeg_features = []
-        pattern = re.compile("--enable-[^\s]+|disable-[^\s]+")
-        for m in pattern.finditer(linhas):
-            g_lista_ffmpeg_features.append(m.group())
+    # Calling GObject.threads_init() is not needed for PyGObject 3.10.2+
+    GObject.threads_init()
 
-    return g_lista_ffmpeg_features
+    # Monta a UI
+    main_window.connect('delete-event', on_close)
+    main_window.show_all()
+    Gtk.main()
 
 # Constantes da aplicação
 
 
 VERSAO_APPLICACAO = "v1.0"  #  Versão da aplicação
 
-
-UNIDADES = ['B', 'KB', 'MB', 'GB', 'TB', 'PB']  # Unidades de conversão bytes -> Si
-DIR_APPLICATION = os.path.dirname(os.path.realpath(__file__))  # Diretório da aplicação
-ARQUIVO_XML_SETTINGS = DIR_APPLICATION + os.sep + "settings.xml"  # Arquivo de configuração da aplicação
-ARQUIVO_LOG = DIR_APPLICATION + os.sep + "application.log"  # Arquivo de log
-
-# Codecs de Video
-VIDEO_H265 = "Video H265"
-VIDEO_H264 = "Video H264"
-VIDEO_VP8 = "Video VP8"
-VIDEO_VP9 = "Video VP9"
-CODECS_VIDEO = []
-
 # Variáveis globais da aplicação
 # Nota: por convenção, as variáveis globais são camelCase e iniciam com um 'g' 
 
 g_debug_mode = False  # True para exibir mensagens de debug
 
-# Controle do ffmpeg
-g_processo_ffmpeg = None  # Representa a instância do processo do ffmpeg
-g_lista_ffmpeg_features = None  # Dicionário com as features de compilação do ffmpeg
-
 # Variáveis dos arquivos de origem
-g_leitura_origem_finalizada = False  # Sinaliza o fim da thread de leitura de arquivos de origem 
-g_lista_arquivos_origem = None  # Lista de arquivos no diretório de origem
-g_dic_info_arquivos_origem = None  # Dicionário com informações sobre os arquivos
+g_leitura_origem = None  # Leitura (TreeScanJob) dos arquivos de origem
+g_lista_arquivos_origem = None  # Lista de arquivos (FileRecord) no diretório de origem
 
 # Variáveis dos arquivos de destino
-g_leitura_destino_finalizada = False  # Sinaliza o fim da thread de leitura de arquivos de destino
-g_lista_arquivos_destino = None  # Lista de arquivos no diretório de destino
+g_leitura_destino = None  # Leitura (TreeScanJob) dos arquivos de destino
+g_lista_arquivos_destino = None  # Catálogo (DestinationCatalog) dos arquivos no diretório de destino
 g_dic_mapeamento_dir_destino = {}  # Mapeamento dos diretórios de destino
+g_plano_sincronizacao = None  # Plano de sincronização (SyncPlan) dos arquivos da grid
 g_dic_mapeamento_dir_origem = {}  # Mapeamento dos diretórios de origem
 
-# Remove o arquivo de log anterior e cria o g_logger
-if os.path.isfile(ARQUIVO_LOG):
-    os.remove(ARQUIVO_LOG)
-
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)-15s %(message)s')
-logHandler = logging.FileHandler(ARQUIVO_LOG)
-
-g_logger = logging.getLogger('-')  # Logger da aplicação
-g_logger.addHandler(logHandler)
-
-# Lê os parâmetros da aplicação
-try:
-    opts, args = getopt.getopt(sys.argv[1:], "h", [])
-except getopt.GetoptError:
-    print('photosync.py -h (help)')
-    sys.exit(2)
-for opt, arg in opts:
-    if opt == '-h':
-        print("\nPrograma para sincronização de arquivos")
-        print("\nUso: photosync.py -h (help)")
-        print("\nExemplo: ./photosync.py")
-        sys.exit()
-
-# Força UTF-8 por padrão
-if sys.version_info < (3, 0):
-    reload(sys)
-    sys.setdefaultencoding("utf-8")
-
-if not os.path.isfile(ARQUIVO_XML_SETTINGS):
-    set_app_settings("dir_destino", str(os.path.expanduser('~')))
-    set_app_settings("dir_origem", str(os.path.expanduser('~')))
-    set_app_settings("extensoes_video", "wmv|avi|mpg|3gp|mov|m4v|mts|mp4")
-    set_app_settings("extensoes_foto", "dof|arw|raw|jpg|jpeg|png|nef")
-    set_app_settings("codec_video", "0")
-    set_app_settings("caminho_ffmpeg", "ffmpeg")
-
-main_window = MainWindow()
-
-# Verifica a presença do ffmpeg
-if not spawn.find_executable(get_caminho_ffmpeg()):
-    info = InputDialog(main_window, 'Informe o caminho para o ffmpeg', '', None).show_and_get_info()
-    if info is None or not spawn.find_executable(info):
-        print("Não foi possível encontrar o aplicativo necessário ffmpeg.")
-        print("Verifique a configuração do caminho do ffmpeg no arquivo settings.xml")
-        print("A configuração atual é: " + get_caminho_ffmpeg())
-        sys.exit(2)
-    else:
-        set_app_settings("caminho_ffmpeg", info)
-
-# Exibe as aopções de codec de acordo com a disponibilidade do ffmpeg
-if "--enable-libx264" in get_ffmpeg_features():
-    CODECS_VIDEO.append(VIDEO_H264)
-
-if "--enable-libx265" in get_ffmpeg_features():
-    CODECS_VIDEO.append(VIDEO_H265)
-
-if "--enable-libvpx" in get_ffmpeg_features():
-    CODECS_VIDEO.append(VIDEO_VP8)
-    CODECS_VIDEO.append(VIDEO_VP9)
-
-# Calling GObject.threads_init() is not needed for PyGObject 3.10.2+
-GObject.threads_init()
+main_window = None  # Janela principal da aplicação
+logHandler = None  # FileHandler do log da aplicação
 
-# Monta a UI
-main_window.connect('delete-event', on_close)
-main_window.show_all()
-Gtk.main()
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Execução do Photo Sync pela linha de comando, sem a interface gráfica.
+
+Permite efetuar importações automáticas (ex: via cron) e medir o tempo de cada etapa.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import sys
+import os
+import getopt
+import io
+import logging
+import shutil
+import tempfile
+import time
+
+from functools import partial
+
+from photosync_engine import FileCopyEngine, VideoEncodeEngine, TreeScanJob, CopyJournal, ARQUIVO_LOG, \
+    le_arquivos_origem, le_arquivos_destino, planeja_sincronizacao, filtra_fotos_e_videos, SyncItem, ACAO_IGNORAR, ACAO_COPIAR, \
+    obter_lista_videos, get_app_settings, get_app_settings_bool, inicializa_settings, inicializa_log, configura_encoding, \
+    get_caminho_ffmpeg, localiza_executavel, carrega_codecs_video, formata_metodos_copia, to_human_size, debug, \
+    define_uso_fadvise, descarta_cache, get_tamanho_em_cache, get_tamanho_buffer, TAMANHO_BUFFER_COPIA
+
+PREFIXO_BENCHMARK = ".photosync_benchmark_"  # Prefixo do diretório temporário do benchmark, no destino
+
+USO = """
+Programa para sincronização de arquivos (linha de comando)
+
+Uso: photosync_cli.py [opções]
+
+Opções:
+    -o, --origem=DIR     Diretório de origem (padrão: dir_origem do settings.xml)
+    -d, --destino=DIR    Diretório de destino (padrão: dir_destino do settings.xml)
+    -s, --simular        Apenas exibe os arquivos que seriam copiados
+    -c, --conteudo       Compara o conteúdo dos arquivos (localiza arquivos renomeados no destino)
+    -j, --threads=N      Quantidade de cópias simultâneas (padrão: threads_copia do settings.xml)
+    -r, --retomar        Retoma a cópia interrompida no diretório de destino, sem reler os diretórios
+    -l, --limite=MB/s    Limita a taxa de transferência da cópia (padrão: limite_banda_copia do settings.xml,
+                         relido durante a cópia)
+    -b, --benchmark      Mede a cópia dos arquivos de origem (vazão e uso do page cache), sem e com o posix_fadvise
+    -v, --verbose        Exibe as mensagens de log no console
+    -h, --help           Exibe esta ajuda
+
+Exemplo: ./photosync_cli.py -o /media/cartao/DCIM -d /mnt/fotos
+"""
+
+
+def exibe_progresso_copia(i, total_arquivos, arquivo, tamanho, completed_size, total):  # @UnusedVariable
+    print("[" + str(i + 1) + "/" + str(total_arquivos) + "] [" + to_human_size(completed_size) + "/" + to_human_size(total) + "] " + arquivo)
+
+
+def exibe_progresso_video(registro, novo_arquivo, completed_size, total):
+    print("[" + to_human_size(completed_size) + "/" + to_human_size(total) + "] " + registro.caminho + " -> " + novo_arquivo)
+
+
+def exibe_tempo(etapa, inicio):
+    print("Etapa '" + etapa + "' concluída em " + ('%.2f' % (time.time() - inicio)) + "s")
+
+
+def le_itens_sincronizacao(dir_origem, dir_destino, comparar_conteudo):
+    """
+    Lê os diretórios de origem e destino (em paralelo) e retorna os itens a serem copiados
+    """
+
+    # Leitura dos diretórios: origem e destino em paralelo
+    inicio = time.time()
+    # A linha de comando não exibe as informações das mídias: apenas a data de captura é lida (se configurado)
+    leitura_origem = TreeScanJob(partial(le_arquivos_origem, carregar_informacoes=False), dir_origem).inicia()
+    leitura_destino = TreeScanJob(le_arquivos_destino, dir_destino).inicia()
+
+    if leitura_origem.aguarda() is None or leitura_destino.aguarda() is None:
+        return None
+
+    lista_origem, tamanho_origem = leitura_origem.resultado
+    catalogo_destino = leitura_destino.resultado
+    print("Arquivos no diretório de origem: " + str(len(lista_origem)) + " (" + to_human_size(tamanho_origem) + ") em " + 
+          ('%.2f' % leitura_origem.duracao) + "s")
+    print("Arquivos no diretório de destino: " + str(catalogo_destino.quantidade) + " (" + to_human_size(catalogo_destino.tamanho) + ") em " + 
+          ('%.2f' % leitura_destino.duracao) + "s")
+    exibe_tempo("leitura", inicio)
+
+    # Planejamento
+    inicio = time.time()
+    plano = planeja_sincronizacao(lista_origem, catalogo_destino, comparar_conteudo=comparar_conteudo)
+    arquivos = filtra_fotos_e_videos([item for item in plano if item.acao != ACAO_IGNORAR])
+    exibe_tempo("planejamento", inicio)
+    return arquivos
+
+
+def le_itens_pendentes(dir_destino):
+    """
+    Recupera os itens não concluídos da cópia interrompida (diário da sessão no destino)
+    """
+
+    inicio = time.time()
+    try:
+        journal = CopyJournal(dir_destino)
+    except (IOError, OSError, ValueError, KeyError) as e:
+        debug("Falha na leitura do diário de cópia: " + str(e))
+        return None
+
+    arquivos = journal.itens_pendentes()
+    print("Itens pendentes da cópia interrompida: " + str(len(arquivos)) + " de " + str(len(journal.itens)))
+    for caminho in journal.ausentes:
+        print("Arquivo de origem não encontrado: " + caminho)
+    exibe_tempo("leitura", inicio)
+    return arquivos
+
+
+def formata_tamanho_cache(tamanho):
+    return to_human_size(tamanho) if tamanho is not None else "-"
+
+
+def soma_tamanho_em_cache(caminhos):
+    total = 0
+    for caminho in caminhos:
+        tamanho = get_tamanho_em_cache(caminho)
+        if tamanho is None:
+            return None
+        total += tamanho
+    return total
+
+
+def executa_benchmark(dir_origem, dir_destino, threads=None):
+    """
+    Copia os arquivos de origem para um diretório temporário no destino (FileCopyEngine, como na sincronização),
+    sem e com o posix_fadvise, exibindo a vazão e a quantidade de dados da origem e do destino que permaneceram no page cache
+    """
+
+    registros, tamanho = le_arquivos_origem(dir_origem, carregar_informacoes=False)
+    if not registros:
+        print("Nenhum arquivo no diretório de origem.")
+        return 0
+
+    print("Benchmark: " + str(len(registros)) + " arquivo(s) (" + to_human_size(tamanho) + "), buffer de cópia de " + 
+          to_human_size(get_tamanho_buffer("tamanho_buffer_copia", TAMANHO_BUFFER_COPIA)))
+    if not hasattr(os, "posix_fadvise"):
+        print("posix_fadvise não disponível neste sistema: as duas execuções são equivalentes")
+
+    # O índice e o diário da cópia ficam no diretório temporário, removido ao término de cada execução.
+    # As cópias temporárias não são registradas no cache de metadados da aplicação.
+    itens = [SyncItem(registro, "", str(i) + "_" + registro.nome, ACAO_COPIAR, registro.tipo, registro.tamanho, False)
+             for i, registro in enumerate(registros)]
+    falhou = False
+    try:
+        for descricao, usar_fadvise in (("sem fadvise", False), ("com fadvise", True)):
+            # As duas execuções partem da origem fora do cache
+            for registro in registros:
+                with io.open(registro.caminho, 'rb', buffering=0) as arquivo:
+                    descarta_cache(arquivo.fileno())
+
+            define_uso_fadvise(usar_fadvise)
+            dir_benchmark = tempfile.mkdtemp(prefix=PREFIXO_BENCHMARK, dir=dir_destino)
+            try:
+                engine_copia = FileCopyEngine(itens, dir_benchmark, threads=threads, usar_cache=False)
+                inicio = time.time()
+                engine_copia.executa()
+                duracao = max(time.time() - inicio, 0.001)
+
+                cache_origem = soma_tamanho_em_cache([registro.caminho for registro in registros])
+                cache_destino = soma_tamanho_em_cache([engine_copia.get_caminho_destino(item) for item in engine_copia.itens_destino()])
+            finally:
+                shutil.rmtree(dir_benchmark, ignore_errors=True)
+
+            print(descricao + ": " + ('%.2f' % duracao) + "s, " + to_human_size(tamanho / duracao) + "/s, em cache: origem " + 
+                  formata_tamanho_cache(cache_origem) + ", destino " + formata_tamanho_cache(cache_destino) + " - " + 
+                  formata_metodos_copia(engine_copia.metodos))
+            for arquivo, erro in engine_copia.falhas:
+                print("Falha na cópia do arquivo " + arquivo + ": " + erro)
+            falhou = falhou or engine_copia.failed
+    finally:
+        define_uso_fadvise(None)
+
+    return 1 if falhou else 0
+
+
+def main(argv):
+    """
+    Efetua a sincronização: leitura -> planejamento -> cópia -> conversão
+    """
+
+    try:
+        opts, args = getopt.getopt(argv, "ho:d:scj:rl:bv", ["help", "origem=", "destino=", "simular", "conteudo", "threads=", "retomar", "limite=", "benchmark",
+                                                         "verbose"])  # @UnusedVariable
+    except getopt.GetoptError:
+        print('photosync_cli.py -h (help)')
+        return 2
+
+    dir_origem = None
+    dir_destino = None
+    simular = False
+    comparar_conteudo = None
+    threads = None
+    retomar = False
+    benchmark = False
+    limite_banda = None
+    nivel_log = logging.WARNING
+
+    for opt, arg in opts:
+        if opt in ('-h', '--help'):
+            print(USO)
+            return 0
+        elif opt in ('-o', '--origem'):
+            dir_origem = arg
+        elif opt in ('-d', '--destino'):
+            dir_destino = arg
+        elif opt in ('-s', '--simular'):
+            simular = True
+        elif opt in ('-c', '--conteudo'):
+            comparar_conteudo = True
+        elif opt in ('-j', '--threads'):
+            try:
+                threads = max(1, int(arg))
+            except ValueError:
+                print("Quantidade de threads inválida: " + arg)
+                return 2
+        elif opt in ('-r', '--retomar'):
+            retomar = True
+        elif opt in ('-l', '--limite'):
+            try:
+                limite_banda = max(0, int(arg)) * 1024 * 1024
+            except ValueError:
+                print("Limite de transferência inválido: " + arg)
+                return 2
+        elif opt in ('-b', '--benchmark'):
+            benchmark = True
+        elif opt in ('-v', '--verbose'):
+            nivel_log = logging.DEBUG
+
+    inicializa_log(ARQUIVO_LOG, nivel_log)
+    configura_encoding()
+    inicializa_settings()
+
+    dir_origem = dir_origem if dir_origem is not None else get_app_settings("dir_origem")
+    dir_destino = dir_destino if dir_destino is not None else get_app_settings("dir_destino")
+
+    if not dir_destino or not os.path.isdir(dir_destino):
+        print("Não foi possível encontrar o diretório de destino: " + str(dir_destino))
+        return 2
+
+    if benchmark:
+        if not dir_origem or not os.path.isdir(dir_origem):
+            print("Não foi possível encontrar o diretório de origem: " + str(dir_origem))
+            return 2
+
+        return executa_benchmark(dir_origem, dir_destino, threads)
+
+    if retomar:
+        arquivos = le_itens_pendentes(dir_destino)
+    else:
+        if not dir_origem or not os.path.isdir(dir_origem):
+            print("Não foi possível encontrar o diretório de origem: " + str(dir_origem))
+            return 2
+
+        arquivos = le_itens_sincronizacao(dir_origem, dir_destino, comparar_conteudo)
+
+    if arquivos is None:
+        print("Falha na leitura dos diretórios, verifique o log para mais informações: " + ARQUIVO_LOG)
+        return 1
+
+    if simular:
+        for item in arquivos:
+            print(item.registro.caminho + " -> " + item.destino + " (" + item.acao + ")")
+        print("Arquivos a serem copiados: " + str(len(arquivos)))
+        return 0
+
+    if len(arquivos) == 0:
+        print("Nenhum arquivo a ser copiado.")
+        return 0
+
+    # Cópia
+    inicio = time.time()
+    engine_copia = FileCopyEngine(arquivos, dir_destino, callback_progresso=exibe_progresso_copia, threads=threads, limite_banda=limite_banda)
+    engine_copia.executa()
+    exibe_tempo("cópia", inicio)
+    print("Métodos de cópia utilizados: " + formata_metodos_copia(engine_copia.metodos))
+    if engine_copia.retomados:
+        print("Arquivos copiados em uma execução anterior: " + str(engine_copia.retomados))
+    falhou = engine_copia.failed
+
+    for arquivo, erro in engine_copia.falhas:
+        print("Falha na cópia do arquivo " + arquivo + ": " + erro)
+
+    # Conversão dos vídeos
+    if get_app_settings_bool("recodificar_videos"):
+        videos = obter_lista_videos(engine_copia.itens_destino())
+        if len(videos) > 0:
+            if not localiza_executavel(get_caminho_ffmpeg()):
+                print("Não foi possível encontrar o aplicativo necessário ffmpeg: " + get_caminho_ffmpeg())
+                return 2
+
+            carrega_codecs_video()
+            debug("Compactando " + str(len(videos)) + " video(s).")
+            inicio = time.time()
+            engine_video = VideoEncodeEngine(videos, dir_destino, callback_progresso=exibe_progresso_video)
+            engine_video.executa()
+            exibe_tempo("conversão", inicio)
+            falhou = falhou or engine_video.failed
+
+    if falhou:
+        print("Ocorreram falhas durante a sincronização, verifique o log para mais informações: " + ARQUIVO_LOG)
+        return 1
+
+    print("Operação de cópia dos arquivos finalizada!")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
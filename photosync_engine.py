@@ -0,0 +1,3599 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Motor de sincronização do Photo Sync, independente da interface gráfica.
+
+Contém a leitura dos diretórios, a comparação dos arquivos, a cópia e a
+re-codificação dos vídeos. A interface Gtk (photosync.py) e a linha de
+comando (photosync_cli.py) apenas utilizam as funções e classes deste módulo.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import io
+import re
+import sys
+import datetime
+import time
+import logging
+import math
+import mmap
+import errno
+import filecmp
+import collections
+import hashlib
+import json
+import struct
+import multiprocessing
+import shutil
+import sqlite3
+import stat
+import subprocess
+import tempfile
+import threading
+
+from lxml import etree as ET
+from multiprocessing.pool import ThreadPool
+
+try:
+    from hashlib import blake2b
+except ImportError:
+    try:
+        from pyblake2 import blake2b  # Backport para o Python 2: pip install pyblake2
+    except ImportError:
+        blake2b = None
+
+try:
+    import ctypes
+    import ctypes.util
+except ImportError:
+    ctypes = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # Python 2
+
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir  # Backport para o Python 2: pip install scandir
+    except ImportError:
+        scandir = None
+
+
+class FileRecord(object):
+    """
+    Registro de um arquivo lido durante a varredura dos diretórios.
+
+    As informações do stat são capturadas uma única vez, durante a leitura,
+    e reutilizadas por todas as etapas seguintes (comparação, grid, cópia).
+    """
+
+    __slots__ = ('caminho', 'nome', 'tamanho', 'mtime', 'inode', 'dev', 'tipo', 'detalhes', 'sincronizado', 'data_captura')
+
+    def __init__(self, caminho, nome, tamanho, mtime, inode=0, dev=0, tipo=None, detalhes=""):
+        self.caminho = caminho
+        self.nome = nome
+        self.tamanho = tamanho
+        self.mtime = mtime
+        self.inode = inode
+        self.dev = dev
+        self.tipo = tipo
+        self.detalhes = detalhes
+        self.sincronizado = None  # Definido pela comparação do conteúdo (ContentMatcher), quando utilizada
+        self.data_captura = None  # Data de captura 'YYYY-MM-DD', quando a opção 'usar_data_captura' estiver ativa
+
+    def __repr__(self):
+        return "FileRecord(" + self.caminho + ", " + str(self.tamanho) + ")"
+
+
+class FileCopyEngine(object):
+    """
+    Efetua a cópia dos itens do plano de sincronização (SyncItem) para o diretório de destino.
+
+    Os arquivos são copiados em paralelo por um pool de threads ('threads_copia'), limitando a
+    quantidade de cópias simultâneas em cada dispositivo ('threads_copia_dispositivo' ou, se não
+    configurado, uma única cópia nos discos rotacionais).
+
+    Os itens concluídos são registrados no diário da sessão (CopyJournal): os itens já copiados
+    em uma execução interrompida não são copiados novamente.
+
+    Com a verificação da cópia ('verificacao_copia'), o hash de cada arquivo é calculado durante a
+    própria cópia e registrado no manifesto do destino (ARQUIVO_MANIFESTO).
+
+    Ao mover arquivos, as origens são removidas apenas após a sincronização (fsync/syncfs) das cópias,
+    efetuada em lotes para reduzir o custo nos discos USB (ver sincroniza_lote). Com a opção 'sincronizar_copias',
+    as demais cópias também são sincronizadas nos lotes, liberando as páginas do destino do page cache após a gravação.
+
+    A taxa de transferência pode ser limitada em cada dispositivo de destino ('limite_banda_copia', em MB/s,
+    alterável durante a cópia) e as threads da cópia executam com a prioridade configurada (ver aplica_prioridade_thread).
+    """
+
+    def __init__(self, itens, destino, callback_progresso=None, threads=None, limite_banda=None, usar_cache=True):
+        self.itens = itens
+        self.dir_destino = destino
+        self.callback_progresso = callback_progresso
+        self.threads = threads if threads is not None else get_app_settings_int("threads_copia", THREADS_COPIA)
+        self.verificacao = get_app_settings_int("verificacao_copia", VERIFICACAO_NENHUMA)
+        self.limite_banda = limite_banda  # Bytes/s, ou None para utilizar a configuração (relida durante a cópia)
+        self.usar_cache = usar_cache  # Registra as cópias no cache de metadados (MetadataCache)
+        self.sobrescrever = get_app_settings_bool("sobrescrever_arquivos")
+        self.sincronizar_copias = get_app_settings_bool("sincronizar_copias")
+        self.reservados = set()  # Caminhos de destino já utilizados nesta execução (ver reserva_destino)
+        self.destinos = {}  # Caminho de origem -> destino (relativo) dos arquivos copiados com outro nome
+        self.limitadores = {}  # Dispositivo de destino -> BandwidthLimiter
+        self.must_stop = False
+        self.failed = False
+        self.falhas = []  # Lista de (arquivo, mensagem) dos arquivos não copiados
+        self.completed_size = 0
+        self.total = 0
+        self.concluidos = 0
+        self.retomados = 0  # Itens concluídos em uma execução anterior (diário da sessão)
+        self.indice = None
+        self.cache = None
+        self.journal = None
+        self.manifesto = None
+        self.lote = []  # Lote de (item, novo_arquivo, remover) aguardando a sincronização (ver sincroniza_lote)
+        self.tamanho_lote = 0
+        self.lock = threading.Lock()
+        self.lock_sincronizacao = threading.Lock()
+        self.lock_destinos = threading.Lock()
+        self.semaforos = {}
+        self.metodos = {}  # Quantidade de arquivos copiados por cada método (ver copia_arquivo)
+
+        for item in self.itens:
+            self.total = self.total + item.tamanho
+
+    def interrompe(self):
+        """
+        Solicita a interrupção da cópia
+        """
+
+        self.must_stop = True
+
+    def executa(self):
+        """
+        Efetua a cópia dos arquivos
+        """
+
+        self.indice = abre_indice_destino(self.dir_destino)
+        self.cache = get_cache_metadados() if self.usar_cache else None
+        self.journal = abre_journal_copia(self.dir_destino, self.itens)
+        if self.verificacao != VERIFICACAO_NENHUMA:
+            self.manifesto = io.open(os.path.join(self.dir_destino, ARQUIVO_MANIFESTO), 'a', encoding='utf-8')
+        try:
+            return self.copia_arquivos()
+        finally:
+            if self.manifesto is not None:
+                self.manifesto.close()
+
+            if self.indice is not None:
+                self.indice.fecha()
+
+            if self.journal is not None:
+                self.journal.fecha(finalizada=not self.must_stop and not self.failed)
+
+            if self.cache is not None:
+                self.cache.grava()
+
+    def copia_arquivos(self):
+        threads = max(1, min(self.threads, len(self.itens)))
+        dev_destino = os.stat(self.dir_destino).st_dev
+        debug("Copiando " + str(len(self.itens)) + " arquivo(s) com " + str(threads) + " thread(s)")
+
+        pool = ThreadPool(threads, aplica_prioridade_thread)
+        try:
+            parametros = ((item, dev_destino, indice) for indice, item in enumerate(self.itens))
+            for _ in pool.imap_unordered(lambda parametro: self.copia_item(*parametro), parametros):
+                pass
+        finally:
+            pool.close()
+            pool.join()
+
+            # Mesmo interrompida, as origens dos arquivos já copiados são removidas
+            self.sincroniza_lote()
+
+        if self.falhas:
+            debug(str(len(self.falhas)) + " arquivo(s) não copiado(s)")
+
+        if self.retomados:
+            debug(str(self.retomados) + " arquivo(s) já copiado(s) em uma execução anterior")
+
+        debug("Métodos de cópia utilizados: " + formata_metodos_copia(self.metodos))
+
+        return not self.must_stop
+
+    def copia_item(self, item, dev_destino, indice=0):
+        """
+        Executado nas threads do pool: copia um arquivo, respeitando o limite de cópias simultâneas dos dispositivos
+        """
+
+        # Verifica se a cópia foi interrompida
+        if self.must_stop:
+            return
+
+        registro = item.registro
+        arquivo = registro.caminho
+
+        # Item concluído em uma execução interrompida
+        if self.journal is not None and self.journal.concluido(item, self.get_caminho_destino(item)):
+            with self.lock:
+                self.retomados += 1
+                self.concluidos += 1
+                self.completed_size += item.tamanho
+            return
+
+        with self.lock:
+            if self.callback_progresso is not None:
+                # As threads iniciam os itens fora de ordem: o item é identificado pela posição no plano
+                self.callback_progresso(indice, len(self.itens), arquivo, item.tamanho, self.completed_size, self.total)
+
+        semaforos = self.get_semaforos(registro.dev, dev_destino)
+        for semaforo in semaforos:
+            semaforo.acquire()
+
+        try:
+            self.copia_arquivo(item, self.get_limitador(dev_destino))
+        except Exception as e:
+            debug("Falha durante a cópia do arquivo [" + arquivo + "]: " + str(e))
+            self.registra_falha(arquivo, e)
+        finally:
+            for semaforo in reversed(semaforos):
+                semaforo.release()
+
+            with self.lock:
+                self.concluidos += 1
+                self.completed_size += item.tamanho
+
+    def get_caminho_destino(self, item):
+        return self.dir_destino + os.sep + item.destino
+
+    def copia_arquivo(self, item, limitador=None):
+        registro = item.registro
+        arquivo = registro.caminho
+
+        # Cria o diretório, se não existir (outra thread pode criá-lo ao mesmo tempo)
+        novo_arquivo = self.get_caminho_destino(item)
+        dir_novo_arquivo = os.path.dirname(novo_arquivo)
+        if not os.path.isdir(dir_novo_arquivo):
+            debug("Criando o diretório " + dir_novo_arquivo)
+            try:
+                os.makedirs(dir_novo_arquivo)
+            except OSError:
+                if not os.path.isdir(dir_novo_arquivo):
+                    raise
+
+        # Um arquivo diferente já existente no destino nunca é substituído: a cópia recebe outro nome
+        novo_arquivo = self.reserva_destino(arquivo, novo_arquivo)
+        destino = os.path.join(os.path.dirname(item.destino), os.path.basename(novo_arquivo))
+        if destino != item.destino:
+            debug("Arquivo diferente existente no destino, copiando como " + novo_arquivo)
+            with self.lock:
+                self.destinos[arquivo] = destino
+
+        # No mesmo sistema de arquivos, a movimentação é apenas uma renomeação (sem copiar os dados)
+        mover = item.acao == ACAO_MOVER
+        if mover and registro.dev == os.stat(dir_novo_arquivo).st_dev and renomeia_arquivo(arquivo, novo_arquivo):
+            metodo = METODO_RENOMEAR
+            mover = False
+        else:
+            metodo, resumo = copia_arquivo(arquivo, novo_arquivo, self.verificacao, limitador)
+            if resumo is not None:
+                self.registra_manifesto(destino, resumo)
+                if self.cache is not None:
+                    self.cache.set(registro, TIPO_CACHE_HASH, resumo)
+
+        debug("Copiado (" + metodo + ") " + arquivo + " -> " + novo_arquivo)
+        with self.lock:
+            self.metodos[metodo] = self.metodos.get(metodo, 0) + 1
+
+        if self.indice is not None:
+            self.indice.registra_arquivo(novo_arquivo)
+
+        if self.cache is not None:
+            self.cache.copia(registro, novo_arquivo)
+
+        # Se selecionado a opção, remover após a cópia (e a sincronização do lote)
+        if mover:
+            try:
+                verifica_copia(arquivo, novo_arquivo)
+            except Exception as e:
+                debug("Falha na verificação da cópia [" + arquivo + "]: " + str(e))
+                self.registra_falha(arquivo, e)
+                return
+
+            self.agenda_sincronizacao(item, novo_arquivo, True)
+            return
+
+        if self.journal is not None:
+            self.journal.registra(item)
+
+        # O DONTNEED da cópia (copia_arquivo) descarta apenas as páginas já gravadas em disco. Se configurado,
+        # a cópia é sincronizada no lote para então liberar todo o cache (a verificação já efetua o fsync)
+        if metodo != METODO_RENOMEAR and not self.verificacao and self.sincronizar_copias:
+            self.agenda_sincronizacao(item, novo_arquivo, False)
+
+    def reserva_destino(self, arquivo, novo_arquivo):
+        """
+        Escolhe o caminho da cópia no destino. Caso exista um arquivo com conteúdo diferente (ex: mesmo nome e tamanho,
+        encontrado na comparação pelo conteúdo) ou o caminho já tenha sido utilizado nesta execução, é adicionado um
+        sufixo ao nome (foto_1.jpg). Com a opção 'sobrescrever_arquivos', o arquivo existente é substituído.
+        """
+
+        base, extensao = os.path.splitext(novo_arquivo)
+        candidato = novo_arquivo
+        sufixo = 0
+        with self.lock_destinos:
+            while candidato in self.reservados or (os.path.lexists(candidato) and not self.sobrescrever and
+                                                   not arquivos_iguais(arquivo, candidato)):
+                sufixo += 1
+                candidato = base + "_" + str(sufixo) + extensao
+
+            self.reservados.add(candidato)
+
+        return candidato
+
+    def itens_destino(self):
+        """
+        Itens da cópia com o destino efetivamente utilizado (ex: para a conversão dos vídeos copiados)
+        """
+
+        with self.lock:
+            return [item._replace(destino=self.destinos[item.registro.caminho]) if item.registro.caminho in self.destinos else item
+                    for item in self.itens]
+
+    def agenda_sincronizacao(self, item, novo_arquivo, remover):
+        """
+        Adiciona a cópia ao lote de sincronização (com a remoção da origem, se 'remover'),
+        sincronizando o lote quando atingir o limite de arquivos ou bytes
+        """
+
+        with self.lock:
+            self.lote.append((item, novo_arquivo, remover))
+            self.tamanho_lote += item.tamanho
+            lote_completo = len(self.lote) >= LOTE_SINCRONIZACAO_ARQUIVOS or self.tamanho_lote >= LOTE_SINCRONIZACAO_BYTES
+
+        if lote_completo:
+            self.sincroniza_lote()
+
+    def sincroniza_lote(self):
+        """
+        Garante a persistência das cópias do lote no destino, libera as páginas do page cache
+        e então remove os arquivos de origem dos itens movidos
+        """
+
+        with self.lock_sincronizacao:
+            with self.lock:
+                lote = self.lote
+                self.lote = []
+                self.tamanho_lote = 0
+
+            if not lote:
+                return
+
+            try:
+                metodo = sincroniza_arquivos([novo_arquivo for _, novo_arquivo, _ in lote], self.dir_destino)
+                debug("Lote de " + str(len(lote)) + " arquivo(s) sincronizado(s) (" + metodo + ")")
+                for _, novo_arquivo, _ in lote:
+                    libera_cache_arquivo(novo_arquivo)  # Após a sincronização as páginas podem ser descartadas
+            except (IOError, OSError) as e:
+                debug("Falha na sincronização do lote, os arquivos de origem serão mantidos: " + str(e))
+                for item, _, remover in lote:
+                    if remover:
+                        self.registra_falha(item.registro.caminho, e)
+                    else:
+                        # Cópia já concluída (e registrada no diário): apenas as páginas permanecem em cache
+                        debug("Cópia não sincronizada [" + item.registro.caminho + "]")
+                return
+
+            for item, _, remover in lote:
+                if not remover:
+                    continue
+
+                arquivo = item.registro.caminho
+                try:
+                    debug("Removendo arquivo de origem " + arquivo)
+                    os.remove(arquivo)
+                except Exception as e:
+                    debug("Falha ao remover o arquivo de origem após a cópia [" + arquivo + "]: " + str(e))
+                    self.registra_falha(arquivo, e)
+                    continue
+
+                if self.journal is not None:
+                    self.journal.registra(item)
+
+    def get_limite_banda(self):
+        """
+        Limite de transferência (bytes/s) em cada dispositivo de destino, 0 para não limitar
+        """
+
+        if self.limite_banda is not None:
+            return self.limite_banda
+        return max(0, get_app_settings_int("limite_banda_copia")) * 1024 * 1024
+
+    def define_limite_banda(self, limite):
+        """
+        Altera o limite de transferência (bytes/s) durante a cópia
+        """
+
+        debug("Limite de transferência da cópia: " + (to_human_size(limite) + "/s" if limite else "sem limite"))
+        self.limite_banda = max(0, limite)
+        with self.lock:
+            for limitador in self.limitadores.values():
+                limitador.define_taxa(self.limite_banda)
+
+    def get_limitador(self, dev):
+        with self.lock:
+            if dev not in self.limitadores:
+                self.limitadores[dev] = BandwidthLimiter(self.get_limite_banda)
+            return self.limitadores[dev]
+
+    def registra_manifesto(self, destino, resumo):
+        """
+        Registra o hash do arquivo copiado no manifesto, no formato do 'sha256sum --tag' / 'b2sum --tag'
+        """
+
+        with self.lock:
+            self.manifesto.write(NOME_HASH_MANIFESTO + " (" + destino + ") = " + resumo + "\n")
+            self.manifesto.flush()
+
+    def registra_falha(self, arquivo, erro):
+        with self.lock:
+            self.failed = True
+            self.falhas.append((arquivo, str(erro)))
+
+    def get_semaforos(self, *dispositivos):
+        """
+        Recupera os semáforos dos dispositivos (origem e destino), sempre na mesma ordem para evitar deadlocks
+        """
+
+        with self.lock:
+            resp = []
+            for dev in sorted(set(dispositivos)):
+                if dev not in self.semaforos:
+                    limite = get_limite_copias_dispositivo(dev, self.threads)
+                    debug("Limite de cópias simultâneas no dispositivo " + str(dev) + ": " + str(limite))
+                    self.semaforos[dev] = threading.BoundedSemaphore(limite)
+                resp.append(self.semaforos[dev])
+
+            return resp
+
+
+def renomeia_arquivo(origem, destino):
+    """
+    Move o arquivo renomeando-o (mesmo sistema de arquivos). Retorna False se não for possível (ex: dispositivos diferentes)
+    """
+
+    try:
+        os.rename(origem, destino)
+        return True
+    except OSError as e:
+        debug("Não foi possível renomear o arquivo [" + origem + "], será copiado: " + str(e))
+        return False
+
+
+def arquivos_iguais(arquivo, outro):
+    """
+    Compara o conteúdo de dois arquivos
+    """
+
+    try:
+        return os.path.getsize(arquivo) == os.path.getsize(outro) and filecmp.cmp(arquivo, outro, shallow=False)
+    except OSError:
+        return False
+
+
+def verifica_copia(origem, destino):
+    """
+    Verifica se o arquivo copiado está íntegro antes da remoção da origem
+    """
+
+    tamanho_origem = os.stat(origem).st_size
+    tamanho_destino = os.stat(destino).st_size
+    if tamanho_origem != tamanho_destino:
+        raise IOError("Tamanho do arquivo copiado (" + str(tamanho_destino) + ") difere da origem (" + str(tamanho_origem) + ")")
+
+
+def copia_arquivo(origem, destino, verificacao=None, limitador=None):
+    """
+    Copia o conteúdo e os metadados do arquivo (como o shutil.copy2), utilizando a transferência mais eficiente disponível:
+    reflink (FICLONE), copy_file_range, sendfile ou leituras em um buffer grande.
+
+    Os dados são gravados em um arquivo temporário (oculto), renomeado apenas ao término da cópia:
+    uma cópia interrompida nunca deixa um arquivo incompleto com o nome final.
+
+    Com a verificação, os dados passam pelo buffer e o hash é calculado na mesma leitura da origem.
+    A cópia é então verificada (releitura completa ou por amostragem) antes de receber o nome final.
+
+    Com o limitador (BandwidthLimiter), os dados são transferidos em blocos menores, respeitando a taxa configurada.
+
+    Retorna o método utilizado e o hash do conteúdo (None sem a verificação, verificacao=VERIFICACAO_NENHUMA ou None).
+    """
+
+    temporario = get_arquivo_temporario(destino)
+    resumo = None
+    try:
+        with io.open(origem, 'rb', buffering=0) as entrada:
+            with io.open(temporario, 'wb', buffering=0) as saida:
+                tamanho = os.fstat(entrada.fileno()).st_size
+                aconselha_arquivo(entrada.fileno(), "SEQUENTIAL")
+                if verificacao:
+                    resumo = novo_hash()
+                    metodo = METODO_BUFFER
+                    _copia_buffer(entrada, saida, tamanho, limitador, resumo)
+                    # Os dados devem estar no disco para serem relidos sem o cache (releitura completa ou por amostragem):
+                    # o DONTNEED não descarta páginas ainda não gravadas
+                    os.fsync(saida.fileno())
+                else:
+                    metodo = None
+                    for metodo, funcao in METODOS_COPIA:
+                        if metodo not in g_metodos_copia_indisponiveis and funcao(entrada, saida, tamanho, limitador):
+                            break
+
+                # Os dados copiados não serão relidos: libera o cache (no destino, inicia a gravação em disco)
+                aconselha_arquivo(entrada.fileno(), "DONTNEED")
+                aconselha_arquivo(saida.fileno(), "DONTNEED")
+
+        if resumo is not None:
+            resumo = resumo.hexdigest()
+            if verificacao == VERIFICACAO_COMPLETA:
+                verifica_releitura(temporario, resumo)
+            else:
+                verifica_amostragem(origem, temporario)
+
+        shutil.copystat(origem, temporario)
+        substitui_arquivo(temporario, destino, sincronizar=False)
+    except:
+        try:
+            os.remove(temporario)
+        except OSError:
+            pass
+        raise
+
+    return metodo, resumo
+
+
+def verifica_releitura(caminho, resumo):
+    """
+    Verifica a cópia relendo todo o arquivo do disco (sem o cache) e comparando com o hash calculado na cópia
+    """
+
+    resumo_copia = calcula_hash_sem_cache(caminho)
+    if resumo_copia != resumo:
+        raise IOError("Falha na verificação da cópia: hash " + resumo_copia + " difere da origem " + resumo)
+
+
+def verifica_amostragem(origem, destino):
+    """
+    Verifica a cópia comparando blocos (inicial, final e intermediários) da origem e do destino
+    """
+
+    tamanho = os.path.getsize(origem)
+    if os.path.getsize(destino) != tamanho:
+        raise IOError("Falha na verificação da cópia: tamanho difere da origem")
+
+    with io.open(origem, 'rb', buffering=0) as arquivo_origem:
+        with io.open(destino, 'rb', buffering=0) as arquivo_destino:
+            descarta_cache(arquivo_destino.fileno())
+            for posicao in get_posicoes_amostragem(tamanho):
+                arquivo_origem.seek(posicao)
+                arquivo_destino.seek(posicao)
+                if arquivo_origem.read(TAMANHO_AMOSTRA_VERIFICACAO) != arquivo_destino.read(TAMANHO_AMOSTRA_VERIFICACAO):
+                    raise IOError("Falha na verificação da cópia: conteúdo difere da origem na posição " + str(posicao))
+
+
+def get_posicoes_amostragem(tamanho):
+    """
+    Posições dos blocos comparados na verificação por amostragem, distribuídas uniformemente no arquivo
+    """
+
+    ultimo = max(0, tamanho - TAMANHO_AMOSTRA_VERIFICACAO)
+    if ultimo == 0:
+        return [0]
+
+    amostras = AMOSTRAS_VERIFICACAO - 1
+    return sorted(set(ultimo * i // amostras for i in range(amostras + 1)))
+
+
+def descarta_cache(fd):
+    """
+    Remove do page cache as páginas (já gravadas) do arquivo, forçando as próximas leituras a partir do disco
+    """
+
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass
+
+
+def usa_fadvise():
+    """
+    Indica se os padrões de acesso dos arquivos devem ser informados ao kernel (posix_fadvise).
+
+    Desabilitado com a configuração 'manter_cache_arquivos' (ou no Windows/Python 2, sem o posix_fadvise).
+    """
+
+    global g_usar_fadvise
+
+    if g_usar_fadvise is None:
+        g_usar_fadvise = hasattr(os, "posix_fadvise") and not get_app_settings_bool("manter_cache_arquivos")
+
+    return g_usar_fadvise
+
+
+def define_uso_fadvise(usar):
+    """
+    Habilita ou desabilita o posix_fadvise, independente da configuração (ex: benchmark). None volta a utilizar a configuração
+    """
+
+    global g_usar_fadvise
+
+    g_usar_fadvise = None if usar is None else usar and hasattr(os, "posix_fadvise")
+
+
+def aconselha_arquivo(fd, conselho, posicao=0, tamanho=0):
+    """
+    Informa ao kernel o padrão de acesso do arquivo: SEQUENTIAL (aumenta a leitura antecipada), WILLNEED
+    (antecipa a leitura do trecho) ou DONTNEED (libera o trecho do page cache)
+    """
+
+    if not usa_fadvise():
+        return
+
+    try:
+        os.posix_fadvise(fd, posicao, tamanho, getattr(os, "POSIX_FADV_" + conselho))
+    except OSError:
+        pass
+
+
+def libera_cache_arquivo(caminho):
+    if not usa_fadvise():
+        return
+
+    try:
+        fd = os.open(caminho, os.O_RDONLY)
+        try:
+            aconselha_arquivo(fd, "DONTNEED")
+        finally:
+            os.close(fd)
+    except OSError as e:
+        debug("Falha ao liberar o cache do arquivo [" + caminho + "]: " + str(e))
+
+
+def get_tamanho_buffer(xml_tag, padrao):
+    """
+    Tamanho do buffer das leituras, configurado em KiB ('tamanho_buffer_copia' e 'tamanho_buffer_hash')
+    """
+
+    return max(TAMANHO_BUFFER_MINIMO, get_app_settings_int(xml_tag, padrao // 1024) * 1024)
+
+
+def get_tamanho_em_cache(caminho):
+    """
+    Quantidade de bytes do arquivo presentes no page cache (mincore), ou None caso não seja possível verificar
+    """
+
+    libc = get_libc()
+    tamanho = os.path.getsize(caminho)
+    if libc is None or tamanho == 0:
+        return None if libc is None else 0
+
+    fd = os.open(caminho, os.O_RDONLY)
+    try:
+        endereco = libc.mmap(None, tamanho, mmap.PROT_READ, mmap.MAP_SHARED, fd, 0)
+        if endereco is None or endereco == ctypes.c_void_p(-1).value:
+            return None
+
+        try:
+            paginas = (ctypes.c_ubyte * ((tamanho + mmap.PAGESIZE - 1) // mmap.PAGESIZE))()
+            if libc.mincore(endereco, tamanho, paginas) != 0:
+                return None
+            return sum(pagina & 1 for pagina in paginas) * mmap.PAGESIZE
+        finally:
+            libc.munmap(endereco, tamanho)
+    finally:
+        os.close(fd)
+
+
+def calcula_hash_sem_cache(caminho):
+    """
+    Calcula o hash do arquivo lendo diretamente do disco: O_DIRECT, ou descartando o cache do arquivo se não suportado
+    """
+
+    if hasattr(os, "O_DIRECT") and hasattr(os, "readv"):
+        try:
+            fd = os.open(caminho, os.O_RDONLY | os.O_DIRECT)
+        except OSError:
+            fd = None  # Sistema de arquivos sem suporte (ex: tmpfs)
+
+        if fd is not None:
+            try:
+                # O O_DIRECT exige um buffer alinhado: a memória do mmap é alinhada à página
+                buffer = mmap.mmap(-1, TAMANHO_BUFFER_HASH)
+                visao = memoryview(buffer)
+                resp = novo_hash()
+                while True:
+                    lidos = os.readv(fd, [buffer])
+                    if not lidos:
+                        break
+                    resp.update(visao[:lidos])
+                return resp.hexdigest()
+            except OSError as e:
+                if e.errno != errno.EINVAL:
+                    raise
+                debug("Leitura com O_DIRECT não suportada, descartando o cache do arquivo: " + caminho)
+            finally:
+                os.close(fd)
+
+    with io.open(caminho, 'rb', buffering=0) as arquivo:
+        descarta_cache(arquivo.fileno())
+    return calcula_hash_completo(caminho)
+
+
+def get_arquivo_temporario(arquivo):
+    """
+    Nome do arquivo temporário da cópia: oculto, para ser ignorado na leitura do destino
+    """
+
+    return os.path.join(os.path.dirname(arquivo), "." + os.path.basename(arquivo) + SUFIXO_TEMPORARIO)
+
+
+def _copia_reflink(entrada, saida, tamanho, limitador=None):  # @UnusedVariable
+    """
+    Compartilha os blocos do arquivo de origem (btrfs, XFS), sem copiar os dados
+    """
+
+    if fcntl is None or not sys.platform.startswith("linux"):
+        g_metodos_copia_indisponiveis.add(METODO_REFLINK)
+        return False
+
+    try:
+        fcntl.ioctl(saida.fileno(), FICLONE, entrada.fileno())
+        return True
+    except (IOError, OSError):
+        return False
+
+
+def _copia_kernel(funcao, metodo, entrada, saida, tamanho, limitador=None):
+    """
+    Copia os dados dentro do kernel, retornando False caso a transferência não seja suportada entre os arquivos
+    """
+
+    copiado = 0
+    try:
+        while copiado < tamanho:
+            bloco = BLOCO_COPIA_KERNEL
+            if limitador is not None and limitador.limitado():
+                bloco = get_tamanho_buffer("tamanho_buffer_copia", TAMANHO_BUFFER_COPIA)
+
+            enviado = funcao(entrada.fileno(), saida.fileno(), copiado, min(tamanho - copiado, bloco))
+            if enviado == 0:
+                break
+            aconselha_arquivo(entrada.fileno(), "DONTNEED", copiado, enviado)
+            copiado += enviado
+            if limitador is not None:
+                limitador.consome(enviado)
+    except OSError as e:
+        if copiado > 0 or e.errno not in ERROS_COPIA_NAO_SUPORTADA:
+            raise
+        if e.errno == errno.ENOSYS:
+            g_metodos_copia_indisponiveis.add(metodo)
+        return False
+
+    if copiado == tamanho:
+        return True
+    if copiado == 0:
+        return False  # Sistema de arquivos sem suporte (ex: retorna 0 bytes)
+
+    raise IOError("Cópia incompleta: " + str(copiado) + " de " + str(tamanho) + " bytes")
+
+
+def _copia_copy_file_range(entrada, saida, tamanho, limitador=None):
+    if not hasattr(os, "copy_file_range"):
+        g_metodos_copia_indisponiveis.add(METODO_COPY_FILE_RANGE)
+        return False
+
+    return _copia_kernel(lambda origem, destino, posicao, quantidade: os.copy_file_range(origem, destino, quantidade, posicao, posicao),
+                         METODO_COPY_FILE_RANGE, entrada, saida, tamanho, limitador)
+
+
+def _copia_sendfile(entrada, saida, tamanho, limitador=None):
+    if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+        g_metodos_copia_indisponiveis.add(METODO_SENDFILE)
+        return False
+
+    # O sendfile escreve na posição atual do arquivo de destino
+    return _copia_kernel(lambda origem, destino, posicao, quantidade: os.sendfile(destino, origem, posicao, quantidade),
+                         METODO_SENDFILE, entrada, saida, tamanho, limitador)
+
+
+def _copia_buffer(entrada, saida, tamanho, limitador=None, resumo=None):  # @UnusedVariable
+    """
+    Copia os dados pelo espaço do usuário, em leituras grandes e sem buffer intermediário, atualizando o hash (se informado)
+    """
+
+    tamanho_buffer = get_tamanho_buffer("tamanho_buffer_copia", TAMANHO_BUFFER_COPIA)
+    buffer = bytearray(tamanho_buffer)
+    visao = memoryview(buffer)
+    posicao = 0
+    aconselha_arquivo(entrada.fileno(), "WILLNEED", 0, tamanho_buffer)
+    while True:
+        lidos = entrada.readinto(buffer)
+        if not lidos:
+            break
+
+        # Antecipa a leitura do próximo bloco e libera o bloco já lido
+        aconselha_arquivo(entrada.fileno(), "WILLNEED", posicao + lidos, tamanho_buffer)
+        aconselha_arquivo(entrada.fileno(), "DONTNEED", posicao, lidos)
+        posicao += lidos
+
+        if resumo is not None:
+            resumo.update(visao[:lidos])
+        escritos = 0
+        while escritos < lidos:
+            escritos += saida.write(visao[escritos:lidos])
+
+        if limitador is not None:
+            limitador.consome(lidos)
+
+    return True
+
+
+def formata_metodos_copia(metodos):
+    """
+    Formata a quantidade de arquivos copiados por cada método. Ex: 'reflink: 10, copy_file_range: 2'
+    """
+
+    ordem = [METODO_RENOMEAR] + [metodo for metodo, _ in METODOS_COPIA]
+    return ", ".join(metodo + ": " + str(metodos[metodo]) for metodo in ordem if metodo in metodos) or "-"
+
+
+class BandwidthLimiter(object):
+    """
+    Limita a taxa de transferência (bytes/s) com um token bucket, compartilhado pelas threads da cópia.
+
+    A taxa é consultada na função informada (no máximo uma vez por segundo), permitindo alterá-la durante a cópia.
+    O bucket acumula no máximo 1 segundo de transferência: após um período ocioso, a rajada é limitada.
+    """
+
+    INTERVALO_CONSULTA = 1.0
+
+    def __init__(self, funcao_taxa):
+        self.funcao_taxa = funcao_taxa
+        self.lock = threading.Lock()
+        self.taxa = 0
+        self.tokens = 0
+        self.ultimo = time.time()
+        self.ultima_consulta = 0
+
+    def define_taxa(self, taxa):
+        with self.lock:
+            self.taxa = taxa
+            self.tokens = min(self.tokens, taxa)
+            self.ultima_consulta = time.time()
+
+    def atualiza_taxa(self, agora):
+        if agora - self.ultima_consulta >= self.INTERVALO_CONSULTA:
+            self.ultima_consulta = agora
+            taxa = self.funcao_taxa()
+            if taxa != self.taxa:
+                debug("Limite de transferência da cópia: " + (to_human_size(taxa) + "/s" if taxa else "sem limite"))
+                self.taxa = taxa
+                self.tokens = min(self.tokens, taxa)
+
+    def limitado(self):
+        with self.lock:
+            self.atualiza_taxa(time.time())
+            return self.taxa > 0
+
+    def consome(self, quantidade):
+        """
+        Consome os tokens da transferência, aguardando caso a taxa tenha sido excedida
+        """
+
+        with self.lock:
+            agora = time.time()
+            self.atualiza_taxa(agora)
+            if self.taxa <= 0:
+                self.ultimo = agora
+                return
+
+            self.tokens = min(self.taxa, self.tokens + (agora - self.ultimo) * self.taxa) - quantidade
+            self.ultimo = agora
+            espera = -self.tokens / self.taxa if self.tokens < 0 else 0
+
+        if espera > 0:
+            time.sleep(espera)
+
+
+def aplica_prioridade_thread():
+    """
+    Executado no início de cada thread da cópia: aplica a prioridade de CPU ('nice_copia') e de
+    I/O ('classe_io_copia') configuradas apenas na própria thread (Linux, Python 3.8+)
+    """
+
+    nice = get_app_settings_int("nice_copia")
+    classe_io = get_app_settings_int("classe_io_copia")
+    if not (nice or classe_io) or not sys.platform.startswith("linux") or not hasattr(threading, "get_native_id"):
+        return
+
+    # No Linux, as prioridades de um tid são aplicadas apenas à thread
+    tid = threading.get_native_id()
+    if nice and hasattr(os, "setpriority"):
+        try:
+            os.setpriority(os.PRIO_PROCESS, tid, os.getpriority(os.PRIO_PROCESS, tid) + nice)
+        except OSError as e:
+            debug("Falha ao alterar a prioridade da thread " + str(tid) + ": " + str(e))
+
+    comando = get_comando_ionice(classe_io)
+    if comando:
+        try:
+            subprocess.check_call(comando + ["-p", str(tid)])
+        except (OSError, subprocess.CalledProcessError) as e:
+            debug("Falha ao alterar a prioridade de I/O da thread " + str(tid) + ": " + str(e))
+
+
+def get_comando_ionice(classe_io):
+    """
+    Comando do ionice para a classe de I/O: 2 (best-effort, menor prioridade) ou 3 (idle). Lista vazia se não disponível
+    """
+
+    if classe_io not in (CLASSE_IO_BEST_EFFORT, CLASSE_IO_IDLE):
+        return []
+
+    ionice = localiza_executavel("ionice")
+    if ionice is None:
+        return []
+
+    comando = [ionice, "-c", str(classe_io)]
+    if classe_io == CLASSE_IO_BEST_EFFORT:
+        comando += ["-n", "7"]
+    return comando
+
+
+def get_comando_prioridade():
+    """
+    Prefixo dos comandos executados pela aplicação (ex: ffmpeg), aplicando as prioridades de CPU e I/O configuradas
+    """
+
+    comando = get_comando_ionice(get_app_settings_int("classe_io_copia"))
+
+    nice = get_app_settings_int("nice_copia")
+    if nice > 0:
+        executavel = localiza_executavel("nice")
+        if executavel is not None:
+            comando += [executavel, "-n", str(nice)]
+
+    return comando
+
+
+def localiza_executavel(nome):
+    """
+    Caminho completo do executável, procurado no PATH. None se não encontrado
+    """
+
+    if hasattr(shutil, "which"):
+        return shutil.which(nome)
+
+    from distutils import spawn  # Python 2
+    return spawn.find_executable(nome)
+
+
+class CopyJournal(object):
+    """
+    Diário da sessão de cópia, gravado na raiz do destino (append-only, um registro JSON por linha).
+
+    Registra os itens da sessão e cada item concluído, permitindo que uma cópia interrompida seja
+    retomada sem reler os diretórios (photosync_cli.py -r) e sem copiar novamente os itens concluídos.
+    Os arquivos de origem são registrados pelo caminho absoluto (a retomada pode ocorrer em outro diretório de trabalho).
+    O diário é removido quando a sessão termina sem falhas.
+    """
+
+    ARQUIVO_JOURNAL = ".photosync_journal"
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.arquivo = os.path.join(raiz, self.ARQUIVO_JOURNAL)
+        self.itens = collections.OrderedDict()  # (caminho, destino) -> registro do item
+        self.concluidos = set()
+        self.ausentes = []  # Arquivos de origem não encontrados na recuperação dos itens pendentes
+        self.lock = threading.Lock()
+        self.saida = None
+        self.carrega()
+
+    @staticmethod
+    def _chave(item):
+        return os.path.abspath(item.registro.caminho), item.destino
+
+    def carrega(self):
+        if not os.path.isfile(self.arquivo):
+            return
+
+        with io.open(self.arquivo, 'r', encoding='utf-8') as entrada:
+            for linha in entrada:
+                try:
+                    registro = json.loads(linha)
+                except ValueError:
+                    continue  # Linha incompleta: interrupção durante a gravação
+
+                chave = (registro["caminho"], registro["destino"])
+                if registro.get("concluido"):
+                    self.concluidos.add(chave)
+                else:
+                    self.itens[chave] = registro
+
+        debug("Diário de cópia carregado: " + str(len(self.concluidos)) + " de " + str(len(self.itens)) + " item(ns) concluído(s)")
+
+    def pendente(self):
+        """
+        Verifica se existe uma sessão interrompida, com itens não concluídos
+        """
+
+        return any(chave not in self.concluidos for chave in self.itens)
+
+    def abre(self, itens):
+        """
+        Abre o diário para gravação, registrando os itens da sessão
+        """
+
+        # Arquivos temporários de uma execução interrompida (ex: queda de energia)
+        self.remove_temporarios()
+
+        self.saida = io.open(self.arquivo, 'a', encoding='utf-8')
+        novos = []
+        for item in itens:
+            chave = self._chave(item)
+            if chave not in self.itens:
+                registro = {"caminho": chave[0], "destino": item.destino, "pasta": item.pasta, "acao": item.acao}
+                self.itens[chave] = registro
+                novos.append(registro)
+
+        self._grava(novos)
+
+    def _grava(self, registros):
+        with self.lock:
+            for registro in registros:
+                self.saida.write(json.dumps(registro) + "\n")
+            self.saida.flush()
+
+    def concluido(self, item, caminho_destino):
+        """
+        Verifica se o item foi concluído em uma execução anterior (e o arquivo continua no destino)
+        """
+
+        if self._chave(item) not in self.concluidos:
+            return False
+
+        try:
+            return os.path.getsize(caminho_destino) == item.tamanho
+        except OSError:
+            return False
+
+    def registra(self, item):
+        chave = self._chave(item)
+        with self.lock:
+            self.concluidos.add(chave)
+        self._grava([{"caminho": chave[0], "destino": chave[1], "concluido": True}])
+
+    def remove_temporarios(self):
+        """
+        Remove os arquivos temporários (get_arquivo_temporario) deixados nos diretórios de destino dos itens do diário
+        """
+
+        diretorios = set(os.path.dirname(os.path.join(self.raiz, registro["destino"])) for registro in self.itens.values())
+        for diretorio in diretorios:
+            try:
+                nomes = os.listdir(diretorio)
+            except OSError:
+                continue
+
+            for nome in nomes:
+                if nome.startswith('.') and nome.endswith(SUFIXO_TEMPORARIO):
+                    temporario = os.path.join(diretorio, nome)
+                    debug("Removendo arquivo temporário de uma cópia interrompida: " + temporario)
+                    try:
+                        os.remove(temporario)
+                    except OSError as e:
+                        debug("Falha ao remover o arquivo temporário [" + temporario + "]: " + str(e))
+
+    def fecha(self, finalizada):
+        if self.saida is not None:
+            self.saida.close()
+            self.saida = None
+
+        if finalizada:
+            try:
+                os.remove(self.arquivo)
+            except OSError as e:
+                debug("Não foi possível remover o diário de cópia " + self.arquivo + ": " + str(e))
+
+    def itens_pendentes(self, classificador=None):
+        """
+        Recupera os itens (SyncItem) não concluídos da sessão, consultando apenas os próprios arquivos de origem
+        """
+
+        classificador = get_classificador() if classificador is None else classificador
+        resp = []
+        for chave, registro in self.itens.items():
+            if chave in self.concluidos:
+                continue
+
+            caminho = registro["caminho"]
+            try:
+                st = os.stat(caminho)
+            except OSError as e:
+                debug("Arquivo de origem não encontrado, ignorando [" + caminho + "]: " + str(e))
+                self.ausentes.append(caminho)
+                continue
+
+            nome = os.path.basename(caminho)
+            arquivo = FileRecord(caminho, nome, st.st_size, st.st_mtime, st.st_ino, st.st_dev, classificador.classifica(nome))
+            resp.append(SyncItem(arquivo, registro["pasta"], registro["destino"], registro["acao"], arquivo.tipo, arquivo.tamanho, False))
+
+        return resp
+
+
+def abre_journal_copia(diretorio, itens):
+    """
+    Abre o diário de cópia do destino, retornando None caso não seja possível (ex: destino somente leitura)
+    """
+
+    try:
+        journal = CopyJournal(diretorio)
+        journal.abre(itens)
+        return journal
+    except (IOError, OSError, ValueError, KeyError) as e:
+        debug("Não foi possível abrir o diário de cópia do destino " + diretorio + ": " + str(e))
+        return None
+
+
+def get_limite_copias_dispositivo(dev, threads):
+    """
+    Recupera a quantidade máxima de cópias simultâneas no dispositivo: configuração 'threads_copia_dispositivo'
+    ou, se não configurado, 1 para discos rotacionais e a quantidade de threads para os demais
+    """
+
+    limite = get_app_settings_int("threads_copia_dispositivo")
+    if limite > 0:
+        return limite
+
+    return 1 if is_dispositivo_rotacional(dev) else max(1, threads)
+
+
+def is_dispositivo_rotacional(dev):
+    """
+    Verifica se o dispositivo é um disco rotacional (Linux: /sys/dev/block/<major>:<minor>/queue/rotational)
+    """
+
+    return _le_atributo_dispositivo(dev, "queue/rotational") == "1"
+
+
+def is_dispositivo_removivel(dev):
+    """
+    Verifica se o dispositivo é removível, como os cartões de memória e pen drives (Linux: /sys/dev/block/<major>:<minor>/removable)
+    """
+
+    return _le_atributo_dispositivo(dev, "removable") == "1"
+
+
+def _le_atributo_dispositivo(dev, atributo):
+    """
+    Lê o atributo do dispositivo de bloco no sysfs (Linux), retornando None caso não seja possível
+    """
+
+    if not dev or not hasattr(os, "major"):
+        return None
+
+    caminho = "/sys/dev/block/" + str(os.major(dev)) + ":" + str(os.minor(dev))
+
+    # As partições não possuem os atributos da fila e do dispositivo, que ficam no dispositivo pai
+    for arquivo in (caminho + "/" + atributo, caminho + "/../" + atributo):
+        try:
+            with open(arquivo) as entrada:
+                return entrada.read().strip()
+        except (IOError, OSError):
+            continue
+
+    return None
+
+
+class VideoEncodeEngine(object):
+    """
+    Efetua a re-codificação dos vídeos (SyncItem) copiados para o diretório de destino
+    """
+
+    DURATION = "Duration:"
+    FRAME = "frame="
+    TIME = "time="
+
+    def __init__(self, itens, destino, callback_progresso=None, callback_arquivo=None):
+        self.itens = itens
+        self.dir_destino = destino
+        self.callback_progresso = callback_progresso
+        self.callback_arquivo = callback_arquivo
+        self.must_stop = False
+        self.failed = False
+        self.completed_size = 0
+        self.total = 0
+        self.processo_ffmpeg = None
+
+        for item in self.itens:
+            self.total = self.total + item.tamanho
+
+    def interrompe(self):
+        """
+        Solicita a interrupção da conversão, finalizando o processo do ffmpeg em execução
+        """
+
+        self.must_stop = True
+        if self.processo_ffmpeg is not None:
+            try:
+                self.processo_ffmpeg.kill()
+                debug("O processo do ffmpeg foi interrompido pelo usuário.")
+            except OSError:
+                debug("O processo do ffmpeg foi finalizado com sucesso.")
+
+    def executa(self):
+        """
+        Efetua a conversão dos videos
+        """
+
+        # Recupera o codec e o path do ffmpeg
+        codec_info = get_codec_info(CODECS_VIDEO[get_app_settings_int("codec_video")])
+        remover_video_apos_conversao = get_app_settings_bool("remover_video_apos_conversao")
+
+        for item in self.itens:
+            registro = item.registro
+            # O vídeo convertido é a cópia no destino, não o arquivo de origem (que pode ter sido removido)
+            arquivo = self.dir_destino + os.sep + item.destino
+            try:
+
+                if not os.path.isfile(arquivo):
+                    debug("Ignorando aquivo inexistente: " + arquivo)
+                    self.failed = True
+                    continue
+
+                self.completed_size = self.completed_size + item.tamanho
+
+                # Monta os parâmetros para a criação do novo video, de acordo com o codec escolhido
+                args = [get_caminho_ffmpeg(), "-hide_banner", "-i", arquivo]
+                args.extend(codec_info["params"])
+                novo_arquivo = arquivo[:arquivo.rindex('.')] + codec_info["sufixo"]
+                args.append(novo_arquivo)
+
+                # Atualiza as estatíticas do total e o nome do arquivo de destino
+                if self.callback_progresso is not None:
+                    self.callback_progresso(registro, novo_arquivo, self.completed_size, self.total)
+
+                # Cria o diretório, se não existir
+                directory = os.path.dirname(novo_arquivo)
+                if not os.path.exists(directory):
+                    debug("Criando o diretório " + directory)
+                    os.makedirs(directory)
+
+                # Verifica se o vídeo de destino existe
+                if os.path.isfile(novo_arquivo):
+                    debug("Removendo arquivo de destino existente: " + novo_arquivo)
+                    os.remove(novo_arquivo)
+
+                max_secs = 0
+                cur_secs = 0
+
+                # Checa se o usuário interrrompeu a conversão
+                if self.must_stop:
+                    return False
+
+                # Efetua a conversão do arquivo de video
+                args = get_comando_prioridade() + args
+                debug("Executando aplicação: " + str(args))
+                self.processo_ffmpeg = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, universal_newlines=True)
+
+                # Inicia o processo e itera entre as linhas recebidas no stdout
+                for line in iter(self.processo_ffmpeg.stdout.readline, ''):
+                    if self.DURATION in line:
+                        # Essa linha contém o tamanho total do vídeo
+                        try:
+                            tmp = line[line.find(self.DURATION):]
+                            tmp = tmp[tmp.find(" ") + 1:]
+                            tmp = tmp[0: tmp.find(".")]
+                            x = time.strptime(tmp, '%H:%M:%S')
+                            max_secs = datetime.timedelta(hours=x.tm_hour, minutes=x.tm_min, seconds=x.tm_sec).total_seconds()
+                        except ValueError:
+                            debug("Falha ao converter o horário: " + tmp)
+
+                    elif line.startswith(self.FRAME) and self.TIME in line:
+                        try:
+                            # Captura o tempo da conversão (timestamp)
+                            tmp = line[line.find(self.TIME):]
+                            tmp = tmp[tmp.find("=") + 1: tmp.find(".")]
+                            x = time.strptime(tmp, '%H:%M:%S')
+                            cur_secs = datetime.timedelta(hours=x.tm_hour, minutes=x.tm_min, seconds=x.tm_sec).total_seconds()
+                        except ValueError:
+                            debug("Falha ao converter o horário: " + tmp)
+
+                    # Atualiza o progresso da conversão do arquivo de destino
+                    if cur_secs > 0 and max_secs > 0 and self.callback_arquivo is not None:
+                        self.callback_arquivo(cur_secs / max_secs)
+
+                # Finaliza o processo do ffmpeg
+                self.processo_ffmpeg.stdout.close()
+                self.processo_ffmpeg.wait()
+
+                debug("Vídeo original: " + arquivo + " (" + to_human_size(registro.tamanho) + ")")
+
+                if os.path.isfile(novo_arquivo):
+                    debug("Vídeo convertido: " + novo_arquivo + " (" + to_human_size(os.stat(novo_arquivo).st_size) + ")")
+
+                # Remove a cópia do video original
+                if remover_video_apos_conversao and os.path.isfile(arquivo):
+                    debug("Removendo a cópia do video original: " + arquivo)
+                    os.remove(arquivo)
+
+            except Exception as e:
+                debug("Falha ao converter o arquivo de vídeo " + arquivo + " : " + str(e))
+                self.failed = True
+
+        return True
+
+
+class _DirEntryCompat(object):
+    """
+    Emula o os.DirEntry quando o scandir não está disponível (Python 2 sem o backport)
+    """
+
+    __slots__ = ('name', 'path', '_stat')
+
+    def __init__(self, diretorio, nome):
+        self.name = nome
+        self.path = os.path.join(diretorio, nome)
+        self._stat = None
+
+    def is_dir(self, follow_symlinks=True):
+        if not follow_symlinks:
+            return stat.S_ISDIR(os.lstat(self.path).st_mode)
+        return os.path.isdir(self.path)
+
+    def is_file(self, follow_symlinks=True):  # @UnusedVariable
+        return stat.S_ISREG(self.stat().st_mode)
+
+    def stat(self, follow_symlinks=True):  # @UnusedVariable
+        if self._stat is None:
+            self._stat = os.stat(self.path)
+        return self._stat
+
+
+def _lista_diretorio(diretorio):
+    if scandir is not None:
+        return scandir(diretorio)
+    return [_DirEntryCompat(diretorio, nome) for nome in os.listdir(diretorio)]
+
+
+def _le_entradas(diretorio):
+    """
+    Lê as entradas de um diretório, retornando a lista de (nome, stat) dos arquivos e a lista de sub-diretórios.
+
+    Assim como o glob('*.*') utilizado anteriormente, considera apenas os arquivos que
+    possuem extensão e não são ocultos.
+    """
+
+    arquivos = []
+    subdiretorios = []
+    for entrada in _lista_diretorio(diretorio):
+        try:
+            if entrada.is_dir(follow_symlinks=False):
+                subdiretorios.append(entrada.name)
+                continue
+
+            nome = entrada.name
+            if nome.startswith('.') or '.' not in nome or not entrada.is_file():
+                continue
+
+            arquivos.append((nome, entrada.stat()))
+        except OSError as e:
+            debug("Falha ao ler o arquivo " + entrada.path + ": " + str(e))
+
+    return arquivos, subdiretorios
+
+
+def _le_entradas_seguro(diretorio):
+    try:
+        return _le_entradas(diretorio)
+    except OSError as e:
+        debug("Falha ao ler o diretório " + diretorio + ": " + str(e))
+        return None
+
+
+def scan_tree(raiz, classificador=None, callback_progresso=None, callback_lote=None):
+    """
+    Percorre a árvore de diretórios uma única vez (os.scandir), retornando a lista de FileRecord.
+
+    Os diretórios de cada nível da árvore são lidos em paralelo no pool de leitura.
+    O tamanho, mtime e inode são capturados do stat da própria entrada do diretório,
+    evitando novas consultas nas etapas seguintes.
+    Os arquivos de cada diretório são repassados ao callback_lote assim que são lidos.
+    """
+
+    classificador = get_classificador() if classificador is None else classificador
+    pool = get_pool_leitura()
+    registros = []
+    nivel = [raiz]
+
+    while nivel:
+        proximo_nivel = []
+        for diretorio, resultado in zip(nivel, pool.imap(_le_entradas_seguro, nivel)):
+            if resultado is None:
+                continue
+
+            arquivos, subdiretorios = resultado
+            lote = [FileRecord(os.path.join(diretorio, nome), nome, st.st_size, st.st_mtime, st.st_ino, st.st_dev,
+                               classificador.classifica(nome)) for nome, st in arquivos]
+            registros.extend(lote)
+
+            if lote and callback_lote is not None:
+                callback_lote(lote)
+
+            proximo_nivel.extend(os.path.join(diretorio, nome) for nome in subdiretorios)
+
+            if callback_progresso is not None:
+                callback_progresso(len(registros))
+
+        nivel = proximo_nivel
+
+    return registros
+
+
+def get_pool_leitura():
+    """
+    Recupera o pool de threads utilizado na leitura dos diretórios (criado na primeira utilização)
+    """
+
+    global g_pool_leitura
+
+    with g_lock_pool:
+        if g_pool_leitura is None:
+            threads = max(1, get_app_settings_int("threads_leitura", THREADS_LEITURA))
+            debug("Criando o pool de leitura com " + str(threads) + " thread(s)")
+            g_pool_leitura = ThreadPool(threads)
+
+    return g_pool_leitura
+
+
+class TreeScanJob(object):
+    """
+    Executa a leitura de uma árvore de diretórios em uma thread separada.
+
+    O término é sinalizado pelo evento 'concluido', e o progresso (quantidade de arquivos
+    encontrados) é repassado ao callback no máximo a cada INTERVALO_PROGRESSO segundos.
+    """
+
+    INTERVALO_PROGRESSO = 0.2
+
+    def __init__(self, funcao_leitura, diretorio, callback_progresso=None, callback_concluido=None, callback_lote=None):
+        self.funcao_leitura = funcao_leitura
+        self.diretorio = diretorio
+        self.callback_progresso = callback_progresso
+        self.callback_concluido = callback_concluido
+        self.callback_lote = callback_lote
+        self.concluido = threading.Event()
+        self.resultado = None
+        self.erro = None
+        self.arquivos_lidos = 0
+        self.duracao = 0
+        self.ultimo_progresso = 0
+
+    def inicia(self):
+        thread = threading.Thread(target=self.executa)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def atualiza_progresso(self, arquivos_lidos):
+        self.arquivos_lidos = arquivos_lidos
+        agora = time.time()
+        if self.callback_progresso is not None and agora - self.ultimo_progresso >= self.INTERVALO_PROGRESSO:
+            self.ultimo_progresso = agora
+            self.callback_progresso(self, arquivos_lidos)
+
+    def executa(self):
+        inicio = time.time()
+        parametros = {"callback_progresso": self.atualiza_progresso}
+        if self.callback_lote is not None:
+            parametros["callback_lote"] = self.callback_lote
+
+        try:
+            self.resultado = self.funcao_leitura(self.diretorio, **parametros)
+        except Exception as e:
+            debug("Falha na leitura do diretório " + self.diretorio + ": " + str(e))
+            self.erro = e
+        finally:
+            self.duracao = time.time() - inicio
+            self.concluido.set()
+
+        if self.callback_concluido is not None:
+            self.callback_concluido(self)
+
+    def finalizado(self):
+        return self.concluido.is_set()
+
+    def aguarda(self, timeout=None):
+        """
+        Aguarda o término da leitura, retornando o resultado
+        """
+
+        self.concluido.wait(timeout)
+        return self.resultado
+
+
+class DestinationIndex(object):
+    """
+    Índice persistente (SQLite) dos arquivos do diretório de destino.
+
+    O índice é gravado na raiz do destino e atualizado de forma incremental: apenas os
+    diretórios cujo mtime mudou desde a última leitura são relidos. Os demais têm seus
+    arquivos e sub-diretórios recuperados do índice, sem nenhuma listagem no disco.
+
+    Nota: o mtime de um diretório muda apenas quando entradas são criadas, removidas ou
+    renomeadas. Arquivos alterados no próprio local (sem renomear) não são detectados.
+    """
+
+    ARQUIVO_INDICE = ".photosync_index.db"
+    VERSAO_INDICE = 1
+    MARGEM_MTIME = 2  # Diretórios alterados há menos de N segundos são relidos na próxima atualização
+
+    def __init__(self, raiz):
+        self.raiz = raiz
+        self.arquivo_db = os.path.join(raiz, self.ARQUIVO_INDICE)
+        self.lock = threading.RLock()
+        self.conexao = sqlite3.connect(self.arquivo_db, check_same_thread=False)
+        if sys.version_info < (3, 0):
+            self.conexao.text_factory = str
+        self.conexao.execute("PRAGMA synchronous = NORMAL")
+        self.cria_tabelas()
+
+    def cria_tabelas(self):
+        versao = self.conexao.execute("PRAGMA user_version").fetchone()[0]
+        if versao != self.VERSAO_INDICE:
+            debug("Criando o índice do diretório de destino: " + self.arquivo_db)
+            self.conexao.execute("DROP TABLE IF EXISTS diretorios")
+            self.conexao.execute("DROP TABLE IF EXISTS arquivos")
+            self.conexao.execute("CREATE TABLE diretorios (caminho TEXT PRIMARY KEY, pai TEXT, mtime REAL)")
+            self.conexao.execute("CREATE TABLE arquivos (diretorio TEXT, nome TEXT, tamanho INTEGER, mtime REAL, inode INTEGER, "
+                                 "PRIMARY KEY (diretorio, nome))")
+            self.conexao.execute("PRAGMA user_version = " + str(self.VERSAO_INDICE))
+            self.conexao.commit()
+
+    def fecha(self):
+        with self.lock:
+            self.conexao.commit()
+            self.conexao.close()
+
+    def _caminho_absoluto(self, relativo):
+        return os.path.join(self.raiz, relativo) if relativo else self.raiz
+
+    def _caminho_relativo(self, diretorio):
+        relativo = os.path.relpath(diretorio, self.raiz)
+        if relativo == os.curdir:
+            return ""
+        if relativo == os.pardir or relativo.startswith(os.pardir + os.sep):
+            return None
+        return relativo
+
+    def _mtime_confiavel(self, mtime):
+        # Alterações no mesmo segundo da leitura poderiam passar despercebidas
+        return -1 if time.time() - mtime < self.MARGEM_MTIME else mtime
+
+    def atualiza(self, classificador=None, callback_progresso=None):
+        """
+        Atualiza o índice, relendo apenas os diretórios alterados, e retorna a lista de FileRecord do destino.
+
+        Assim como no scan_tree, os diretórios de cada nível são verificados em paralelo.
+        """
+
+        classificador = get_classificador() if classificador is None else classificador
+
+        with self.lock:
+            conexao = self.conexao
+            conhecidos = {}
+            filhos = {}
+            for caminho, pai, mtime in conexao.execute("SELECT caminho, pai, mtime FROM diretorios"):
+                conhecidos[caminho] = mtime
+                if caminho:
+                    filhos.setdefault(pai, []).append(caminho)
+
+            def verifica_diretorio(relativo):
+                # Executado no pool de leitura: lista o diretório apenas se o mtime mudou
+                diretorio = self._caminho_absoluto(relativo)
+                try:
+                    st = os.stat(diretorio)
+                    if conhecidos.get(relativo) == st.st_mtime:
+                        return st, None
+                    return st, _le_entradas(diretorio)
+                except OSError as e:
+                    debug("Falha ao ler o diretório " + diretorio + ": " + str(e))
+                    return None
+
+            pool = get_pool_leitura()
+            dispositivos = {}
+            relidos = 0
+            arquivos_lidos = 0
+            nivel = [""]
+            while nivel:
+                proximo_nivel = []
+                for relativo, resultado in zip(nivel, pool.imap(verifica_diretorio, nivel)):
+                    if resultado is None:
+                        continue
+
+                    st, listagem = resultado
+                    dispositivos[relativo] = st.st_dev
+
+                    if listagem is None:
+                        # Diretório inalterado: os sub-diretórios são recuperados do índice
+                        proximo_nivel.extend(filhos.get(relativo, ()))
+                        continue
+
+                    arquivos, subdiretorios = listagem
+                    relidos += 1
+                    arquivos_lidos += len(arquivos)
+                    conexao.execute("DELETE FROM arquivos WHERE diretorio = ?", (relativo,))
+                    conexao.executemany("INSERT INTO arquivos VALUES (?, ?, ?, ?, ?)",
+                                        [(relativo, nome, a.st_size, a.st_mtime, a.st_ino) for nome, a in arquivos])
+                    conexao.execute("INSERT OR REPLACE INTO diretorios VALUES (?, ?, ?)",
+                                    (relativo, os.path.dirname(relativo), self._mtime_confiavel(st.st_mtime)))
+
+                    proximo_nivel.extend(os.path.join(relativo, nome) if relativo else nome for nome in subdiretorios)
+
+                    if callback_progresso is not None:
+                        callback_progresso(arquivos_lidos)
+
+                nivel = proximo_nivel
+
+            # Remove do índice os diretórios que não existem mais
+            removidos = [(caminho,) for caminho in conhecidos if caminho not in dispositivos]
+            conexao.executemany("DELETE FROM diretorios WHERE caminho = ?", removidos)
+            conexao.executemany("DELETE FROM arquivos WHERE diretorio = ?", removidos)
+            conexao.commit()
+
+            debug("Índice do destino atualizado: " + str(relidos) + " diretório(s) relido(s) de " + str(len(dispositivos)))
+
+            registros = []
+            for relativo, nome, tamanho, mtime, inode in conexao.execute("SELECT diretorio, nome, tamanho, mtime, inode FROM arquivos"):
+                registros.append(FileRecord(os.path.join(self._caminho_absoluto(relativo), nome), nome, tamanho, mtime, inode,
+                                            dispositivos.get(relativo, 0), classificador.classifica(nome)))
+
+        if callback_progresso is not None:
+            callback_progresso(len(registros))
+
+        return registros
+
+    def _registra_diretorio(self, relativo):
+        """
+        Atualiza o mtime do diretório alterado pela aplicação, registrando também os diretórios criados
+        """
+
+        conhecido = self.conexao.execute("SELECT 1 FROM diretorios WHERE caminho = ?", (relativo,)).fetchone() is not None
+        mtime = os.stat(self._caminho_absoluto(relativo)).st_mtime
+        self.conexao.execute("INSERT OR REPLACE INTO diretorios VALUES (?, ?, ?)",
+                             (relativo, os.path.dirname(relativo), self._mtime_confiavel(mtime)))
+
+        # Um diretório novo altera o mtime do diretório pai
+        if not conhecido and relativo:
+            self._registra_diretorio(os.path.dirname(relativo))
+
+    def registra_arquivo(self, caminho):
+        """
+        Registra no índice um arquivo gravado no destino pela aplicação
+        """
+
+        relativo = self._caminho_relativo(os.path.dirname(caminho))
+        if relativo is None:
+            return
+
+        st = os.stat(caminho)
+        with self.lock:
+            self.conexao.execute("INSERT OR REPLACE INTO arquivos VALUES (?, ?, ?, ?, ?)",
+                                 (relativo, os.path.basename(caminho), st.st_size, st.st_mtime, st.st_ino))
+            self._registra_diretorio(relativo)
+
+
+def abre_indice_destino(diretorio):
+    """
+    Abre o índice do diretório de destino, retornando None caso não seja possível (ex: destino somente leitura)
+    """
+
+    try:
+        return DestinationIndex(diretorio)
+    except sqlite3.Error as e:
+        debug("Não foi possível abrir o índice do diretório de destino " + diretorio + ": " + str(e))
+        return None
+
+
+def le_arquivos_origem(diretorio, callback_progresso=None, callback_lote=None, carregar_informacoes=True):
+    """
+    Lê a árvore de diretórios de origem, retornando a lista de FileRecord e o tamanho total em bytes.
+
+    Cada lote de arquivos lidos é repassado ao callback_lote já com as informações da mídia,
+    permitindo exibir os arquivos antes do término da leitura.
+    Com carregar_informacoes=False, as informações das mídias devem ser carregadas sob demanda (MediaProbeScheduler).
+    """
+
+    def carrega_informacoes(registro):
+        try:
+            # Carrega a informação do arquivo
+            registro.detalhes = get_file_info(registro)
+        except:
+            debug("Falha ao ler o arquivo de origem " + registro.caminho)
+
+    def carrega_data_captura(registro):
+        try:
+            registro.data_captura = get_data_captura(registro)
+        except:
+            debug("Falha ao ler a data de captura do arquivo de origem " + registro.caminho)
+
+    def processa_lote(lote):
+        # As mídias de cada lote são analisadas em paralelo
+        if usar_data_captura:
+            get_pool_midia().map(carrega_data_captura, lote)
+
+        if exibir_informacoes:
+            get_pool_midia().map(carrega_informacoes, lote)
+
+        if callback_lote is not None:
+            callback_lote(lote)
+
+    exibir_informacoes = carregar_informacoes and get_app_settings_bool("exibir_resolucao_arquivos")
+    usar_data_captura = get_app_settings_bool("usar_data_captura")
+
+    registros = scan_tree(diretorio, callback_progresso=callback_progresso, callback_lote=processa_lote)
+
+    cache = get_cache_metadados()
+    if cache is not None:
+        cache.grava()
+
+    tamanho = 0
+    for registro in registros:
+        tamanho = tamanho + registro.tamanho  # in bytes
+
+    debug("Arquivos no diretório de origem: " + str(len(registros)) + " (" + to_human_size(tamanho) + ")")
+    return registros, tamanho
+
+
+class DestinationCatalog(object):
+    """
+    Catálogo dos arquivos do destino, indexado por (nome, tamanho).
+
+    O tamanho é capturado durante a leitura do destino, de forma que a verificação
+    de sincronização é uma única consulta ao conjunto, sem nenhum acesso ao disco.
+    """
+
+    def __init__(self, registros=()):
+        self.chaves = set()
+        self.por_tamanho = {}
+        self.quantidade = 0
+        self.tamanho = 0
+
+        for registro in registros:
+            self.adiciona(registro)
+
+    def adiciona(self, registro):
+        self.chaves.add((registro.nome, registro.tamanho))
+        self.por_tamanho.setdefault(registro.tamanho, []).append(registro)
+        self.quantidade += 1
+        self.tamanho += registro.tamanho
+
+    def contem(self, registro):
+        return (registro.nome, registro.tamanho) in self.chaves
+
+
+def le_arquivos_destino(diretorio, callback_progresso=None):
+    """
+    Lê a árvore de diretórios de destino, retornando o DestinationCatalog com os arquivos encontrados.
+
+    Sempre que possível utiliza o índice persistente do destino (DestinationIndex).
+    """
+
+    indice = abre_indice_destino(diretorio)
+    if indice is not None:
+        try:
+            registros = indice.atualiza(callback_progresso=callback_progresso)
+        except sqlite3.Error as e:
+            debug("Falha ao atualizar o índice do diretório de destino: " + str(e))
+            registros = scan_tree(diretorio, callback_progresso=callback_progresso)
+        finally:
+            indice.fecha()
+    else:
+        registros = scan_tree(diretorio, callback_progresso=callback_progresso)
+
+    catalogo = DestinationCatalog(registros)
+
+    debug("Arquivos no diretório de destino: " + str(catalogo.quantidade) + " (" + to_human_size(catalogo.tamanho) + ")")
+    return catalogo
+
+
+def get_file_is_sync(registro, catalogo_destino):
+    """
+    Verifica se existe no destino um arquivo com o mesmo nome e tamanho.
+
+    Caso o conteúdo já tenha sido comparado (ContentMatcher), utiliza o resultado da comparação.
+    """
+
+    if registro.sincronizado is not None:
+        return registro.sincronizado
+    return catalogo_destino.contem(registro)
+
+
+class SyncItem(collections.namedtuple('SyncItem', ['registro', 'pasta', 'destino', 'acao', 'tipo', 'tamanho', 'existe'])):
+    """
+    Item (imutável) do plano de sincronização.
+
+    pasta: diretório de destino pela data do arquivo (YYYY/yyyy-MM-dd), antes do mapeamento
+    destino: caminho relativo de destino, com o mapeamento aplicado
+    existe: indica se o arquivo já existe no destino
+    """
+
+    __slots__ = ()
+
+
+class SyncPlan(object):
+    """
+    Plano de sincronização: destino e ação de cada arquivo de origem, calculados uma única vez.
+
+    O plano não é alterado: as alterações (mapeamento, situação, exclusão de arquivos) geram um
+    novo plano, reaproveitando os itens não afetados. O índice pasta -> itens permite localizar
+    os itens afetados por uma alteração do mapeamento sem percorrer todo o plano.
+    """
+
+    def __init__(self, itens, mapeamento=None, acao_copia=None):
+        self.itens = tuple(itens)
+        self.mapeamento = dict(mapeamento or {})
+        self.acao_copia = acao_copia if acao_copia is not None else get_acao_copia()
+        self.por_registro = {}
+        self.por_pasta = {}
+
+        for item in self.itens:
+            self.por_registro[item.registro] = item
+            self.por_pasta.setdefault(item.pasta, []).append(item)
+
+    def __len__(self):
+        return len(self.itens)
+
+    def __iter__(self):
+        return iter(self.itens)
+
+    def item(self, registro):
+        return self.por_registro.get(registro)
+
+    def copia(self, registros):
+        """
+        Recupera os itens a serem copiados: os arquivos ignorados, quando selecionados, são copiados novamente
+        """
+
+        resp = []
+        for registro in registros:
+            item = self.por_registro[registro]
+            resp.append(item._replace(acao=self.acao_copia) if item.acao == ACAO_IGNORAR else item)
+        return resp
+
+    def pastas_alteradas(self, mapeamento):
+        """
+        Recupera as pastas cujo destino é alterado pelo novo mapeamento
+        """
+
+        return set(pasta for pasta in set(self.mapeamento) | set(mapeamento)
+                   if pasta in self.por_pasta and self.mapeamento.get(pasta, pasta) != mapeamento.get(pasta, pasta))
+
+    def com_mapeamento(self, mapeamento):
+        """
+        Cria um novo plano com o mapeamento, recalculando apenas os destinos das pastas com o mapeamento alterado
+        """
+
+        substituidos = []
+        for pasta in self.pastas_alteradas(mapeamento):
+            for item in self.por_pasta[pasta]:
+                substituidos.append(item._replace(destino=aplica_mapeamento(pasta, item.registro.nome, mapeamento)))
+
+        return self._substitui(substituidos, mapeamento)
+
+    def com_situacao(self, catalogo_destino):
+        """
+        Cria um novo plano recalculando a situação de sincronização de cada item (ex: após a comparação do conteúdo)
+        """
+
+        sobrescrever = get_app_settings_bool("sobrescrever_arquivos")
+        substituidos = []
+        for item in self.itens:
+            existe = get_file_is_sync(item.registro, catalogo_destino)
+            if existe != item.existe:
+                substituidos.append(item._replace(existe=existe, acao=ACAO_IGNORAR if existe and not sobrescrever else self.acao_copia))
+
+        return self._substitui(substituidos, self.mapeamento)
+
+    def _substitui(self, substituidos, mapeamento):
+        """
+        Cria um novo plano substituindo apenas os itens informados, sem reconstruir os índices dos demais
+        """
+
+        plano = SyncPlan((), mapeamento, self.acao_copia)
+        plano.por_registro = dict(self.por_registro)
+        plano.por_pasta = dict(self.por_pasta)
+
+        pastas = set()
+        for item in substituidos:
+            plano.por_registro[item.registro] = item
+            pastas.add(item.pasta)
+
+        for pasta in pastas:
+            plano.por_pasta[pasta] = [plano.por_registro[item.registro] for item in self.por_pasta[pasta]]
+
+        plano.itens = tuple(plano.por_registro[item.registro] for item in self.itens) if substituidos else self.itens
+        return plano
+
+    def sem_registros(self, registros):
+        """
+        Cria um novo plano sem os arquivos informados (ex: arquivos apagados)
+        """
+
+        removidos = set(registros)
+        return SyncPlan([item for item in self.itens if item.registro not in removidos], self.mapeamento, self.acao_copia)
+
+
+def get_acao_copia():
+    """
+    Recupera a ação dos arquivos que devem ser copiados: copiar ou mover (remover a origem após a cópia)
+    """
+
+    return ACAO_MOVER if get_app_settings_bool("remover_apos_copia") else ACAO_COPIAR
+
+
+def planeja_itens(registros_origem, catalogo_destino, mapeamento=None):
+    """
+    Calcula os itens do plano de sincronização dos arquivos de origem
+    """
+
+    mapeamento = {} if mapeamento is None else mapeamento
+    sobrescrever = get_app_settings_bool("sobrescrever_arquivos")
+    acao_copia = get_acao_copia()
+
+    itens = []
+    for registro in registros_origem:
+        existe = get_file_is_sync(registro, catalogo_destino)
+        pasta = get_pasta_destino(registro)
+        itens.append(SyncItem(registro, pasta, aplica_mapeamento(pasta, registro.nome, mapeamento),
+                              ACAO_IGNORAR if existe and not sobrescrever else acao_copia, registro.tipo, registro.tamanho, existe))
+
+    return itens
+
+
+def planeja_sincronizacao(registros_origem, catalogo_destino, mapeamento=None, comparar_conteudo=None):
+    """
+    Cria o plano de sincronização dos arquivos de origem, comparando o conteúdo dos arquivos se configurado
+    """
+
+    if comparar_conteudo is None:
+        comparar_conteudo = get_app_settings_bool("comparar_conteudo")
+
+    if comparar_conteudo and not get_app_settings_bool("sobrescrever_arquivos"):
+        ContentMatcher(catalogo_destino).verifica(registros_origem)
+
+    return SyncPlan(planeja_itens(registros_origem, catalogo_destino, mapeamento), mapeamento)
+
+
+class ContentMatcher(object):
+    """
+    Verifica pelo conteúdo quais arquivos de origem já existem no destino, independente do nome.
+
+    Para cada arquivo de origem, apenas os arquivos do destino com o mesmo tamanho são candidatos.
+    Os candidatos são filtrados por uma impressão parcial (tamanho + blocos inicial e final) e,
+    apenas quando as impressões coincidem, confirmados pelo hash completo do arquivo.
+    Os hashes são calculados no pool de hash e mantidos no MetadataCache.
+    """
+
+    def __init__(self, catalogo_destino, cache=None):
+        self.catalogo = catalogo_destino
+        self.cache = get_cache_metadados() if cache is None else cache
+
+    def _calcula(self, funcao, tipo, registros):
+        """
+        Calcula (ou recupera do cache) o hash de cada registro em paralelo, retornando o dicionário caminho -> hash
+        """
+
+        resultado = {}
+        pendentes = []
+        for registro in registros:
+            valor = self.cache.get(registro, tipo) if self.cache is not None else None
+            if valor is not None:
+                resultado[registro.caminho] = valor
+            else:
+                pendentes.append(registro)
+
+        def calcula(registro):
+            try:
+                return registro, funcao(registro.caminho, registro.tamanho)
+            except (IOError, OSError) as e:
+                debug("Falha ao calcular o hash do arquivo " + registro.caminho + ": " + str(e))
+                return registro, None
+
+        for registro, valor in get_pool_hash().imap_unordered(calcula, pendentes):
+            if valor is not None:
+                resultado[registro.caminho] = valor
+                if self.cache is not None:
+                    self.cache.set(registro, tipo, valor)
+
+        return resultado
+
+    def verifica(self, registros, callback_progresso=None):
+        """
+        Define o atributo 'sincronizado' de cada registro de origem, retornando a quantidade de arquivos encontrados no destino
+        """
+
+        candidatos = {}
+        envolvidos = {}
+        for registro in registros:
+            destinos = [d for d in self.catalogo.por_tamanho.get(registro.tamanho, ()) if d.caminho != registro.caminho]
+            if destinos:
+                candidatos[registro] = destinos
+                envolvidos[registro.caminho] = registro
+                for destino in destinos:
+                    envolvidos[destino.caminho] = destino
+            else:
+                registro.sincronizado = False
+
+        debug("Comparando o conteúdo de " + str(len(candidatos)) + " arquivo(s) com candidatos no destino")
+
+        # Impressão parcial de todos os arquivos envolvidos
+        parciais = self._calcula(calcula_impressao_parcial, TIPO_CACHE_PARCIAL, envolvidos.values())
+        if callback_progresso is not None:
+            callback_progresso(len(parciais))
+
+        confirmar = {}
+        for registro, destinos in candidatos.items():
+            impressao = parciais.get(registro.caminho)
+            iguais = [d for d in destinos if impressao is not None and parciais.get(d.caminho) == impressao]
+            if not iguais:
+                registro.sincronizado = False
+            elif registro.tamanho <= 2 * TAMANHO_BLOCO_IMPRESSAO:
+                # A impressão parcial de arquivos pequenos já contém todo o conteúdo
+                registro.sincronizado = True
+            else:
+                confirmar[registro] = iguais
+
+        # Hash completo apenas dos arquivos com impressões coincidentes
+        envolvidos = {}
+        for registro, iguais in confirmar.items():
+            envolvidos[registro.caminho] = registro
+            for destino in iguais:
+                envolvidos[destino.caminho] = destino
+
+        completos = self._calcula(calcula_hash_completo, TIPO_CACHE_HASH, envolvidos.values())
+        for registro, iguais in confirmar.items():
+            valor = completos.get(registro.caminho)
+            registro.sincronizado = valor is not None and any(completos.get(d.caminho) == valor for d in iguais)
+
+        if self.cache is not None:
+            self.cache.grava()
+
+        encontrados = len([registro for registro in candidatos if registro.sincronizado])
+        debug("Comparação do conteúdo concluída: " + str(encontrados) + " arquivo(s) encontrado(s) no destino")
+        return encontrados
+
+
+def novo_hash():
+    """
+    Cria o objeto de hash: BLAKE2b (Python 3.6+ ou pyblake2), ou SHA-256 caso não esteja disponível
+    """
+
+    if blake2b is not None:
+        return blake2b(digest_size=32)
+    return hashlib.sha256()
+
+
+def calcula_hash_completo(caminho, tamanho=None):  # @UnusedVariable
+    """
+    Calcula o hash de todo o conteúdo do arquivo, utilizando leituras grandes sem buffer intermediário
+    """
+
+    resp = novo_hash()
+    buffer = bytearray(get_tamanho_buffer("tamanho_buffer_hash", TAMANHO_BUFFER_HASH))
+    visao = memoryview(buffer)
+    with io.open(caminho, 'rb', buffering=0) as arquivo:
+        aconselha_arquivo(arquivo.fileno(), "SEQUENTIAL")
+        while True:
+            lidos = arquivo.readinto(buffer)
+            if not lidos:
+                break
+            resp.update(visao[:lidos])
+        aconselha_arquivo(arquivo.fileno(), "DONTNEED")
+
+    return resp.hexdigest()
+
+
+def calcula_impressao_parcial(caminho, tamanho):
+    """
+    Calcula a impressão parcial do arquivo: tamanho + blocos inicial e final.
+
+    Arquivos com até 2 blocos têm todo o conteúdo considerado.
+    """
+
+    if tamanho <= 2 * TAMANHO_BLOCO_IMPRESSAO:
+        return calcula_hash_completo(caminho)
+
+    resp = novo_hash()
+    resp.update(str(tamanho).encode("ascii"))
+    with io.open(caminho, 'rb', buffering=0) as arquivo:
+        resp.update(arquivo.read(TAMANHO_BLOCO_IMPRESSAO))
+        arquivo.seek(-TAMANHO_BLOCO_IMPRESSAO, os.SEEK_END)
+        resp.update(arquivo.read(TAMANHO_BLOCO_IMPRESSAO))
+
+    return resp.hexdigest()
+
+
+def get_pool_midia():
+    """
+    Recupera o pool de threads da análise das mídias, limitando a quantidade de processos do ffprobe simultâneos
+    """
+
+    global g_pool_midia
+
+    with g_lock_pool:
+        if g_pool_midia is None:
+            threads = get_threads_midia()
+            debug("Criando o pool de análise das mídias com " + str(threads) + " thread(s)")
+            g_pool_midia = ThreadPool(threads)
+
+    return g_pool_midia
+
+
+def get_threads_midia():
+    return max(1, get_app_settings_int("threads_midia", multiprocessing.cpu_count()))
+
+
+def get_semaforo_midia(dev):
+    """
+    Recupera o semáforo que limita as análises simultâneas (leitura dos cabeçalhos, ffprobe) de arquivos do dispositivo:
+    configuração 'threads_midia_dispositivo' ou, se não configurado, LIMITE_ANALISES_DISPOSITIVO_LENTO nos discos
+    rotacionais e removíveis (ex: cartões de memória) e a quantidade de threads da análise nos demais
+    """
+
+    with g_lock_pool:
+        if dev not in g_semaforos_midia:
+            limite = get_app_settings_int("threads_midia_dispositivo")
+            if limite <= 0:
+                lento = is_dispositivo_rotacional(dev) or is_dispositivo_removivel(dev)
+                limite = LIMITE_ANALISES_DISPOSITIVO_LENTO if lento else get_threads_midia()
+            debug("Limite de análises simultâneas das mídias no dispositivo " + str(dev) + ": " + str(limite))
+            g_semaforos_midia[dev] = threading.BoundedSemaphore(limite)
+
+        return g_semaforos_midia[dev]
+
+
+def get_pool_hash():
+    """
+    Recupera o pool de threads utilizado no cálculo dos hashes (o hashlib libera o GIL durante o cálculo)
+    """
+
+    global g_pool_hash
+
+    with g_lock_pool:
+        if g_pool_hash is None:
+            threads = max(1, get_app_settings_int("threads_hash", multiprocessing.cpu_count()))
+            debug("Criando o pool de hash com " + str(threads) + " thread(s)")
+            g_pool_hash = ThreadPool(threads)
+
+    return g_pool_hash
+
+
+class MetadataCache(object):
+    """
+    Cache persistente (SQLite) de informações calculadas para cada arquivo (hashes, etc).
+
+    Cada valor é associado ao caminho e a um tipo, e só é considerado válido enquanto o
+    tamanho e o mtime do arquivo forem os mesmos de quando foi calculado.
+    """
+
+    VERSAO_CACHE = 1
+    GRAVACOES_POR_TRANSACAO = 500
+
+    def __init__(self, arquivo_db):
+        self.arquivo_db = arquivo_db
+        self.lock = threading.RLock()
+        self.pendentes = 0
+        self.conexao = sqlite3.connect(arquivo_db, check_same_thread=False)
+        if sys.version_info < (3, 0):
+            self.conexao.text_factory = str
+        self.conexao.execute("PRAGMA synchronous = NORMAL")
+
+        if self.conexao.execute("PRAGMA user_version").fetchone()[0] != self.VERSAO_CACHE:
+            debug("Criando o cache de informações dos arquivos: " + arquivo_db)
+            self.conexao.execute("DROP TABLE IF EXISTS metadados")
+            self.conexao.execute("CREATE TABLE metadados (caminho TEXT, tipo TEXT, tamanho INTEGER, mtime REAL, valor TEXT, "
+                                 "PRIMARY KEY (caminho, tipo))")
+            self.conexao.execute("PRAGMA user_version = " + str(self.VERSAO_CACHE))
+            self.conexao.commit()
+
+    def get(self, registro, tipo):
+        with self.lock:
+            linha = self.conexao.execute("SELECT tamanho, mtime, valor FROM metadados WHERE caminho = ? AND tipo = ?",
+                                         (os.path.abspath(registro.caminho), tipo)).fetchone()
+
+        if linha is None or linha[0] != registro.tamanho or linha[1] != registro.mtime:
+            return None
+        return linha[2]
+
+    def set(self, registro, tipo, valor):
+        with self.lock:
+            self.conexao.execute("INSERT OR REPLACE INTO metadados VALUES (?, ?, ?, ?, ?)",
+                                 (os.path.abspath(registro.caminho), tipo, registro.tamanho, registro.mtime, valor))
+            self.pendentes += 1
+            if self.pendentes >= self.GRAVACOES_POR_TRANSACAO:
+                self.grava()
+
+    def copia(self, registro, caminho_copia):
+        """
+        Replica as informações do arquivo para a sua cópia, evitando recalculá-las no destino
+        """
+
+        st = os.stat(caminho_copia)
+        if st.st_size != registro.tamanho:
+            return
+
+        with self.lock:
+            self.conexao.execute("INSERT OR REPLACE INTO metadados SELECT ?, tipo, ?, ?, valor FROM metadados "
+                                 "WHERE caminho = ? AND tamanho = ? AND mtime = ?",
+                                 (os.path.abspath(caminho_copia), st.st_size, st.st_mtime,
+                                  os.path.abspath(registro.caminho), registro.tamanho, registro.mtime))
+            self.pendentes += 1
+            if self.pendentes >= self.GRAVACOES_POR_TRANSACAO:
+                self.grava()
+
+    def grava(self):
+        with self.lock:
+            self.conexao.commit()
+            self.pendentes = 0
+
+
+def get_cache_metadados():
+    """
+    Recupera o cache de informações dos arquivos, retornando None caso não seja possível abri-lo
+    """
+
+    global g_cache_metadados
+
+    with g_lock_pool:
+        if g_cache_metadados is None:
+            try:
+                g_cache_metadados = MetadataCache(ARQUIVO_CACHE)
+            except sqlite3.Error as e:
+                debug("Não foi possível abrir o cache de informações dos arquivos " + ARQUIVO_CACHE + ": " + str(e))
+                g_cache_metadados = False
+
+    return g_cache_metadados or None
+
+
+def filtra_fotos_e_videos(arquivos):
+    """
+    Mantém apenas as fotos e os vídeos da lista, se configurado
+    """
+
+    if not get_app_settings_bool("apenas_fotos_e_videos"):
+        return arquivos
+
+    debug("Filtrando apenas videos e fotos")
+    medias = obter_lista_fotos(arquivos)
+    medias.extend(obter_lista_videos(arquivos))
+    return medias
+
+
+class MediaClassifier(object):
+    """
+    Classifica os arquivos em foto, vídeo ou desconhecido a partir da extensão.
+
+    O dicionário extensão -> tipo é montado uma única vez a partir das configurações
+    'extensoes_video' e 'extensoes_foto', tornando a classificação O(1) por arquivo.
+    """
+
+    def __init__(self, extensoes_video, extensoes_foto):
+        self.extensoes = (extensoes_video, extensoes_foto)
+        self.tipos = {}
+
+        # As fotos têm precedência sobre os vídeos, caso a extensão esteja nas duas listas
+        for ext in extensoes_video:
+            self.tipos[ext.lower().lstrip('.')] = TIPO_VIDEO
+        for ext in extensoes_foto:
+            self.tipos[ext.lower().lstrip('.')] = TIPO_FOTO
+
+    def classifica(self, arquivo):
+        """
+        Recupera o tipo do arquivo, considerando também as extensões compostas (ex: 'tar.gz')
+        """
+
+        nome = os.path.basename(arquivo).lower()
+        pos = nome.rfind('.')
+        while pos >= 0:
+            tipo = self.tipos.get(nome[pos + 1:])
+            if tipo is not None:
+                return tipo
+            pos = nome.rfind('.', 0, pos)
+
+        return TIPO_DESCONHECIDO
+
+
+def get_classificador():
+    """
+    Recupera o classificador de mídias, recriando-o apenas se as extensões configuradas mudarem
+    """
+
+    global g_classificador
+
+    extensoes = (get_app_settings_list("extensoes_video"), get_app_settings_list("extensoes_foto"))
+    classificador = g_classificador
+    if classificador is None or classificador.extensoes != extensoes:
+        classificador = MediaClassifier(*extensoes)
+        g_classificador = classificador
+
+    return classificador
+
+
+def is_video(arquivo):
+    return get_classificador().classifica(arquivo) == TIPO_VIDEO
+
+
+def is_foto(arquivo):
+    return get_classificador().classifica(arquivo) == TIPO_FOTO
+
+
+def get_tipo_arquivo(arquivo):
+    return get_classificador().classifica(arquivo)
+
+
+def obter_lista_fotos(registros):
+    return [registro for registro in registros if registro.tipo == TIPO_FOTO]
+
+
+def obter_lista_videos(registros):
+    return [registro for registro in registros if registro.tipo == TIPO_VIDEO]
+
+
+class MediaProbeScheduler(object):
+    """
+    Carrega as informações das mídias sob demanda, em threads de background.
+
+    Os arquivos agendados com a maior prioridade (ex: linhas visíveis na grid) são analisados primeiro e,
+    dentro da mesma prioridade, os agendamentos mais recentes têm preferência. Cada arquivo é analisado
+    uma única vez e o callback_resultado é executado (na thread de análise) ao término de cada análise.
+    """
+
+    PRIORIDADE_VISIVEL = 0
+    PRIORIDADE_PREFETCH = 1
+
+    def __init__(self, callback_resultado=None):
+        self.callback_resultado = callback_resultado
+        self.fila = queue.PriorityQueue()
+        self.lock = threading.Lock()
+        self.analisados = set()
+        self.geracao = 0
+        self.sequencia = 0
+        self.must_stop = False
+        self.threads = []
+
+        for _ in range(get_threads_midia()):
+            thread = threading.Thread(target=self.executa)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def agenda(self, registros, prioridade=PRIORIDADE_PREFETCH):
+        """
+        Agenda a análise dos arquivos ainda não analisados
+        """
+
+        with self.lock:
+            self.geracao += 1
+            for registro in registros:
+                if registro not in self.analisados:
+                    self.sequencia += 1
+                    self.fila.put((prioridade, -self.geracao, self.sequencia, registro))
+
+    def carrega(self, registros):
+        """
+        Analisa imediatamente os arquivos ainda não analisados, aguardando o término da análise
+        """
+
+        with self.lock:
+            pendentes = [registro for registro in registros if registro not in self.analisados]
+            self.analisados.update(pendentes)
+
+        get_pool_midia().map(self._analisa, pendentes)
+
+    def executa(self):
+        while True:
+            registro = self.fila.get()[3]
+            if self.must_stop:
+                return
+
+            with self.lock:
+                if registro in self.analisados:
+                    continue
+                self.analisados.add(registro)
+
+            self._analisa(registro)
+            if self.callback_resultado is not None:
+                self.callback_resultado(registro)
+
+            # Grava o cache sempre que a fila é esvaziada
+            cache = get_cache_metadados()
+            if cache is not None and self.fila.empty():
+                cache.grava()
+
+    def _analisa(self, registro):
+        try:
+            registro.detalhes = get_file_info(registro)
+        except Exception as e:
+            debug("Falha ao ler as informações do arquivo " + registro.caminho + ": " + str(e))
+
+    def interrompe(self):
+        """
+        Finaliza as threads de análise, descartando os agendamentos pendentes
+        """
+
+        self.must_stop = True
+        for _ in self.threads:
+            with self.lock:
+                self.sequencia += 1
+                self.fila.put((-1, 0, self.sequencia, None))
+
+        cache = get_cache_metadados()
+        if cache is not None:
+            cache.grava()
+
+
+def get_file_info(registro):
+    """
+    Recupera as informações da mídia (duração, codec, resolução), utilizando o cache ou o ffmpeg
+    """
+
+    captureInfo = get_app_settings_bool("exibir_resolucao_arquivos")
+
+    if not captureInfo or registro.tipo == TIPO_DESCONHECIDO:
+        return ""
+
+    cache = get_cache_metadados()
+    resp = cache.get(registro, TIPO_CACHE_MIDIA) if cache is not None else None
+
+    if resp is None:
+        with get_semaforo_midia(registro.dev):
+            # Fotos: tenta ler as dimensões diretamente do cabeçalho, evitando executar o ffprobe
+            resp = le_informacoes_imagem(registro.caminho) if registro.tipo == TIPO_FOTO else None
+            if resp is None:
+                resp = le_informacoes_midia(registro.caminho)
+        if cache is not None:
+            cache.set(registro, TIPO_CACHE_MIDIA, resp)
+
+    return resp
+
+
+def le_informacoes_imagem(arquivo):
+    """
+    Lê o formato e as dimensões da imagem apenas pelo cabeçalho (JPEG, PNG e RAW baseados em TIFF: NEF, ARW, DNG).
+
+    Retorna None caso o formato não seja reconhecido, para que seja utilizado o ffprobe.
+    """
+
+    try:
+        with io.open(arquivo, 'rb') as imagem:
+            assinatura = imagem.read(8)
+            imagem.seek(0)
+
+            if assinatura[:2] == b'\xff\xd8':
+                formato, dimensoes = "mjpeg", _le_dimensoes_jpeg(imagem)
+            elif assinatura == b'\x89PNG\r\n\x1a\n':
+                formato, dimensoes = "png", _le_dimensoes_png(imagem)
+            elif assinatura[:2] in (b'II', b'MM'):
+                formato, dimensoes = "tiff", _le_dimensoes_tiff(imagem)
+            else:
+                return None
+    except (IOError, OSError, struct.error) as e:
+        debug("Falha ao ler o cabeçalho da imagem " + arquivo + ": " + str(e))
+        return None
+
+    if dimensoes is None:
+        return None
+
+    return formato + " " + str(dimensoes[0]) + "x" + str(dimensoes[1]) + " "
+
+
+def _segmentos_jpeg(imagem):
+    """
+    Percorre os segmentos do JPEG até o início dos dados da imagem, retornando (tipo, posição do conteúdo, tamanho do conteúdo)
+    """
+
+    imagem.seek(2)
+    while True:
+        marcador = imagem.read(2)
+        if len(marcador) < 2 or marcador[0:1] != b'\xff':
+            return
+
+        # Bytes de preenchimento (0xFF) antes do marcador
+        while marcador[1:2] == b'\xff':
+            byte = imagem.read(1)
+            if not byte:
+                return  # Arquivo truncado
+            marcador = b'\xff' + byte
+
+        tipo = ord(marcador[1:2])
+        if tipo in (0xD9, 0xDA):
+            return  # Fim da imagem ou início dos dados
+
+        tamanho = struct.unpack(">H", imagem.read(2))[0] - 2
+        inicio = imagem.tell()
+        yield tipo, inicio, tamanho
+        imagem.seek(inicio + tamanho)
+
+
+def _le_dimensoes_jpeg(imagem):
+    """
+    Lê as dimensões do marcador SOF (Start Of Frame), retornando (largura, altura)
+    """
+
+    for tipo, inicio, tamanho in _segmentos_jpeg(imagem):  # @UnusedVariable
+        if tipo in MARCADORES_SOF_JPEG:
+            imagem.seek(inicio)
+            altura, largura = struct.unpack(">xHH", imagem.read(5))
+            return largura, altura
+
+    return None
+
+
+def _le_data_jpeg(imagem):
+    """
+    Lê a data de captura do bloco EXIF (segmento APP1) do JPEG
+    """
+
+    for tipo, inicio, tamanho in _segmentos_jpeg(imagem):  # @UnusedVariable
+        if tipo == 0xE1:
+            imagem.seek(inicio)
+            if imagem.read(6) == b'Exif\x00\x00':
+                return _le_data_tiff(imagem, inicio + 6)
+
+    return None
+
+
+def _le_dimensoes_png(imagem):
+    """
+    Lê as dimensões do bloco IHDR, que é sempre o primeiro bloco do PNG
+    """
+
+    cabecalho = imagem.read(24)
+    if cabecalho[12:16] != b'IHDR':
+        return None
+
+    return struct.unpack(">II", cabecalho[16:24])
+
+
+def _le_ifds_tiff(imagem, base=0):
+    """
+    Percorre os IFDs do TIFF iniciado na posição base, incluindo os SubIFDs e o IFD do EXIF.
+
+    Retorna a ordem dos bytes e a lista de IFDs, cada um como um dicionário tag -> (tipo, contagem, valor),
+    onde o valor é o número (SHORT/LONG) ou os 4 bytes da entrada (demais tipos).
+    """
+
+    imagem.seek(base)
+    cabecalho = imagem.read(8)
+    if cabecalho[:2] not in (b'II', b'MM'):
+        return None, []
+
+    ordem = "<" if cabecalho[:2] == b'II' else ">"
+    versao, offset = struct.unpack(ordem + "HI", cabecalho[2:8])
+    if versao not in VERSOES_TIFF:
+        return ordem, []
+
+    pendentes = [offset]
+    visitados = set()
+    ifds = []
+
+    while pendentes and len(visitados) < LIMITE_IFDS_TIFF:
+        offset = pendentes.pop()
+        if offset == 0 or offset in visitados:
+            continue
+        visitados.add(offset)
+
+        imagem.seek(base + offset)
+        quantidade = struct.unpack(ordem + "H", imagem.read(2))[0]
+        entradas = imagem.read(12 * quantidade)
+        proximo = imagem.read(4)
+        if len(proximo) == 4:
+            pendentes.append(struct.unpack(ordem + "I", proximo)[0])
+
+        ifd = {}
+        for i in range(0, len(entradas) - 11, 12):
+            tag, tipo, contagem = struct.unpack(ordem + "HHI", entradas[i:i + 8])
+            valor = entradas[i + 8:i + 12]
+            if tipo == 3:  # SHORT
+                valor = struct.unpack(ordem + "H", valor[:2])[0]
+            elif tipo in (4, 13):  # LONG, IFD
+                valor = struct.unpack(ordem + "I", valor)[0]
+            ifd[tag] = (tipo, contagem, valor)
+
+            if tag == 0x8769 and tipo in (4, 13):  # IFD do EXIF
+                pendentes.append(valor)
+            elif tag == 0x014A and tipo in (4, 13):  # SubIFDs
+                if contagem == 1:
+                    pendentes.append(valor)
+                else:
+                    imagem.seek(base + valor)
+                    pendentes.extend(struct.unpack(ordem + str(contagem) + "I", imagem.read(4 * contagem)))
+
+        ifds.append(ifd)
+
+    return ordem, ifds
+
+
+def _le_dimensoes_tiff(imagem):
+    """
+    Retorna as maiores dimensões encontradas nos IFDs do TIFF.
+
+    Os arquivos RAW normalmente guardam uma miniatura no IFD0 e a imagem completa em um SubIFD.
+    """
+
+    resp = None
+    for ifd in _le_ifds_tiff(imagem)[1]:
+        largura = ifd.get(0x0100, ifd.get(0xA002, (0, 0, 0)))[2]  # ImageWidth, PixelXDimension
+        altura = ifd.get(0x0101, ifd.get(0xA003, (0, 0, 0)))[2]  # ImageLength, PixelYDimension
+        if isinstance(largura, bytes) or isinstance(altura, bytes):
+            continue
+
+        if largura and altura and (resp is None or largura * altura > resp[0] * resp[1]):
+            resp = (largura, altura)
+
+    return resp
+
+
+def _le_data_tiff(imagem, base=0):
+    """
+    Lê a data de captura (DateTimeOriginal ou, na ausência, DateTime) dos IFDs do TIFF
+    """
+
+    ordem, ifds = _le_ifds_tiff(imagem, base)
+    for tag in (0x9003, 0x0132):  # DateTimeOriginal, DateTime
+        for ifd in ifds:
+            tipo, contagem, valor = ifd.get(tag, (0, 0, None))
+            if tipo != 2 or contagem < 10:  # ASCII: 'YYYY:MM:DD HH:MM:SS'
+                continue
+
+            if contagem > 4:
+                imagem.seek(base + struct.unpack(ordem + "I", valor)[0])
+                valor = imagem.read(contagem)
+
+            data = _converte_data(valor.decode("ascii", "replace"))
+            if data is not None:
+                return data
+
+    return None
+
+
+def _le_data_mp4(video):
+    """
+    Lê a data de criação do cabeçalho do filme (moov/mvhd) dos arquivos MP4/MOV, percorrendo apenas os cabeçalhos dos átomos
+    """
+
+    fim = os.fstat(video.fileno()).st_size
+    for nome in (b'moov', b'mvhd'):
+        atomo = _procura_atomo_mp4(video, nome, fim)
+        if atomo is None:
+            return None
+        video.seek(atomo[0])
+        fim = atomo[1]
+
+    versao = ord(video.read(4)[0:1])
+    if versao == 1:
+        segundos = struct.unpack(">Q", video.read(8))[0]
+    else:
+        segundos = struct.unpack(">I", video.read(4))[0]
+
+    # Segundos desde 1904-01-01 (UTC)
+    segundos -= SEGUNDOS_EPOCH_MP4
+    if segundos <= 0:
+        return None
+
+    data = datetime.datetime.fromtimestamp(segundos)
+    return _formata_data(data.year, data.month, data.day)
+
+
+def _procura_atomo_mp4(video, nome, fim):
+    """
+    Procura o átomo a partir da posição atual, retornando a posição do seu conteúdo e do seu fim
+    """
+
+    while video.tell() + 8 <= fim:
+        inicio = video.tell()
+        tamanho, tipo = struct.unpack(">I4s", video.read(8))
+        cabecalho = 8
+        if tamanho == 1:
+            tamanho = struct.unpack(">Q", video.read(8))[0]
+            cabecalho = 16
+        elif tamanho == 0:
+            tamanho = fim - inicio  # Átomo até o fim do arquivo
+
+        if tamanho < cabecalho:
+            return None
+
+        if tipo == nome:
+            return inicio + cabecalho, inicio + tamanho
+
+        video.seek(inicio + tamanho)
+
+    return None
+
+
+def _le_data_ffprobe(arquivo):
+    """
+    Lê a data de criação (creation_time) do container ou dos streams utilizando o ffprobe
+    """
+
+    dados = _executa_ffprobe(arquivo) or {}
+    tags = [dados.get("format", {}).get("tags", {})] + [stream.get("tags", {}) for stream in dados.get("streams", [])]
+    for tag in tags:
+        if tag.get("creation_time"):
+            data = _converte_data(tag["creation_time"])
+            if data is not None:
+                return data
+
+    return None
+
+
+def _converte_data(texto):
+    """
+    Converte as datas do EXIF ('YYYY:MM:DD HH:MM:SS') e do ffprobe ('YYYY-MM-DDTHH:MM:SS') para 'YYYY-MM-DD'
+    """
+
+    m = re.match("\\s*([0-9]{4})[:-]([0-9]{2})[:-]([0-9]{2})", texto)
+    if m is None:
+        return None
+
+    ano, mes, dia = int(m.group(1)), int(m.group(2)), int(m.group(3))
+    if ano < 1900 or not 1 <= mes <= 12 or not 1 <= dia <= 31:
+        return None  # Datas zeradas ou inválidas (ex: '0000:00:00 00:00:00')
+
+    return _formata_data(ano, mes, dia)
+
+
+def _formata_data(ano, mes, dia):
+    return str(ano) + "-" + str(mes).zfill(2) + "-" + str(dia).zfill(2)
+
+
+def le_data_captura(arquivo, tipo):
+    """
+    Lê a data de captura da foto (EXIF DateTimeOriginal) ou do vídeo (creation_time), apenas pelos cabeçalhos.
+
+    Os vídeos em formatos não suportados pelo leitor são lidos pelo ffprobe.
+    """
+
+    resp = None
+    try:
+        with io.open(arquivo, 'rb') as midia:
+            assinatura = midia.read(12)
+
+            if assinatura[:2] == b'\xff\xd8':
+                resp = _le_data_jpeg(midia)
+            elif assinatura[:2] in (b'II', b'MM'):
+                resp = _le_data_tiff(midia)
+            elif assinatura[4:8] in ATOMOS_INICIAIS_MP4:
+                midia.seek(0)
+                resp = _le_data_mp4(midia)
+    except (IOError, OSError, struct.error, ValueError) as e:
+        debug("Falha ao ler a data de captura do arquivo " + arquivo + ": " + str(e))
+
+    if resp is None and tipo == TIPO_VIDEO:
+        resp = _le_data_ffprobe(arquivo)
+
+    return resp
+
+
+def get_data_captura(registro):
+    """
+    Recupera a data de captura da foto ou vídeo ('YYYY-MM-DD'), utilizando o cache. Retorna None caso não seja possível determiná-la.
+    """
+
+    if registro.tipo not in (TIPO_FOTO, TIPO_VIDEO):
+        return None
+
+    cache = get_cache_metadados()
+    resp = cache.get(registro, TIPO_CACHE_DATA) if cache is not None else None
+
+    if resp is None:
+        with get_semaforo_midia(registro.dev):
+            resp = le_data_captura(registro.caminho, registro.tipo) or ""
+        if cache is not None:
+            cache.set(registro, TIPO_CACHE_DATA, resp)
+
+    return resp or None
+
+
+def le_informacoes_midia(arquivo):
+    """
+    Lê as informações da mídia (duração, codec, resolução) utilizando o ffprobe ou, caso não esteja disponível, o ffmpeg
+    """
+
+    dados = _executa_ffprobe(arquivo)
+    if dados is None:
+        return le_informacoes_midia_ffmpeg(arquivo)
+
+    return formata_informacoes_midia(dados)
+
+
+def _executa_ffprobe(arquivo):
+    """
+    Executa o ffprobe, retornando a sua saída JSON como dicionário, ou None caso o ffprobe não esteja disponível
+    """
+
+    global g_ffprobe_disponivel
+
+    if g_ffprobe_disponivel is False:
+        return None
+
+    args = [get_caminho_ffprobe(), "-v", "quiet", "-print_format", "json", "-show_format", "-show_streams", arquivo]
+    try:
+        processo_ffprobe = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+    except OSError as e:
+        debug("Não foi possível executar o ffprobe (" + str(e) + "), utilizando o ffmpeg para ler as informações das mídias")
+        g_ffprobe_disponivel = False
+        return None
+
+    g_ffprobe_disponivel = True
+    saida = processo_ffprobe.communicate()[0]
+    try:
+        return json.loads(saida)
+    except ValueError:
+        debug("Falha ao interpretar a saída do ffprobe para o arquivo " + arquivo)
+        return {}
+
+
+def formata_informacoes_midia(dados):
+    """
+    Monta o texto com as informações da mídia a partir da saída JSON do ffprobe.
+
+    Ex: 'Duration: 00:01:05 Video: h264 1920x1080 29.97 fps Audio: aac 48000 Hz '
+    """
+
+    try:
+        duracao = int(float(dados.get("format", {}).get("duration", 0)))
+    except ValueError:
+        duracao = 0
+
+    # Imagens não possuem duração: exibe apenas o codec e a resolução
+    imagem = duracao == 0
+
+    resp = ""
+    if not imagem:
+        resp += "Duration: %02d:%02d:%02d " % (duracao // 3600, duracao % 3600 // 60, duracao % 60)
+
+    video = None
+    audio = None
+    for stream in dados.get("streams", []):
+        if stream.get("codec_type") == "video" and video is None:
+            video = stream
+        elif stream.get("codec_type") == "audio" and audio is None:
+            audio = stream
+
+    if video is not None:
+        if video.get("codec_name"):
+            resp += ("" if imagem else "Video: ") + video["codec_name"] + " "
+        if video.get("width") and video.get("height"):
+            resp += str(video["width"]) + "x" + str(video["height"]) + " "
+        fps = _converte_fracao(video.get("avg_frame_rate"))
+        if not imagem and fps:
+            resp += ('%.2f' % fps).rstrip("0").rstrip(".") + " fps "
+
+    if audio is not None and not imagem:
+        if audio.get("codec_name"):
+            resp += "Audio: " + audio["codec_name"] + " "
+        if audio.get("sample_rate"):
+            resp += str(audio["sample_rate"]) + " Hz "
+
+    return resp
+
+
+def _converte_fracao(valor):
+    """
+    Converte uma fração do ffprobe (ex: '30000/1001') em float, retornando None caso seja inválida
+    """
+
+    try:
+        numerador, denominador = (valor or "").split("/")
+        return float(numerador) / float(denominador) if float(denominador) else None
+    except ValueError:
+        return None
+
+
+def le_informacoes_midia_ffmpeg(arquivo):
+    """
+    Lê as informações da mídia (duração, codec, resolução) a partir da saída do 'ffmpeg -i'
+    """
+
+    pattern = re.compile("(Duration: [0-9]{2,}:[0-9]{2,}:[0-9]{2,})|(Video: [^\s]+)|([0-9]{2,}x[0-9]{2,})|([0-9|.]+ fps)|(Audio: [^\s]+)|([0-9]+ Hz)")
+    args = [get_caminho_ffmpeg(), "-hide_banner", "-i", arquivo]
+
+    processo_ffmpeg = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, universal_newlines=True)
+
+    lines = ""
+    # Inicia o processo e concatena as linhas do output
+    for line in iter(processo_ffmpeg.stdout.readline, ''):
+
+        # Considera apenas as linhas essenciais
+        if "Stream #0" in line or " Duration:" in line:
+            lines = lines + line
+
+    if "Duration: 00:00:00" in lines:
+        lines = lines.replace("Duration: 00:00:00", "")
+        lines = lines.replace("Video: ", "")
+
+    # Recupera o texto dos grupos da regex
+    resp = ""
+    for m in pattern.finditer(lines):
+        resp = resp + m.group() + " "
+
+    # Finaliza o processo do ffmpeg
+    processo_ffmpeg.stdout.close()
+    processo_ffmpeg.wait()
+
+    return resp
+
+
+def get_destino_arquivo(registro, mapeamento=None):
+    """
+    Recupera o caminho relativo de destino do arquivo: YYYY/yyyy-MM-dd/arquivo
+    """
+
+    return aplica_mapeamento(get_pasta_destino(registro), registro.nome, mapeamento)
+
+
+def get_pasta_destino(registro):
+    """
+    Recupera o diretório de destino do arquivo pela data de captura, quando conhecida, ou a data de modificação: YYYY/yyyy-MM-dd
+    """
+
+    if registro.data_captura is not None:
+        data = registro.data_captura
+    else:
+        data = datetime.datetime.fromtimestamp(registro.mtime)
+        data = _formata_data(data.year, data.month, data.day)
+
+    return data[:4] + os.sep + data
+
+
+def aplica_mapeamento(pasta, nome, mapeamento=None):
+    """
+    Monta o caminho relativo de destino, substituindo o diretório caso esteja mapeado
+    """
+
+    if mapeamento and pasta in mapeamento:
+        pasta = mapeamento[pasta]
+
+    return pasta + os.sep + nome
+
+
+def indent_xml(elem, level=0):
+    """
+    Formata um arquivo XML
+    """
+
+    i = "\n" + level * "\t"
+    if len(elem):
+        if not elem.text or not elem.text.strip():
+            elem.text = i + "\t"
+        if not elem.tail or not elem.tail.strip():
+            elem.tail = i
+        for elem in elem:
+            indent_xml(elem, level + 1)
+        if not elem.tail or not elem.tail.strip():
+            elem.tail = i
+    else:
+        if level and (not elem.tail or not elem.tail.strip()):
+            elem.tail = i
+
+
+class SettingsCache(object):
+    """
+    Cache em memória do arquivo de configuração.
+
+    O XML é lido apenas uma vez e recarregado somente quando o arquivo é alterado
+    (mtime/tamanho) ou após uma gravação efetuada pela própria aplicação.
+    """
+
+    INTERVALO_VERIFICACAO = 1.0  # Intervalo mínimo (segundos) entre as verificações do mtime do arquivo
+
+    def __init__(self, arquivo_xml):
+        self.arquivo_xml = arquivo_xml
+        self.lock = threading.RLock()
+        self.valores = {}
+        self.tipados = {}
+        self.assinatura = None
+        self.ultima_verificacao = 0
+
+    def invalida(self):
+        """
+        Força a releitura do arquivo na próxima consulta
+        """
+
+        with self.lock:
+            self.assinatura = None
+            self.ultima_verificacao = 0
+
+    def get_assinatura_arquivo(self):
+        try:
+            st = os.stat(self.arquivo_xml)
+            return (st.st_mtime, st.st_size)
+        except OSError:
+            return None
+
+    def recarrega_se_alterado(self):
+        """
+        Recarrega o XML caso o arquivo tenha sido alterado desde a última leitura
+        """
+
+        agora = time.time()
+        if self.assinatura is not None and agora - self.ultima_verificacao < self.INTERVALO_VERIFICACAO:
+            return
+
+        with self.lock:
+            self.ultima_verificacao = agora
+            assinatura = self.get_assinatura_arquivo()
+            if assinatura is not None and assinatura == self.assinatura:
+                return
+
+            valores = {}
+            if assinatura is not None:
+                debug("Carregando o arquivo de configuração: " + self.arquivo_xml)
+                root = ET.parse(self.arquivo_xml, ET.XMLParser(remove_comments=False, strip_cdata=False)).getroot()
+                for node in root:
+                    # Ignora os comentários
+                    if node.tag is not ET.Comment and node.tag is not ET.PI:
+                        valores[node.tag] = node.text
+
+            self.valores = valores
+            self.tipados = {}
+            self.assinatura = assinatura
+
+    def get(self, xml_tag):
+        self.recarrega_se_alterado()
+        return self.valores.get(xml_tag)
+
+    def get_tipado(self, xml_tag, conversor):
+        """
+        Recupera o valor convertido, mantendo a conversão em cache até a próxima recarga do arquivo
+        """
+
+        self.recarrega_se_alterado()
+        chave = (xml_tag, conversor)
+        tipados = self.tipados
+        if chave not in tipados:
+            tipados[chave] = conversor(self.valores.get(xml_tag))
+        return tipados[chave]
+
+    def get_bool(self, xml_tag):
+        return self.get_tipado(xml_tag, _converte_bool)
+
+    def get_int(self, xml_tag, padrao=0):
+        valor = self.get_tipado(xml_tag, _converte_int)
+        return padrao if valor is None else valor
+
+    def get_list(self, xml_tag):
+        return self.get_tipado(xml_tag, _converte_lista)
+
+
+def _converte_bool(valor):
+    return 'True' == valor
+
+
+def _converte_int(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _converte_lista(valor):
+    return tuple(item for item in valor.split('|') if item) if valor else ()
+
+
+def set_app_settings(xml_tag, value):
+    """
+    Salva uma configuração da aplicação
+    """
+
+    set_app_settings_lote([(xml_tag, value)])
+
+
+def set_app_settings_lote(valores):
+    """
+    Salva um conjunto de configurações da aplicação em uma única transação.
+
+    O arquivo é lido, alterado e gravado apenas uma vez, substituindo o arquivo
+    anterior de forma atômica (ver indent_and_save_xml).
+    Os valores podem ser informados como dicionário ou lista de tuplas (tag, valor).
+    """
+
+    valores = list(valores.items()) if isinstance(valores, dict) else list(valores)
+
+    with g_settings.lock:
+        if os.path.isfile(ARQUIVO_XML_SETTINGS):
+            root = ET.parse(ARQUIVO_XML_SETTINGS, ET.XMLParser(remove_comments=False, strip_cdata=False)).getroot()
+        else:
+            root = ET.Element('config')
+
+        for xml_tag, value in valores:
+            debug("Salvando configuração da aplicação: " + xml_tag + " = " + str(value))
+
+            # Remove o nó se já existir
+            node = root.find("./" + xml_tag)
+            if node is not None:
+                root.remove(node)
+
+            # Se o valor não for nulo, adicionar o novo nó
+            if value is not None and value.strip():
+                ET.SubElement(root, xml_tag).text = value
+
+        indent_and_save_xml(root, ARQUIVO_XML_SETTINGS)
+        g_settings.invalida()
+
+
+def get_app_settings(xml_tag):
+    """
+    Recupera uma configuração da aplicação
+    """
+
+    return g_settings.get(xml_tag)
+
+
+def get_app_settings_bool(xml_tag):
+    """
+    Recupera uma configuração booleana da aplicação
+    """
+
+    return g_settings.get_bool(xml_tag)
+
+
+def get_app_settings_int(xml_tag, padrao=0):
+    """
+    Recupera uma configuração numérica da aplicação
+    """
+
+    return g_settings.get_int(xml_tag, padrao)
+
+
+def get_app_settings_list(xml_tag):
+    """
+    Recupera uma configuração com uma lista de valores separados por '|'
+    """
+
+    return g_settings.get_list(xml_tag)
+
+
+def indent_and_save_xml(root_node, arquivo_xml):
+    """
+    Formata e salva um arquivo XML.
+
+    O conteúdo é gravado em um arquivo temporário, sincronizado em disco e renomeado
+    sobre o arquivo original, de forma que um leitor nunca encontre o XML incompleto.
+    """
+
+    debug("Salvando o arquivo XML: " + arquivo_xml)
+    indent_xml(root_node)
+    pretty_xml = ET.tostring(root_node, encoding="UTF-8", method="xml", xml_declaration=True)
+
+    # Nome temporário único: a interface e a linha de comando podem gravar ao mesmo tempo
+    fd, arquivo_tmp = tempfile.mkstemp(prefix=os.path.basename(arquivo_xml) + ".", suffix=".tmp",
+                                       dir=os.path.dirname(os.path.abspath(arquivo_xml)))
+    try:
+        with os.fdopen(fd, "wb") as arquivo:
+            arquivo.write(pretty_xml)
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+
+        # O mkstemp cria o arquivo apenas com permissão para o dono
+        try:
+            modo = stat.S_IMODE(os.stat(arquivo_xml).st_mode)
+        except OSError:
+            modo = 0o644
+        os.chmod(arquivo_tmp, modo)
+
+        substitui_arquivo(arquivo_tmp, arquivo_xml)
+    except:
+        try:
+            os.remove(arquivo_tmp)
+        except OSError:
+            pass
+        raise
+
+
+def substitui_arquivo(origem, destino, sincronizar=True):
+    """
+    Renomeia o arquivo de origem sobre o destino de forma atômica, sincronizando o diretório (se sincronizar=True)
+    """
+
+    if hasattr(os, "replace"):
+        os.replace(origem, destino)
+    else:
+        # Python 2: no Windows o rename falha se o destino existir
+        if os.name == 'nt' and os.path.exists(destino):
+            os.remove(destino)
+        os.rename(origem, destino)
+
+    if sincronizar:
+        sincroniza_diretorio(os.path.dirname(os.path.abspath(destino)))
+
+
+def sincroniza_arquivos(caminhos, raiz):
+    """
+    Garante a persistência dos arquivos e das entradas dos diretórios (até a raiz), retornando o método utilizado:
+    um único syncfs por sistema de arquivos (Linux) ou o fsync de cada arquivo e diretório
+    """
+
+    diretorios = set(os.path.dirname(os.path.abspath(caminho)) for caminho in caminhos)
+
+    syncfs = get_syncfs()
+    if syncfs is not None:
+        try:
+            sincronizados = set()
+            for diretorio in diretorios:
+                fd = os.open(diretorio, os.O_RDONLY)
+                try:
+                    dev = os.fstat(fd).st_dev
+                    if dev not in sincronizados and syncfs(fd) != 0:
+                        erro = ctypes.get_errno()
+                        raise OSError(erro, os.strerror(erro))
+                    sincronizados.add(dev)
+                finally:
+                    os.close(fd)
+            return "syncfs"
+        except OSError as e:
+            debug("Falha no syncfs, sincronizando cada arquivo: " + str(e))
+
+    modo = os.O_RDWR if os.name == 'nt' else os.O_RDONLY  # No Windows o fsync exige a permissão de escrita
+    for caminho in caminhos:
+        fd = os.open(caminho, modo)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # Os diretórios criados durante a cópia também precisam ser sincronizados
+    raiz = os.path.abspath(raiz)
+    pendentes = set()
+    for diretorio in diretorios:
+        while diretorio not in pendentes:
+            pendentes.add(diretorio)
+            pai = os.path.dirname(diretorio)
+            if diretorio == raiz or pai == diretorio or not diretorio.startswith(raiz):
+                break
+            diretorio = pai
+
+    for diretorio in pendentes:
+        sincroniza_diretorio(diretorio)
+
+    return "fsync"
+
+
+def get_libc():
+    """
+    Carrega a libc (Linux) para as chamadas não disponíveis no módulo os: syncfs, mmap/mincore
+    """
+
+    global g_libc
+
+    with g_lock_pool:
+        if g_libc is None:
+            g_libc = False
+            if ctypes is not None and sys.platform.startswith("linux"):
+                try:
+                    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                    libc.mmap.restype = ctypes.c_void_p
+                    libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int64]
+                    libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+                    libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_void_p]
+                    g_libc = libc
+                except (OSError, AttributeError) as e:
+                    debug("libc não disponível: " + str(e))
+
+    return g_libc or None
+
+
+def get_syncfs():
+    """
+    Recupera a função syncfs da libc (Linux), ou None caso não esteja disponível
+    """
+
+    global g_syncfs
+
+    if g_syncfs is None:
+        g_syncfs = False
+        libc = get_libc()
+        if libc is not None:
+            try:
+                g_syncfs = libc.syncfs
+                g_syncfs.argtypes = [ctypes.c_int]
+            except AttributeError as e:
+                debug("syncfs não disponível: " + str(e))
+
+    return g_syncfs or None
+
+
+def sincroniza_diretorio(diretorio):
+    """
+    Efetua o fsync do diretório, garantindo a persistência das entradas renomeadas/criadas
+    """
+
+    if os.name == 'nt':
+        return
+
+    try:
+        fd = os.open(diretorio, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        debug("Falha ao sincronizar o diretório [" + diretorio + "]: " + str(e))
+
+
+def inicializa_settings():
+    """
+    Cria o arquivo de configuração com os valores padrão, caso não exista
+    """
+
+    if not os.path.isfile(ARQUIVO_XML_SETTINGS):
+        set_app_settings_lote([
+            ("dir_destino", str(os.path.expanduser('~'))),
+            ("dir_origem", str(os.path.expanduser('~'))),
+            ("extensoes_video", "wmv|avi|mpg|3gp|mov|m4v|mts|mp4"),
+            ("extensoes_foto", "dof|arw|raw|jpg|jpeg|png|nef"),
+            ("codec_video", "0"),
+            ("caminho_ffmpeg", "ffmpeg")
+        ])
+
+
+def inicializa_log(arquivo_log, nivel=logging.DEBUG):
+    """
+    Remove o arquivo de log anterior e configura o g_logger
+    """
+
+    if os.path.isfile(arquivo_log):
+        os.remove(arquivo_log)
+
+    # O arquivo de log sempre recebe todas as mensagens, o console apenas as do nível informado
+    logging.basicConfig(level=nivel, format='%(asctime)-15s %(message)s')
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(nivel)
+
+    g_logger.setLevel(logging.DEBUG)
+    log_handler = logging.FileHandler(arquivo_log)
+    g_logger.addHandler(log_handler)
+
+    return log_handler
+
+
+def debug(msg=''):
+    """
+    Loga uma mensagem
+    """
+
+    try:
+        linha = str(msg).strip()
+    except (UnicodeEncodeError):
+        linha = msg.encode("utf-8").strip()
+
+    g_logger.debug(linha)
+
+
+def to_human_size(nbytes):
+    """
+    Converte uma quantidade de bytes em formato de fácil visualização
+    """
+
+    human = nbytes
+    rank = 0
+    if nbytes != 0:
+        rank = int((math.log10(nbytes)) / 3)
+        rank = min(rank, len(UNIDADES) - 1)
+        human = nbytes / (1024.0 ** rank)
+    f = ('%.2f' % human).rstrip('0').rstrip('.')
+    return '%s %s' % (f, UNIDADES[rank])
+
+
+def get_codec_info(codec):
+    """
+    Recupera os parâmtros do ffmpeg para conversão
+    """
+
+    resp = None
+    if VIDEO_H265 == codec:
+        resp = {"params":["-c:v", "libx265", "-acodec", "aac", "-strict", "-2"], "sufixo":"_H265.mp4"}
+    elif VIDEO_H264 == codec:
+        resp = {"params":["-c:v", "libx264", "-acodec", "aac", "-strict", "-2"], "sufixo":"_H264.mp4"}
+    elif VIDEO_VP8 == codec:
+        resp = {"params":["-c:v", "libvpx", "-b:v", "1M", "-c:a", "libvorbis"], "sufixo":"_VP8.webm"}
+    elif VIDEO_VP9 == codec:
+        resp = {"params":["-c:v", "libvpx-vp9", "-b:v", "2M", "-c:a", "libopus"], "sufixo":"_VP9.webm"}
+    return resp
+
+
+def get_caminho_ffmpeg():
+    """
+    Recupera o caminho onde o ffmpeg está instalado
+    """
+
+    app = get_app_settings("caminho_ffmpeg")
+    return app if app is not None else "ffmpeg"
+
+
+def get_caminho_ffprobe():
+    """
+    Recupera o caminho do ffprobe: configuração 'caminho_ffprobe' ou o mesmo diretório do ffmpeg
+    """
+
+    app = get_app_settings("caminho_ffprobe")
+    if app:
+        return app
+
+    ffmpeg = get_caminho_ffmpeg()
+    diretorio, nome = os.path.split(ffmpeg)
+    return os.path.join(diretorio, nome.replace("ffmpeg", "ffprobe")) if "ffmpeg" in nome else "ffprobe"
+
+
+def get_ffmpeg_features():
+    """
+    Recupera uma lista com as features do ffmpeg: Ex: --enable-libx264
+    """
+
+    global g_lista_ffmpeg_features
+
+    if g_lista_ffmpeg_features is None:
+        processo_ffmpeg = subprocess.Popen([get_caminho_ffmpeg()], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1, universal_newlines=True)
+
+        linhas = ""
+        for line in iter(processo_ffmpeg.stdout.readline, ''):
+            if "--" in line:
+                linhas = linhas + line
+
+        processo_ffmpeg.stdout.close()
+        processo_ffmpeg.wait()
+
+        g_lista_ffmpeg_features = []
+        pattern = re.compile("--enable-[^\s]+|disable-[^\s]+")
+        for m in pattern.finditer(linhas):
+            g_lista_ffmpeg_features.append(m.group())
+
+    return g_lista_ffmpeg_features
+
+
+def carrega_codecs_video():
+    """
+    Monta a lista de codecs de acordo com a disponibilidade do ffmpeg
+    """
+
+    del CODECS_VIDEO[:]
+
+    if "--enable-libx264" in get_ffmpeg_features():
+        CODECS_VIDEO.append(VIDEO_H264)
+
+    if "--enable-libx265" in get_ffmpeg_features():
+        CODECS_VIDEO.append(VIDEO_H265)
+
+    if "--enable-libvpx" in get_ffmpeg_features():
+        CODECS_VIDEO.append(VIDEO_VP8)
+        CODECS_VIDEO.append(VIDEO_VP9)
+
+    return CODECS_VIDEO
+
+
+def configura_encoding():
+    """
+    Força UTF-8 por padrão
+    """
+
+    if sys.version_info < (3, 0):
+        reload(sys)  # @UndefinedVariable
+        sys.setdefaultencoding("utf-8")  # @UndefinedVariable
+
+# Constantes da aplicação
+
+
+UNIDADES = ['B', 'KB', 'MB', 'GB', 'TB', 'PB']  # Unidades de conversão bytes -> Si
+DIR_APPLICATION = os.path.dirname(os.path.realpath(__file__))  # Diretório da aplicação
+ARQUIVO_XML_SETTINGS = DIR_APPLICATION + os.sep + "settings.xml"  # Arquivo de configuração da aplicação
+ARQUIVO_LOG = DIR_APPLICATION + os.sep + "application.log"  # Arquivo de log
+ARQUIVO_CACHE = DIR_APPLICATION + os.sep + "cache.db"  # Cache de informações dos arquivos (hashes, etc)
+
+# Codecs de Video
+VIDEO_H265 = "Video H265"
+VIDEO_H264 = "Video H264"
+VIDEO_VP8 = "Video VP8"
+VIDEO_VP9 = "Video VP9"
+CODECS_VIDEO = []
+
+THREADS_LEITURA = 8  # Quantidade padrão de threads do pool de leitura dos diretórios
+THREADS_COPIA = 4  # Quantidade padrão de cópias simultâneas
+LIMITE_ANALISES_DISPOSITIVO_LENTO = 2  # Análises simultâneas das mídias em discos rotacionais e removíveis
+
+# Métodos de cópia dos arquivos, na ordem de preferência
+METODO_RENOMEAR = "rename"  # Movimentação no mesmo sistema de arquivos
+METODO_REFLINK = "reflink"
+METODO_COPY_FILE_RANGE = "copy_file_range"
+METODO_SENDFILE = "sendfile"
+METODO_BUFFER = "buffer"
+METODOS_COPIA = ((METODO_REFLINK, _copia_reflink), (METODO_COPY_FILE_RANGE, _copia_copy_file_range),
+                 (METODO_SENDFILE, _copia_sendfile), (METODO_BUFFER, _copia_buffer))
+FICLONE = 0x40049409  # ioctl do Linux para o reflink
+BLOCO_COPIA_KERNEL = 64 * 1024 * 1024  # Quantidade máxima de bytes por chamada do copy_file_range/sendfile
+TAMANHO_BUFFER_COPIA = 1024 * 1024  # Tamanho padrão do buffer da cópia pelo espaço do usuário ('tamanho_buffer_copia', em KiB)
+TAMANHO_BUFFER_MINIMO = 64 * 1024
+SUFIXO_TEMPORARIO = ".photosync-tmp"  # Sufixo dos arquivos em cópia (ver get_arquivo_temporario)
+CLASSE_IO_BEST_EFFORT = 2  # Classes do ionice ('classe_io_copia')
+CLASSE_IO_IDLE = 3
+LOTE_SINCRONIZACAO_ARQUIVOS = 100  # Arquivos movidos sincronizados (fsync) de uma única vez antes da remoção das origens
+LOTE_SINCRONIZACAO_BYTES = 1024 * 1024 * 1024
+ERROS_COPIA_NAO_SUPORTADA = set(getattr(errno, nome) for nome in ("EXDEV", "ENOSYS", "EINVAL", "EOPNOTSUPP", "ENOTSUP", "EBADF",
+                                                                   "ENOTSOCK", "EPERM", "ETXTBSY") if hasattr(errno, nome))
+
+# Comparação do conteúdo dos arquivos
+ALGORITMO_HASH = "blake2b" if blake2b is not None else "sha256"
+TAMANHO_BLOCO_IMPRESSAO = 64 * 1024  # Tamanho dos blocos inicial e final da impressão parcial
+TAMANHO_BUFFER_HASH = 1024 * 1024  # Tamanho padrão das leituras do hash completo ('tamanho_buffer_hash', em KiB)
+TIPO_CACHE_PARCIAL = "parcial:" + ALGORITMO_HASH  # Tipo da impressão parcial no MetadataCache
+TIPO_CACHE_HASH = "hash:" + ALGORITMO_HASH  # Tipo do hash completo no MetadataCache
+
+# Verificação da cópia (configuração 'verificacao_copia')
+VERIFICACAO_NENHUMA = 0
+VERIFICACAO_COMPLETA = 1  # Releitura completa do destino, sem o cache
+VERIFICACAO_AMOSTRAGEM = 2  # Comparação de blocos da origem e do destino
+VERIFICACOES_COPIA = ["Nenhuma", "Completa (releitura)", "Por amostragem"]
+AMOSTRAS_VERIFICACAO = 16  # Quantidade de blocos comparados na verificação por amostragem
+TAMANHO_AMOSTRA_VERIFICACAO = 64 * 1024
+ARQUIVO_MANIFESTO = ".photosync_manifest"  # Hashes dos arquivos copiados com verificação, na raiz do destino
+NOME_HASH_MANIFESTO = "BLAKE2b-256" if blake2b is not None else "SHA256"
+
+TIPO_CACHE_MIDIA = "midia"  # Tipo das informações da mídia no MetadataCache
+TIPO_CACHE_DATA = "data_captura"  # Tipo da data de captura no MetadataCache
+
+# Leitura do cabeçalho das imagens
+MARCADORES_SOF_JPEG = (0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF)
+VERSOES_TIFF = (42, 0x4F52, 0x5352)  # TIFF (NEF, ARW, DNG, CR2) e Olympus ORF
+LIMITE_IFDS_TIFF = 32  # Quantidade máxima de IFDs percorridos (protege contra arquivos corrompidos)
+ATOMOS_INICIAIS_MP4 = (b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot')  # Assinaturas dos arquivos MP4/MOV
+SEGUNDOS_EPOCH_MP4 = 2082844800  # Segundos entre 1904-01-01 (MP4/MOV) e 1970-01-01
+
+# Tipos de arquivo
+TIPO_FOTO = "Foto"
+TIPO_VIDEO = "Video"
+TIPO_DESCONHECIDO = "Desconhecido"
+
+# Ações do plano de sincronização
+ACAO_IGNORAR = "Ignorar"  # O arquivo já existe no destino
+ACAO_COPIAR = "Copiar"
+ACAO_MOVER = "Mover"  # Copia e remove o arquivo de origem
+
+# Variáveis globais do motor
+# Nota: por convenção, as variáveis globais são camelCase e iniciam com um 'g'
+
+g_lista_ffmpeg_features = None  # Dicionário com as features de compilação do ffmpeg
+g_logger = logging.getLogger('-')  # Logger da aplicação
+g_pool_leitura = None  # Pool de threads da leitura dos diretórios (ver get_pool_leitura)
+g_pool_hash = None  # Pool de threads do cálculo dos hashes (ver get_pool_hash)
+g_metodos_copia_indisponiveis = set()  # Métodos de cópia não suportados pelo sistema operacional
+g_syncfs = None  # Função syncfs da libc (ver get_syncfs)
+g_libc = None  # Biblioteca C carregada pelo ctypes (ver get_libc)
+g_usar_fadvise = None  # Uso do posix_fadvise nas leituras e gravações (ver usa_fadvise)
+g_pool_midia = None  # Pool de threads da análise das mídias (ver get_pool_midia)
+g_semaforos_midia = {}  # Dispositivo -> semáforo das análises simultâneas das mídias (ver get_semaforo_midia)
+g_ffprobe_disponivel = None  # Indica se o ffprobe pode ser executado (None: ainda não verificado)
+g_cache_metadados = None  # Cache de informações dos arquivos (ver get_cache_metadados)
+g_lock_pool = threading.Lock()  # Sincroniza a criação dos pools
+g_classificador = None  # Classificador de mídias (ver get_classificador)
+g_settings = SettingsCache(ARQUIVO_XML_SETTINGS)  # Cache das configurações da aplicação
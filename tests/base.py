@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""
+Utilitários comuns dos testes: diretório temporário e configuração isolada da aplicação.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+import photosync_engine
+from photosync_engine import SettingsCache, FileRecord
+
+
+class TesteComDiretorio(unittest.TestCase):
+    """
+    Cria um diretório temporário para cada teste e utiliza uma configuração vazia (sem o settings.xml
+    e o cache de metadados da aplicação), alterada apenas pelo atributo 'configuracao'
+    """
+
+    configuracao = {}
+
+    def setUp(self):
+        self.dir_teste = tempfile.mkdtemp(prefix="photosync_teste_")
+
+        arquivo_xml = os.path.join(self.dir_teste, "settings.xml")
+        with io.open(arquivo_xml, 'w', encoding='utf-8') as saida:
+            saida.write("<config>" + "".join("<" + tag + ">" + valor + "</" + tag + ">" for tag, valor in self.configuracao.items()) + 
+                        "</config>")
+
+        self.settings_original = photosync_engine.g_settings
+        self.cache_original = photosync_engine.g_cache_metadados
+        photosync_engine.g_settings = SettingsCache(arquivo_xml)
+        photosync_engine.g_cache_metadados = False  # Cache indisponível (ver get_cache_metadados)
+
+    def tearDown(self):
+        photosync_engine.g_settings = self.settings_original
+        photosync_engine.g_cache_metadados = self.cache_original
+        shutil.rmtree(self.dir_teste, ignore_errors=True)
+
+    def cria_arquivo(self, relativo, conteudo):
+        """
+        Cria o arquivo no diretório temporário, retornando o seu FileRecord
+        """
+
+        caminho = os.path.join(self.dir_teste, relativo)
+        if not os.path.isdir(os.path.dirname(caminho)):
+            os.makedirs(os.path.dirname(caminho))
+
+        with io.open(caminho, 'wb') as saida:
+            saida.write(conteudo)
+
+        st = os.stat(caminho)
+        return FileRecord(caminho, os.path.basename(caminho), st.st_size, st.st_mtime, st.st_ino, st.st_dev)
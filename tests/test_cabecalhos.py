@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Leitura das dimensões das imagens (le_informacoes_imagem) e da data de captura (le_data_captura) apenas pelo cabeçalho
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import calendar
+import struct
+import unittest
+
+from photosync_engine import le_informacoes_imagem, le_data_captura, TIPO_FOTO, TIPO_VIDEO, SEGUNDOS_EPOCH_MP4
+from tests.base import TesteComDiretorio
+
+
+def monta_jpeg(largura, altura, preenchimento=b''):
+    app0 = b'\xff\xe0' + struct.pack(">H", 16) + b'JFIF\x00' + b'\x00' * 9
+    sof0 = b'\xff\xc0' + struct.pack(">HBHHB", 11, 8, altura, largura, 1) + b'\x01\x11\x00'
+    return b'\xff\xd8' + app0 + preenchimento + sof0 + b'\xff\xda' + b'\x00' * 16
+
+
+def monta_tiff(largura, altura):
+    entradas = struct.pack("<HHII", 0x0100, 3, 1, largura) + struct.pack("<HHII", 0x0101, 4, 1, altura)
+    return b'II' + struct.pack("<HI", 42, 8) + struct.pack("<H", 2) + entradas + struct.pack("<I", 0)
+
+
+def monta_jpeg_exif(data):
+    valor = data.encode("ascii") + b'\x00'
+    tiff = b'MM' + struct.pack(">HI", 42, 8) + struct.pack(">H", 1) + struct.pack(">HHII", 0x0132, 2, len(valor), 26) + \
+        struct.pack(">I", 0) + valor
+    app1 = b'Exif\x00\x00' + tiff
+    return b'\xff\xd8' + b'\xff\xe1' + struct.pack(">H", len(app1) + 2) + app1 + monta_jpeg(640, 480)[2:]
+
+
+def monta_mp4(segundos):
+    ftyp = struct.pack(">I", 16) + b'ftypisom' + b'\x00' * 4
+    mvhd = struct.pack(">I4sII", 16, b'mvhd', 0, segundos + SEGUNDOS_EPOCH_MP4)
+    return ftyp + struct.pack(">I", 8 + len(mvhd)) + b'moov' + mvhd
+
+
+class TestDimensoesImagem(TesteComDiretorio):
+
+    def le(self, nome, conteudo):
+        return le_informacoes_imagem(self.cria_arquivo(nome, conteudo).caminho)
+
+    def test_jpeg(self):
+        self.assertEqual("mjpeg 640x480 ", self.le("foto.jpg", monta_jpeg(640, 480)))
+
+    def test_jpeg_com_bytes_de_preenchimento(self):
+        self.assertEqual("mjpeg 4000x3000 ", self.le("foto.jpg", monta_jpeg(4000, 3000, b'\xff\xff\xff')))
+
+    def test_jpeg_truncado_nos_bytes_de_preenchimento(self):
+        self.assertIsNone(self.le("foto.jpg", b'\xff\xd8\xff\xff\xff'))
+
+    def test_jpeg_truncado_no_segmento(self):
+        self.assertIsNone(self.le("foto.jpg", monta_jpeg(640, 480)[:24]))
+
+    def test_png(self):
+        cabecalho = b'\x89PNG\r\n\x1a\n' + struct.pack(">I", 13) + b'IHDR' + struct.pack(">II", 800, 600) + b'\x08\x02\x00\x00\x00'
+        self.assertEqual("png 800x600 ", self.le("foto.png", cabecalho))
+
+    def test_tiff(self):
+        self.assertEqual("tiff 1024x768 ", self.le("foto.nef", monta_tiff(1024, 768)))
+
+    def test_formato_desconhecido(self):
+        self.assertIsNone(self.le("foto.gif", b'GIF89a' + b'\x00' * 20))
+
+
+class TestDataCaptura(TesteComDiretorio):
+
+    def le(self, nome, conteudo, tipo=TIPO_FOTO):
+        return le_data_captura(self.cria_arquivo(nome, conteudo).caminho, tipo)
+
+    def test_jpeg_exif(self):
+        self.assertEqual("2019-05-04", self.le("foto.jpg", monta_jpeg_exif("2019:05:04 10:20:30")))
+
+    def test_jpeg_exif_com_data_zerada(self):
+        self.assertIsNone(self.le("foto.jpg", monta_jpeg_exif("0000:00:00 00:00:00")))
+
+    def test_jpeg_sem_exif(self):
+        self.assertIsNone(self.le("foto.jpg", monta_jpeg(640, 480)))
+
+    def test_mp4(self):
+        # Meio-dia (UTC): a data não depende do fuso horário local
+        segundos = calendar.timegm((2020, 7, 15, 12, 0, 0))
+        self.assertEqual("2020-07-15", self.le("video.mp4", monta_mp4(segundos), TIPO_VIDEO))
+
+
+if __name__ == '__main__':
+    unittest.main()
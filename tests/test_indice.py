@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Índice persistente do destino (DestinationIndex): atualização incremental pelo mtime dos diretórios
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import time
+import unittest
+
+from photosync_engine import DestinationIndex
+from tests.base import TesteComDiretorio
+
+
+class TestDestinationIndex(TesteComDiretorio):
+
+    def setUp(self):
+        TesteComDiretorio.setUp(self)
+        self.destino = os.path.join(self.dir_teste, "destino")
+        self.antigo = time.time() - 3600  # mtime confiável (fora da MARGEM_MTIME)
+        self.cria_arquivo(os.path.join("destino", "2020", "a.jpg"), b'aaaa')
+        self.cria_arquivo(os.path.join("destino", "2021", "b.jpg"), b'bbbb')
+        self.envelhece("2020", "2021", "")
+        self.indices = []
+
+    def tearDown(self):
+        for indice in self.indices:
+            indice.fecha()
+        TesteComDiretorio.tearDown(self)
+
+    def envelhece(self, *relativos, **kwargs):
+        """
+        Define um mtime antigo (confiável) nos diretórios, opcionalmente deslocado em 'segundos'
+        """
+
+        mtime = self.antigo + kwargs.get("segundos", 0)
+        for relativo in relativos:
+            os.utime(os.path.join(self.destino, relativo), (mtime, mtime))
+
+    def abre(self):
+        indice = DestinationIndex(self.destino)
+        self.indices.append(indice)
+        return indice
+
+    def nomes(self, indice):
+        return sorted(registro.nome for registro in indice.atualiza())
+
+    def test_leitura_inicial(self):
+        self.assertEqual(["a.jpg", "b.jpg"], self.nomes(self.abre()))
+
+    def test_rele_apenas_os_diretorios_alterados(self):
+        indice = self.abre()
+        self.nomes(indice)
+
+        # Arquivo criado sem alterar o mtime do diretório: não é detectado
+        self.cria_arquivo(os.path.join("destino", "2020", "c.jpg"), b'cccc')
+        self.envelhece("2020")
+        # Diretório com o mtime alterado: relido
+        self.cria_arquivo(os.path.join("destino", "2021", "d.jpg"), b'dddd')
+        self.envelhece("2021", segundos=10)
+
+        self.assertEqual(["a.jpg", "b.jpg", "d.jpg"], self.nomes(indice))
+
+    def test_mtime_recente_nao_confiavel(self):
+        indice = self.abre()
+        recente = time.time()
+        os.utime(os.path.join(self.destino, "2020"), (recente, recente))
+        self.nomes(indice)
+
+        mtime = indice.conexao.execute("SELECT mtime FROM diretorios WHERE caminho = ?", ("2020",)).fetchone()[0]
+        self.assertEqual(-1, mtime)
+
+        # Arquivo criado no mesmo instante da leitura: detectado mesmo com o mtime inalterado
+        self.cria_arquivo(os.path.join("destino", "2020", "c.jpg"), b'cccc')
+        os.utime(os.path.join(self.destino, "2020"), (recente, recente))
+        self.assertEqual(["a.jpg", "b.jpg", "c.jpg"], self.nomes(indice))
+
+    def test_remove_arquivos_e_diretorios_apagados(self):
+        indice = self.abre()
+        self.nomes(indice)
+
+        os.remove(os.path.join(self.destino, "2020", "a.jpg"))
+        self.envelhece("2020", segundos=10)
+        self.assertEqual(["b.jpg"], self.nomes(indice))
+
+        os.remove(os.path.join(self.destino, "2021", "b.jpg"))
+        os.rmdir(os.path.join(self.destino, "2021"))
+        self.envelhece("", segundos=20)
+        self.assertEqual([], self.nomes(indice))
+        self.assertIsNone(indice.conexao.execute("SELECT 1 FROM diretorios WHERE caminho = ?", ("2021",)).fetchone())
+
+    def test_reutiliza_o_indice_na_proxima_execucao(self):
+        indice = self.abre()
+        self.nomes(indice)
+        indice.fecha()
+        self.indices.remove(indice)
+
+        # Arquivo não detectável pelo mtime: só aparece se o índice for recriado
+        self.cria_arquivo(os.path.join("destino", "2020", "c.jpg"), b'cccc')
+        self.envelhece("2020")
+        self.assertEqual(["a.jpg", "b.jpg"], self.nomes(self.abre()))
+
+    def test_recria_o_indice_de_outra_versao(self):
+        indice = self.abre()
+        self.nomes(indice)
+        indice.conexao.execute("PRAGMA user_version = 0")
+        indice.fecha()
+        self.indices.remove(indice)
+
+        self.cria_arquivo(os.path.join("destino", "2020", "c.jpg"), b'cccc')
+        self.envelhece("2020")
+        self.assertEqual(["a.jpg", "b.jpg", "c.jpg"], self.nomes(self.abre()))
+
+    def test_registra_arquivo_gravado_pela_aplicacao(self):
+        indice = self.abre()
+        self.nomes(indice)
+
+        self.cria_arquivo(os.path.join("destino", "2022", "e.jpg"), b'eeee')
+        indice.registra_arquivo(os.path.join(self.destino, "2022", "e.jpg"))
+        self.assertEqual(["a.jpg", "b.jpg", "e.jpg"], self.nomes(indice))
+
+
+if __name__ == '__main__':
+    unittest.main()
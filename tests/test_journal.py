@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+Diário da cópia (CopyJournal): retomada de uma cópia interrompida
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import unittest
+
+from photosync_engine import CopyJournal, SyncItem, ACAO_COPIAR, SUFIXO_TEMPORARIO
+from tests.base import TesteComDiretorio
+
+
+class TestCopyJournal(TesteComDiretorio):
+
+    def setUp(self):
+        TesteComDiretorio.setUp(self)
+        self.destino = os.path.join(self.dir_teste, "destino")
+        os.makedirs(self.destino)
+        self.itens = [self.cria_item(nome) for nome in ("a.jpg", "b.jpg", "c.jpg")]
+
+    def cria_item(self, nome):
+        registro = self.cria_arquivo(os.path.join("origem", nome), b'conteudo ' + nome.encode("ascii"))
+        return SyncItem(registro, "2020", os.path.join("2020", nome), ACAO_COPIAR, None, registro.tamanho, False)
+
+    def interrompe(self, concluidos):
+        journal = CopyJournal(self.destino)
+        journal.abre(self.itens)
+        for item in concluidos:
+            journal.registra(item)
+        journal.fecha(False)
+
+    def test_retoma_apenas_os_itens_pendentes(self):
+        self.interrompe(self.itens[:1])
+
+        journal = CopyJournal(self.destino)
+        self.assertTrue(journal.pendente())
+        pendentes = journal.itens_pendentes()
+        self.assertEqual([item.destino for item in self.itens[1:]], [item.destino for item in pendentes])
+        self.assertEqual([item.registro.caminho for item in self.itens[1:]], [item.registro.caminho for item in pendentes])
+        self.assertEqual(ACAO_COPIAR, pendentes[0].acao)
+
+    def test_concluido_exige_o_arquivo_no_destino(self):
+        self.interrompe(self.itens[:1])
+
+        journal = CopyJournal(self.destino)
+        caminho_destino = os.path.join(self.destino, self.itens[0].destino)
+        self.assertFalse(journal.concluido(self.itens[0], caminho_destino))
+
+        os.makedirs(os.path.dirname(caminho_destino))
+        with open(caminho_destino, 'wb') as saida:
+            saida.write(b'conteudo a.jpg')
+        self.assertTrue(journal.concluido(self.itens[0], caminho_destino))
+        self.assertFalse(journal.concluido(self.itens[1], caminho_destino))
+
+    def test_caminho_relativo_retomado_de_outro_diretorio(self):
+        diretorio_atual = os.getcwd()
+        os.chdir(self.dir_teste)
+        try:
+            relativo = os.path.join("origem", "a.jpg")
+            item = self.itens[0]._replace(registro=self.cria_arquivo(relativo, b'conteudo a.jpg'))
+            item.registro.caminho = relativo
+            journal = CopyJournal(self.destino)
+            journal.abre([item])
+            journal.fecha(False)
+        finally:
+            os.chdir(diretorio_atual)
+
+        os.chdir(self.destino)
+        try:
+            pendentes = CopyJournal(self.destino).itens_pendentes()
+        finally:
+            os.chdir(diretorio_atual)
+
+        self.assertEqual([self.itens[0].registro.caminho], [item.registro.caminho for item in pendentes])
+
+    def test_origem_removida(self):
+        self.interrompe([])
+        os.remove(self.itens[1].registro.caminho)
+
+        journal = CopyJournal(self.destino)
+        self.assertEqual(2, len(journal.itens_pendentes()))
+        self.assertEqual([self.itens[1].registro.caminho], journal.ausentes)
+
+    def test_remove_arquivos_temporarios(self):
+        self.interrompe([])
+        pasta = os.path.join(self.destino, "2020")
+        os.makedirs(pasta)
+        temporario = os.path.join(pasta, ".b.jpg" + SUFIXO_TEMPORARIO)
+        with open(temporario, 'wb') as saida:
+            saida.write(b'incompleto')
+        with open(os.path.join(pasta, "a.jpg"), 'wb') as saida:
+            saida.write(b'conteudo a.jpg')
+
+        journal = CopyJournal(self.destino)
+        journal.abre(self.itens)
+        journal.fecha(False)
+        self.assertEqual(["a.jpg"], os.listdir(pasta))
+
+    def test_remove_o_diario_ao_finalizar(self):
+        journal = CopyJournal(self.destino)
+        journal.abre(self.itens)
+        for item in self.itens:
+            journal.registra(item)
+        journal.fecha(True)
+
+        self.assertFalse(os.path.exists(journal.arquivo))
+        self.assertFalse(CopyJournal(self.destino).pendente())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Limite da taxa de transferência da cópia (BandwidthLimiter)
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+import unittest
+
+from photosync_engine import BandwidthLimiter
+
+
+class TestBandwidthLimiter(unittest.TestCase):
+
+    def test_sem_limite(self):
+        limitador = BandwidthLimiter(lambda: 0)
+        self.assertFalse(limitador.limitado())
+
+        inicio = time.time()
+        limitador.consome(100 * 1024 * 1024)
+        self.assertLess(time.time() - inicio, 0.1)
+
+    def test_aguarda_ao_exceder_a_taxa(self):
+        limitador = BandwidthLimiter(lambda: 1000000)
+        self.assertTrue(limitador.limitado())
+
+        inicio = time.time()
+        limitador.consome(300000)
+        duracao = time.time() - inicio
+        self.assertGreater(duracao, 0.2)
+        self.assertLess(duracao, 1.0)
+
+    def test_rajada_limitada_a_um_segundo(self):
+        limitador = BandwidthLimiter(lambda: 1000000)
+        limitador.limitado()
+        limitador.ultimo -= 10  # Ocioso por 10 segundos
+
+        limitador.consome(0)
+        self.assertLessEqual(limitador.tokens, 1000000)
+
+    def test_define_taxa_durante_a_copia(self):
+        limitador = BandwidthLimiter(lambda: 1000000)
+        self.assertTrue(limitador.limitado())
+
+        limitador.define_taxa(0)
+        self.assertFalse(limitador.limitado())
+
+    def test_consulta_a_taxa_no_maximo_uma_vez_por_segundo(self):
+        taxas = [1000000]
+        consultas = []
+
+        def funcao_taxa():
+            consultas.append(taxas[0])
+            return taxas[0]
+
+        limitador = BandwidthLimiter(funcao_taxa)
+        self.assertTrue(limitador.limitado())
+        taxas[0] = 0
+        self.assertTrue(limitador.limitado())
+        self.assertEqual(1, len(consultas))
+
+        limitador.atualiza_taxa(time.time() + BandwidthLimiter.INTERVALO_CONSULTA)
+        self.assertFalse(limitador.limitado())
+        self.assertEqual(2, len(consultas))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Plano de sincronização (planeja_sincronizacao / SyncPlan): arquivos já existentes no destino e ação de cada arquivo
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from photosync_engine import DestinationCatalog, FileCopyEngine, planeja_sincronizacao, ACAO_IGNORAR, ACAO_COPIAR, ACAO_MOVER, \
+    TAMANHO_BLOCO_IMPRESSAO, METODO_RENOMEAR
+from tests.base import TesteComDiretorio
+
+
+class TesteDePlanejamento(TesteComDiretorio):
+
+    def cria_origem(self, nome, conteudo, data="2021-03-04"):
+        registro = self.cria_arquivo(os.path.join("origem", nome), conteudo)
+        registro.data_captura = data
+        return registro
+
+    def cria_destino(self, relativo, conteudo):
+        return self.cria_arquivo(os.path.join("destino", relativo), conteudo)
+
+    def planeja(self, registros, destino=(), mapeamento=None, comparar_conteudo=False):
+        return planeja_sincronizacao(registros, DestinationCatalog(destino), mapeamento, comparar_conteudo)
+
+
+class TestPlanejamento(TesteDePlanejamento):
+
+    def test_destino_pela_data(self):
+        item = self.planeja([self.cria_origem("a.jpg", b'aaaa')]).itens[0]
+        self.assertEqual(os.path.join("2021", "2021-03-04"), item.pasta)
+        self.assertEqual(os.path.join("2021", "2021-03-04", "a.jpg"), item.destino)
+
+    def test_ignora_arquivo_existente(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        item = self.planeja([registro], [self.cria_destino("a.jpg", b'bbbb')]).item(registro)
+        self.assertTrue(item.existe)
+        self.assertEqual(ACAO_IGNORAR, item.acao)
+
+    def test_copia_arquivo_com_tamanho_diferente(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        item = self.planeja([registro], [self.cria_destino("a.jpg", b'aaaaa')]).item(registro)
+        self.assertFalse(item.existe)
+        self.assertEqual(ACAO_COPIAR, item.acao)
+
+    def test_mapeamento(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        pasta = os.path.join("2021", "2021-03-04")
+        plano = self.planeja([registro])
+        self.assertEqual(os.path.join("Viagem", "a.jpg"), plano.com_mapeamento({pasta: "Viagem"}).item(registro).destino)
+        self.assertEqual(os.path.join(pasta, "a.jpg"), plano.item(registro).destino)
+
+    def test_copia_novamente_os_ignorados_selecionados(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        plano = self.planeja([registro], [self.cria_destino("a.jpg", b'bbbb')])
+        self.assertEqual([ACAO_COPIAR], [item.acao for item in plano.copia([registro])])
+
+
+class TestPlanejamentoMover(TesteDePlanejamento):
+
+    configuracao = {"remover_apos_copia": "True"}
+
+    def test_move_arquivo_novo(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        self.assertEqual(ACAO_MOVER, self.planeja([registro]).item(registro).acao)
+
+    def test_nao_move_arquivo_existente(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        self.assertEqual(ACAO_IGNORAR, self.planeja([registro], [self.cria_destino("a.jpg", b'bbbb')]).item(registro).acao)
+
+    def move(self, dir_destino):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        engine = FileCopyEngine(self.planeja([registro]).itens, dir_destino, threads=1)
+        engine.executa()
+        self.assertFalse(engine.failed)
+        self.assertFalse(os.path.exists(registro.caminho))
+        with open(os.path.join(dir_destino, "2021", "2021-03-04", "a.jpg"), 'rb') as entrada:
+            self.assertEqual(b'aaaa', entrada.read())
+        return engine
+
+    def test_move_no_mesmo_sistema_de_arquivos_renomeando(self):
+        os.makedirs(os.path.join(self.dir_teste, "destino"))
+        engine = self.move(os.path.join(self.dir_teste, "destino"))
+        self.assertEqual({METODO_RENOMEAR: 1}, engine.metodos)
+
+    def test_move_entre_sistemas_de_arquivos_copiando(self):
+        if not os.path.isdir("/dev/shm") or os.stat("/dev/shm").st_dev == os.stat(self.dir_teste).st_dev:
+            self.skipTest("Sem outro sistema de arquivos disponível")
+
+        dir_destino = tempfile.mkdtemp(prefix="photosync_teste_", dir="/dev/shm")
+        try:
+            engine = self.move(dir_destino)
+            self.assertNotIn(METODO_RENOMEAR, engine.metodos)
+        finally:
+            shutil.rmtree(dir_destino, ignore_errors=True)
+
+
+class TestPlanejamentoSobrescrever(TesteDePlanejamento):
+
+    configuracao = {"sobrescrever_arquivos": "True"}
+
+    def test_copia_arquivo_existente(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        item = self.planeja([registro], [self.cria_destino("a.jpg", b'bbbb')]).item(registro)
+        self.assertTrue(item.existe)
+        self.assertEqual(ACAO_COPIAR, item.acao)
+
+
+class TestPlanejamentoPorConteudo(TesteDePlanejamento):
+
+    def test_arquivo_renomeado_no_destino(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        item = self.planeja([registro], [self.cria_destino("IMG_0001.jpg", b'aaaa')], comparar_conteudo=True).item(registro)
+        self.assertTrue(item.existe)
+        self.assertEqual(ACAO_IGNORAR, item.acao)
+
+    def test_mesmo_nome_e_tamanho_com_conteudo_diferente(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        item = self.planeja([registro], [self.cria_destino("a.jpg", b'bbbb')], comparar_conteudo=True).item(registro)
+        self.assertFalse(item.existe)
+        self.assertEqual(ACAO_COPIAR, item.acao)
+
+    def test_diferenca_apenas_no_meio_do_arquivo(self):
+        # As impressões parciais (blocos inicial e final) coincidem: a diferença é encontrada pelo hash completo
+        bloco = b'x' * TAMANHO_BLOCO_IMPRESSAO
+        registro = self.cria_origem("a.jpg", bloco + b'1' + bloco)
+        iguais = self.cria_destino("b.jpg", bloco + b'1' + bloco)
+        diferente = self.cria_destino("a.jpg", bloco + b'2' + bloco)
+
+        self.assertFalse(self.planeja([registro], [diferente], comparar_conteudo=True).item(registro).existe)
+        registro.sincronizado = None
+        self.assertTrue(self.planeja([registro], [diferente, iguais], comparar_conteudo=True).item(registro).existe)
+
+    def test_copia_nao_substitui_arquivo_diferente(self):
+        registro = self.cria_origem("a.jpg", b'aaaa')
+        existente = self.cria_destino(os.path.join("2021", "2021-03-04", "a.jpg"), b'bbbb')
+        plano = self.planeja([registro], [existente], comparar_conteudo=True)
+
+        engine = FileCopyEngine(plano.itens, os.path.join(self.dir_teste, "destino"), threads=1)
+        engine.executa()
+        self.assertFalse(engine.failed)
+
+        with open(existente.caminho, 'rb') as entrada:
+            self.assertEqual(b'bbbb', entrada.read())
+        destino = engine.itens_destino()[0].destino
+        self.assertEqual(os.path.join("2021", "2021-03-04", "a_1.jpg"), destino)
+        with open(os.path.join(self.dir_teste, "destino", destino), 'rb') as entrada:
+            self.assertEqual(b'aaaa', entrada.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Verificação da cópia (copia_arquivo): releitura completa sem o cache (O_DIRECT) e comparação por amostragem
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import unittest
+
+from photosync_engine import copia_arquivo, calcula_hash_completo, calcula_hash_sem_cache, verifica_amostragem, verifica_releitura, \
+    get_arquivo_temporario, VERIFICACAO_COMPLETA, VERIFICACAO_AMOSTRAGEM, METODO_BUFFER
+from tests.base import TesteComDiretorio
+
+
+class TestVerificacaoCopia(TesteComDiretorio):
+
+    def setUp(self):
+        TesteComDiretorio.setUp(self)
+        # Tamanho não múltiplo do bloco: o final do arquivo também é lido com o O_DIRECT
+        self.conteudo = os.urandom(3 * 1024 * 1024 + 123)
+        self.origem = self.cria_arquivo("origem.jpg", self.conteudo).caminho
+        self.destino = os.path.join(self.dir_teste, "destino.jpg")
+
+    def copia(self, verificacao):
+        metodo, resumo = copia_arquivo(self.origem, self.destino, verificacao)
+        self.assertEqual(METODO_BUFFER, metodo)
+        self.assertEqual(calcula_hash_completo(self.origem), resumo)
+        with open(self.destino, 'rb') as entrada:
+            self.assertEqual(self.conteudo, entrada.read())
+        self.assertFalse(os.path.exists(get_arquivo_temporario(self.destino)))
+
+    def test_verificacao_completa(self):
+        self.copia(VERIFICACAO_COMPLETA)
+
+    def test_verificacao_por_amostragem(self):
+        self.copia(VERIFICACAO_AMOSTRAGEM)
+
+    def test_hash_sem_cache(self):
+        self.assertEqual(calcula_hash_completo(self.origem), calcula_hash_sem_cache(self.origem))
+
+    def test_releitura_detecta_diferenca(self):
+        self.cria_arquivo("destino.jpg", self.conteudo[:-1] + b'x')
+        self.assertRaises(IOError, verifica_releitura, self.destino, calcula_hash_completo(self.origem))
+
+    def test_amostragem_detecta_diferenca(self):
+        self.cria_arquivo("destino.jpg", b'x' + self.conteudo[1:])
+        self.assertRaises(IOError, verifica_amostragem, self.origem, self.destino)
+
+        self.cria_arquivo("destino.jpg", self.conteudo[:-1])
+        self.assertRaises(IOError, verifica_amostragem, self.origem, self.destino)
+
+
+if __name__ == '__main__':
+    unittest.main()